@@ -43,7 +43,8 @@ config = context.config
 
 # ----------------- 注入数据库 URL -----------------
 # 用我们从 settings 中读取的 URL 覆盖 alembic.ini 中的默认值
-config.set_main_option("sqlalchemy.url", settings.DB.DATABASE_URL)
+# 分片模式下每个分片也要迁移: alembic -x url=postgresql+asyncpg://...:5433/tutorial upgrade head
+config.set_main_option("sqlalchemy.url", context.get_x_argument(as_dictionary=True).get("url", settings.DB.DATABASE_URL))
 # ----------------------------------------------------
 
 # Interpret the config file for Python logging.
@@ -59,6 +60,210 @@ if config.config_file_name is not None:
 # 这是 Alembic 进行比对的"最终蓝图"
 target_metadata = Base.metadata
 
+
+# ----------------- 在线迁移工具 (不长时间锁表) -----------------
+# 在这里注册的自定义操作可以在任何迁移脚本中通过 op.xxx() 使用:
+#
+#   op.create_index_concurrently("ix_heroes_name_id", "heroes", ["name", "id"])
+#   op.drop_index_concurrently("ix_heroes_name_id", "heroes")
+#   op.backfill_in_batches("heroes", "powers_tags = ...", where="powers_tags IS NULL")
+#
+# 普通的 op.create_index 会在迁移事务中持有 SHARE 锁直到事务结束，大表上会阻塞写入数分钟；
+# CREATE INDEX CONCURRENTLY 不阻塞写入，但不能在事务中执行，所以要放在 autocommit_block 中。
+# 回填数据则按主键范围分批执行，每批是一个独立的短事务，可限速、可断点续跑。
+import logging
+import time
+from contextlib import contextmanager
+
+from alembic.operations import MigrateOperation, Operations
+from sqlalchemy import text
+
+online_logger = logging.getLogger("alembic.online")
+
+# 在线操作等锁的最长时间: 拿不到锁就快速失败 (可重试)，而不是排在队列里阻塞后续所有写入
+ONLINE_LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "5s")
+
+
+@contextmanager
+def _online_lock_timeout(execute):
+    """
+    在当前会话上设置 ONLINE_LOCK_TIMEOUT，退出时 (包括异常和提前返回) 恢复默认值。
+    autocommit_block 中的 SET 是会话级的，不恢复会影响同一连接上后续的所有迁移。
+    """
+    execute(f"SET lock_timeout = '{ONLINE_LOCK_TIMEOUT}'")
+    try:
+        yield
+    finally:
+        execute("RESET lock_timeout")
+
+
+@Operations.register_operation("create_index_concurrently")
+class CreateIndexConcurrentlyOp(MigrateOperation):
+    """在事务外以 CONCURRENTLY 方式创建索引。"""
+
+    def __init__(self, index_name, table_name, columns, **kw):
+        self.index_name = index_name
+        self.table_name = table_name
+        self.columns = columns
+        self.kw = kw
+
+    @classmethod
+    def create_index_concurrently(cls, operations, index_name, table_name, columns, **kw):
+        return operations.invoke(cls(index_name, table_name, columns, **kw))
+
+    def reverse(self):
+        return DropIndexConcurrentlyOp(self.index_name, self.table_name)
+
+
+@Operations.register_operation("drop_index_concurrently")
+class DropIndexConcurrentlyOp(MigrateOperation):
+    """在事务外以 CONCURRENTLY 方式删除索引。"""
+
+    def __init__(self, index_name, table_name):
+        self.index_name = index_name
+        self.table_name = table_name
+
+    @classmethod
+    def drop_index_concurrently(cls, operations, index_name, table_name):
+        return operations.invoke(cls(index_name, table_name))
+
+
+@Operations.implementation_for(CreateIndexConcurrentlyOp)
+def _create_index_concurrently(operations, operation):
+    with operations.get_context().autocommit_block(), _online_lock_timeout(operations.execute):
+        # 上一次 CONCURRENTLY 失败会留下一个 INVALID 的索引，先清理掉再重建
+        # (DROP INDEX CONCURRENTLY 不能放在 DO 块中，所以在 Python 里判断)
+        if not context.is_offline_mode():
+            invalid = operations.get_bind().execute(
+                text(
+                    "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE c.relname = :name AND NOT i.indisvalid"
+                ),
+                {"name": operation.index_name},
+            ).scalar()
+            if invalid:
+                online_logger.warning("索引 %s 处于 INVALID 状态，删除后重建", operation.index_name)
+                operations.drop_index(
+                    operation.index_name,
+                    table_name=operation.table_name,
+                    postgresql_concurrently=True,
+                )
+        operations.create_index(
+            operation.index_name,
+            operation.table_name,
+            operation.columns,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+            **operation.kw,
+        )
+
+
+@Operations.implementation_for(DropIndexConcurrentlyOp)
+def _drop_index_concurrently(operations, operation):
+    with operations.get_context().autocommit_block(), _online_lock_timeout(operations.execute):
+        operations.drop_index(
+            operation.index_name,
+            table_name=operation.table_name,
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+@Operations.register_operation("backfill_in_batches")
+class BackfillInBatchesOp(MigrateOperation):
+    """
+    按主键范围分批执行 UPDATE 回填数据。
+
+    - 每批是一个独立的自动提交事务，行锁只持有很短的时间；
+    - 每批前设置 lock_timeout，拿不到锁就退避重试，而不是阻塞线上写入；
+    - 每批之间 sleep 限速，给线上流量和复制留出余量；
+    - 进度记录在 alembic_backfill_progress 表中，中断后重新执行会从断点继续。
+    """
+
+    def __init__(self, table_name, set_sql, where=None, key="id", batch_size=5000,
+                 sleep=0.05, max_retries=10, name=None):
+        self.table_name = table_name
+        self.set_sql = set_sql
+        self.where = where
+        self.key = key
+        self.batch_size = batch_size
+        self.sleep = sleep
+        self.max_retries = max_retries
+        self.name = name or f"{table_name}:{set_sql}"
+
+    @classmethod
+    def backfill_in_batches(cls, operations, table_name, set_sql, **kw):
+        return operations.invoke(cls(table_name, set_sql, **kw))
+
+
+@Operations.implementation_for(BackfillInBatchesOp)
+def _backfill_in_batches(operations, operation):
+    if context.is_offline_mode():
+        raise RuntimeError("backfill_in_batches 需要读取进度和主键范围，不支持 --sql 离线模式")
+
+    with operations.get_context().autocommit_block():
+        conn = operations.get_bind()
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS alembic_backfill_progress ("
+            "name TEXT PRIMARY KEY, last_key BIGINT NOT NULL, updated_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+        ))
+        with _online_lock_timeout(lambda sql: conn.execute(text(sql))):
+            start_key = conn.execute(
+                text("SELECT last_key FROM alembic_backfill_progress WHERE name = :name"),
+                {"name": operation.name},
+            ).scalar()
+            min_key, max_key = conn.execute(
+                text(f"SELECT min({operation.key}), max({operation.key}) FROM {operation.table_name}")
+            ).one()
+            if max_key is None:
+                online_logger.info("backfill %s: 表为空，跳过", operation.name)
+                return
+            lo = start_key if start_key is not None else min_key
+            if start_key is not None:
+                online_logger.info("backfill %s: 从断点 %s=%s 继续", operation.name, operation.key, lo)
+
+            where = f" AND ({operation.where})" if operation.where else ""
+            update_sql = text(
+                f"UPDATE {operation.table_name} SET {operation.set_sql} "
+                f"WHERE {operation.key} >= :lo AND {operation.key} < :hi{where}"
+            )
+            save_progress = text(
+                "INSERT INTO alembic_backfill_progress (name, last_key) VALUES (:name, :key) "
+                "ON CONFLICT (name) DO UPDATE SET last_key = EXCLUDED.last_key, updated_at = now()"
+            )
+
+            total_rows = 0
+            started = time.monotonic()
+            while lo <= max_key:
+                hi = lo + operation.batch_size
+                for attempt in range(operation.max_retries + 1):
+                    try:
+                        total_rows += conn.execute(update_sql, {"lo": lo, "hi": hi}).rowcount
+                        break
+                    except Exception as e:
+                        # 55P03: lock_not_available (lock_timeout)
+                        if getattr(getattr(e, "orig", None), "sqlstate", None) != "55P03" or attempt == operation.max_retries:
+                            raise
+                        backoff = min(2 ** attempt * 0.1, 5)
+                        online_logger.warning("backfill %s: 批次 [%s, %s) 等锁超时，%.1fs 后重试", operation.name, lo, hi, backoff)
+                        time.sleep(backoff)
+                conn.execute(save_progress, {"name": operation.name, "key": hi})
+                lo = hi
+
+                done = min(1.0, (lo - min_key) / max(1, max_key - min_key + 1))
+                elapsed = time.monotonic() - started
+                eta = elapsed / done - elapsed if done else 0
+                online_logger.info(
+                    "backfill %s: %.1f%% (%s=%s/%s, %d 行, 已用 %.0fs, 预计剩余 %.0fs)",
+                    operation.name, done * 100, operation.key, min(lo, max_key), max_key, total_rows, elapsed, eta,
+                )
+                if operation.sleep:
+                    time.sleep(operation.sleep)
+
+            conn.execute(text("DELETE FROM alembic_backfill_progress WHERE name = :name"), {"name": operation.name})
+        online_logger.info("backfill %s: 完成，共更新 %d 行", operation.name, total_rows)
+# ----------------- 在线迁移工具的终点 -----------------
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -0,0 +1,33 @@
+"""Add lower(alias) text_pattern_ops index for hero suggest
+
+Revision ID: 7e2a9c4d1b85
+Revises: 309a4ffb61af
+Create Date: 2026-10-19 03:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e2a9c4d1b85'
+down_revision: Union[str, Sequence[str], None] = '309a4ffb61af'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 在事务外并发创建，不阻塞线上写入 (见 alembic/env.py 中的在线迁移工具)
+    op.create_index_concurrently(
+        'ix_heroes_alias_lower_pattern',
+        'heroes',
+        [sa.text('lower(alias) text_pattern_ops')],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index_concurrently('ix_heroes_alias_lower_pattern', 'heroes')
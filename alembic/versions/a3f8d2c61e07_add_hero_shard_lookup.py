@@ -0,0 +1,39 @@
+"""Add hero shard lookup table and global id sequence
+
+Revision ID: a3f8d2c61e07
+Revises: 7e2a9c4d1b85
+Create Date: 2026-10-19 04:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f8d2c61e07'
+down_revision: Union[str, Sequence[str], None] = '7e2a9c4d1b85'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 只在查找分片 (主库) 上使用；分片上也执行同一迁移，保持表结构一致
+    op.create_table(
+        'hero_aliases',
+        sa.Column('alias', sa.String(length=100), nullable=False),
+        sa.Column('hero_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('alias'),
+        sa.UniqueConstraint('hero_id'),
+    )
+    op.execute(sa.schema.CreateSequence(sa.Sequence('hero_global_id_seq')))
+    # 从现有的最大 id 之后开始分配，已有英雄迁移到分片后 id 不会冲突
+    op.execute("SELECT setval('hero_global_id_seq', COALESCE((SELECT max(id) FROM heroes), 0) + 1, false)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(sa.schema.DropSequence(sa.Sequence('hero_global_id_seq')))
+    op.drop_table('hero_aliases')
@@ -0,0 +1,76 @@
+"""Add normalized powers_tags array with GIN index
+
+Revision ID: c6e1b9f4a2d3
+Revises: a3f8d2c61e07
+Create Date: 2026-10-19 04:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6e1b9f4a2d3'
+down_revision: Union[str, Sequence[str], None] = 'a3f8d2c61e07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 可空且没有默认值: 只修改元数据，不重写表
+    op.add_column('heroes', sa.Column('powers_tags', postgresql.ARRAY(sa.Text()), nullable=True))
+
+    # 规范化函数 (与 app/models/heroes.py 中的 normalize_power_tags 规则一致)
+    op.execute(r"""
+        CREATE OR REPLACE FUNCTION hero_power_tags(powers text) RETURNS text[]
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT coalesce(array_agg(DISTINCT tag ORDER BY tag), '{}')
+            FROM (
+                SELECT btrim(regexp_replace(lower(part), '\s+', ' ', 'g')) AS tag
+                FROM regexp_split_to_table(coalesce(powers, ''), '[,;&]') AS part
+            ) AS parts
+            WHERE tag <> ''
+        $$
+    """)
+    # 先装触发器，回填期间新写入的行直接得到标签
+    op.execute("""
+        CREATE OR REPLACE FUNCTION heroes_set_powers_tags() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.powers_tags := hero_power_tags(NEW.powers);
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER heroes_powers_tags
+        BEFORE INSERT OR UPDATE OF powers ON heroes
+        FOR EACH ROW EXECUTE FUNCTION heroes_set_powers_tags()
+    """)
+
+    # 已有数据分批回填 (SET 中不含 powers，不会触发触发器)，可中断续跑
+    op.backfill_in_batches(
+        'heroes',
+        'powers_tags = hero_power_tags(powers)',
+        where='powers_tags IS NULL',
+        name='heroes:powers_tags',
+    )
+    op.create_index_concurrently(
+        'ix_heroes_powers_tags',
+        'heroes',
+        ['powers_tags'],
+        postgresql_using='gin',
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index_concurrently('ix_heroes_powers_tags', 'heroes')
+    op.execute("DROP TRIGGER IF EXISTS heroes_powers_tags ON heroes")
+    op.execute("DROP FUNCTION IF EXISTS heroes_set_powers_tags()")
+    op.execute("DROP FUNCTION IF EXISTS hero_power_tags(text)")
+    op.drop_column('heroes', 'powers_tags')
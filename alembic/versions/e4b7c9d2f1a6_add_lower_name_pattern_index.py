@@ -0,0 +1,33 @@
+"""Add lower(name) text_pattern_ops index for hero suggest
+
+Revision ID: e4b7c9d2f1a6
+Revises: c6e1b9f4a2d3
+Create Date: 2026-10-19 05:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7c9d2f1a6'
+down_revision: Union[str, Sequence[str], None] = 'c6e1b9f4a2d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 自动补全的数据库回退查询同时按 name 前缀匹配；在事务外并发创建，不阻塞线上写入
+    op.create_index_concurrently(
+        'ix_heroes_name_lower_pattern',
+        'heroes',
+        [sa.text('lower(name) text_pattern_ops')],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index_concurrently('ix_heroes_name_lower_pattern', 'heroes')
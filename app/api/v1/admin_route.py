@@ -0,0 +1,148 @@
+# app/api/v1/admin_route.py
+import asyncio
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import settings
+from app.core.exceptions import BadRequestException, NotFoundException
+from app.core.memory_profiling import (
+    KeyType,
+    TracemallocNotRunning,
+    collect_garbage,
+    get_snapshot_store,
+    process_memory,
+    tracemalloc_status,
+)
+from app.core.profiling import get_profile_store
+from app.core.reload import ConfigReloadError, reload_configuration
+from app.core.security import require_admin
+
+# 挂载在 /admin 而不是 /api/v1 下: 不受准入控制和截止时间中间件影响，过载时也能操作
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+
+@router.post("/config/reload")
+async def reload_config() -> dict:
+    """
+    Reload settings from the environment and env file.
+
+    Database pool settings are applied by swapping the engine; requests
+    already running finish on the old pool, which is closed once drained.
+    """
+    try:
+        return await reload_configuration("admin")
+    except ConfigReloadError as e:
+        raise BadRequestException(f"Config reload rejected: {e}")
+
+
+@router.get("/profiles")
+async def list_profiles() -> list[dict]:
+    """List recent request profiles (newest first) with their time breakdown."""
+    store = get_profile_store()
+    return store.list() if store is not None else []
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str) -> str:
+    """
+    Return a request profile in folded-stack format (one `frame;frame;frame usec`
+    per line), ready for flamegraph.pl, speedscope or inferno.
+    """
+    store = get_profile_store()
+    folded = store.read(profile_id) if store is not None else None
+    if folded is None:
+        raise NotFoundException(f"Profile {profile_id} not found")
+    return folded
+
+
+# --- 内存诊断 (见 app/core/memory_profiling.py) ---
+@router.get("/memory")
+async def memory_overview(top_types: int = Query(20, ge=1, le=200)) -> dict:
+    """
+    RSS, GC generations, live object counts (tracked types and the most common
+    types), ORM sessions / identity map size, loguru handlers and tracemalloc state.
+    Walks the whole heap, so it takes a while on large processes.
+    """
+    return await asyncio.to_thread(process_memory, settings.MEMORY.TRACKED_TYPES, top_types)
+
+
+@router.post("/memory/gc")
+async def run_gc() -> dict:
+    """Run a full garbage collection and report RSS before and after."""
+    return await asyncio.to_thread(collect_garbage)
+
+
+@router.post("/memory/tracemalloc/start")
+async def start_tracemalloc(frames: int | None = Query(None, ge=1, le=100)) -> dict:
+    """Start tracing allocations (no-op when already tracing). Only allocations made afterwards are traced."""
+    return get_snapshot_store().start(frames)
+
+
+@router.post("/memory/tracemalloc/stop")
+async def stop_tracemalloc() -> dict:
+    """Stop tracing and drop all stored snapshots."""
+    return get_snapshot_store().stop()
+
+
+async def _take_snapshot():
+    try:
+        return await asyncio.to_thread(get_snapshot_store().take)
+    except TracemallocNotRunning:
+        raise BadRequestException("tracemalloc is not running, POST /admin/memory/tracemalloc/start first")
+
+
+def _stored_snapshot(snapshot_id: str):
+    snapshot = get_snapshot_store().get(snapshot_id)
+    if snapshot is None:
+        raise NotFoundException(f"Snapshot {snapshot_id} not found")
+    return snapshot
+
+
+@router.get("/memory/snapshots")
+async def list_snapshots() -> list[dict]:
+    """List stored tracemalloc snapshots (oldest first)."""
+    return get_snapshot_store().list()
+
+
+@router.post("/memory/snapshots")
+async def take_snapshot(
+    key_type: KeyType = Query("lineno"),
+    limit: int = Query(20, ge=1, le=500),
+) -> dict:
+    """Take and store a snapshot; returns its id and top allocation sites."""
+    snapshot_id, snapshot = await _take_snapshot()
+    top = await asyncio.to_thread(get_snapshot_store().top, snapshot, key_type, limit)
+    return {"id": snapshot_id, **tracemalloc_status(), **top}
+
+
+@router.get("/memory/snapshots/{snapshot_id}/top")
+async def snapshot_top(
+    snapshot_id: str,
+    key_type: KeyType = Query("lineno"),
+    limit: int = Query(20, ge=1, le=500),
+) -> dict:
+    """Top allocation sites of a stored snapshot."""
+    snapshot = _stored_snapshot(snapshot_id)
+    return await asyncio.to_thread(get_snapshot_store().top, snapshot, key_type, limit)
+
+
+@router.get("/memory/snapshots/{snapshot_id}/diff")
+async def snapshot_diff(
+    snapshot_id: str,
+    against: str | None = Query(None, description="Newer snapshot id; a new snapshot is taken when omitted"),
+    key_type: KeyType = Query("lineno"),
+    limit: int = Query(20, ge=1, le=500),
+) -> dict:
+    """
+    Allocation growth between a stored snapshot and a newer one, largest
+    change first. Without `against` a new snapshot is taken (and stored, so it
+    can be the base of the next diff).
+    """
+    base = _stored_snapshot(snapshot_id)
+    if against is None:
+        against, newer = await _take_snapshot()
+    else:
+        newer = _stored_snapshot(against)
+    diff = await asyncio.to_thread(get_snapshot_store().diff, newer, base, key_type, limit)
+    return {"base": snapshot_id, "against": against, **diff}
@@ -0,0 +1,41 @@
+# app/api/v1/auth_route.py
+from loguru import logger
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db
+from app.core.security import get_current_user
+from app.domains.users.users_repository import UserRepository
+from app.domains.users.users_services import UserService
+from app.schemas.user import TokenResponse, UserCreate, UserLogin, UserResponse
+
+router = APIRouter(prefix="/auth", tags=["Auth"])
+
+
+def get_user_service(session: AsyncSession = Depends(get_db)) -> UserService:
+    """Dependency for getting UserService instance."""
+    return UserService(UserRepository(session))
+
+
+@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+async def register(
+    data: UserCreate, service: UserService = Depends(get_user_service)
+) -> UserResponse:
+    """Register a new user."""
+    user = await service.register(data)
+    logger.info("Registered user {}", user.id)
+    return user
+
+
+@router.post("/login", response_model=TokenResponse)
+async def login(
+    data: UserLogin, service: UserService = Depends(get_user_service)
+) -> TokenResponse:
+    """Exchange username/password for an access token."""
+    return await service.login(data)
+
+
+@router.get("/me")
+async def me(claims: dict = Depends(get_current_user)) -> dict:
+    """Return the claims of the current access token."""
+    return {"id": int(claims["sub"]), "username": claims["name"]}
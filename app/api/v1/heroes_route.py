@@ -1,23 +1,102 @@
 # app/api/v1/heroes_route.py
 from loguru import logger
-from fastapi import APIRouter, Depends, status, Query # 👈 新增 Query
+from fastapi import APIRouter, Depends, Header, Response, status, Query # 👈 新增 Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi_filter import FilterDepends # 👈 导入魔法依赖项
-from app.core.database import get_db
-from app.domains.heroes.heroes_repository import HeroRepository
+from app.core.database import get_db, get_read_db
+from app.core.logging_config import sample
+from app.core.exceptions import AlreadyExistsException, NotFoundException, ServiceUnavailableException
+from app.domains.heroes.heroes_repository import BaseHeroRepository, HeroRepository
+from app.domains.heroes.heroes_memory_repository import get_memory_hero_repository
+from app.domains.heroes.heroes_sharded_repository import ShardedHeroRepository
 from app.domains.heroes.heroes_services import HeroService
-from app.schemas.heroes import HeroCreate, HeroUpdate, HeroResponse, HeroStoryResponse, HeroListResponse, Pagination, Sort, Filters, OrderByRule
+from app.domains.heroes.heroes_batcher import HeroCreateBatcher, get_hero_batcher
+from app.domains.heroes.heroes_events import HeroChangeBroker, get_hero_change_broker
+from app.schemas.heroes import HeroCreate, HeroUpdate, HeroResponse, HeroStoryResponse, HeroListResponse, Pagination, Sort, Filters, OrderByRule, HeroCreateStatus, HeroSuggestResponse, HeroTagFacetResponse
+from app.core.config import settings
 from app.schemas.heroes_filter import HeroFilter
 
 router = APIRouter(prefix="/heroes", tags=["Heroes"])
 
 
-def get_hero_service(session: AsyncSession = Depends(get_db)) -> HeroService:
+async def _get_sqlalchemy_hero_repository(session: AsyncSession = Depends(get_db)) -> BaseHeroRepository:
+    return HeroRepository(session)
+
+
+async def _get_sqlalchemy_hero_read_repository(session: AsyncSession = Depends(get_read_db)) -> BaseHeroRepository:
+    # 只读仓储: 查询完成即归还连接，不把连接占到响应序列化结束
+    return HeroRepository(session, read_only=True)
+
+
+async def _get_memory_hero_repository() -> BaseHeroRepository:
+    return get_memory_hero_repository()
+
+
+async def _get_sharded_hero_repository(session: AsyncSession = Depends(get_db)) -> BaseHeroRepository:
+    # 请求的数据库会话位于主库 (查找分片)，用于分配 id、保证 alias 唯一和发布变更
+    return ShardedHeroRepository(session)
+
+
+async def _get_sharded_hero_read_repository() -> BaseHeroRepository:
+    # 读请求直接访问各分片，不需要主库连接
+    return ShardedHeroRepository()
+
+
+# 存储后端在启动时确定；memory 后端完全不经过 get_db，请求路径上没有任何数据库开销
+get_hero_repository, get_hero_read_repository = {
+    "sqlalchemy": (_get_sqlalchemy_hero_repository, _get_sqlalchemy_hero_read_repository),
+    "memory": (_get_memory_hero_repository, _get_memory_hero_repository),
+    "sharded": (_get_sharded_hero_repository, _get_sharded_hero_read_repository),
+}[settings.REPOSITORY.BACKEND]
+
+
+async def get_hero_service(repository: BaseHeroRepository = Depends(get_hero_repository)) -> HeroService:
     """Dependency for getting HeroService instance."""
-    repository = HeroRepository(session)
+    # 声明为 async: 同步依赖会被 FastAPI 派发到线程池，对这种纯构造函数得不偿失
+    return HeroService(repository)
+
+
+async def get_hero_read_service(repository: BaseHeroRepository = Depends(get_hero_read_repository)) -> HeroService:
+    """Dependency for getting a HeroService for read-only routes."""
     return HeroService(repository)
 
 
+def parse_order_rules(hero_filter: HeroFilter) -> list[OrderByRule]:
+    """Turn the requested order_by into the sort rules echoed in the list response."""
+    # 注意: order_by 现在可能是逗号分隔的字符串，需要处理
+    order_by_list = hero_filter.order_by[0].split(',') if hero_filter.order_by else []
+    return [
+        OrderByRule(field=f.lstrip("-"), dir="desc" if f.startswith("-") else "asc")
+        for f in order_by_list
+    ]
+
+
+def build_hero_list_response(
+    hero_filter: HeroFilter, heroes: list, *, total: int, page: int, limit: int
+) -> HeroListResponse:
+    """Assemble the list response (pagination, sort rules, echoed filters)."""
+    total_pages = (total + limit - 1) // limit
+    return HeroListResponse(
+        data=heroes,
+        pagination=Pagination(
+            currentPage=page,
+            totalPages=total_pages,
+            totalItems=total,
+            limit=limit,
+            hasMore=page < total_pages,
+            previousPage=page - 1 if page > 1 else None,
+            nextPage=page + 1 if page < total_pages else None,
+        ),
+        sort=Sort(fields=parse_order_rules(hero_filter)), # 👈 使用组装好的规则列表
+        filters=Filters(
+            search=hero_filter.search,
+            powers__contains_any=hero_filter.powers__contains_any,
+            powers__contains_all=hero_filter.powers__contains_all,
+        ),
+    )
+
+
 @router.post("", response_model=HeroResponse, status_code=status.HTTP_201_CREATED)
 async def create_hero(
     data: HeroCreate, service: HeroService = Depends(get_hero_service)
@@ -25,13 +104,57 @@ async def create_hero(
     """Create new hero."""
     try:
         created_hero = await service.create_hero(data=data)
-        logger.info(f"Created hero with id: {created_hero.id}")
+        if sample("create_hero"):
+            logger.info("Created hero with id: {}", created_hero.id)
         return created_hero
     except Exception as e:
-        logger.error(f"Failed to create hero: {e}")
+        logger.error("Failed to create hero: {}", e)
         raise
 
 
+@router.post(
+    "/batched",
+    response_model=HeroResponse | HeroCreateStatus,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def create_hero_batched(
+    data: HeroCreate,
+    response: Response,
+    wait: bool = Query(False, description="等待所在批次提交后再返回"),
+    batcher: HeroCreateBatcher = Depends(get_hero_batcher),
+) -> HeroResponse | HeroCreateStatus:
+    """
+    Enqueue a hero for batched creation.
+
+    By default returns 202 with a tracking id; with `wait=true` the request is
+    held until its batch commits and returns 201 like the synchronous endpoint.
+    """
+    pending = batcher.submit(data, wait=wait)
+    if pending.future is None:
+        return batcher.get_status(pending.tracking_id)
+
+    result: HeroCreateStatus = await pending.future
+    if result.status == "conflict":
+        raise AlreadyExistsException(result.detail)
+    if result.status == "failed":
+        # 整批已回滚 (分片模式下已补偿)，客户端可以安全重试
+        raise ServiceUnavailableException(f"Batched create failed: {result.detail}")
+    response.status_code = status.HTTP_201_CREATED
+    return HeroResponse(id=result.hero_id, name=data.name, alias=data.alias)
+
+
+@router.get("/batched/{tracking_id}", response_model=HeroCreateStatus)
+async def get_batched_create_status(
+    tracking_id: str,
+    batcher: HeroCreateBatcher = Depends(get_hero_batcher),
+) -> HeroCreateStatus:
+    """Get the status of a batched hero creation."""
+    result = batcher.get_status(tracking_id)
+    if result is None:
+        raise NotFoundException(f"Tracking id {tracking_id} not found")
+    return result
+
+
 @router.get("", response_model=HeroListResponse)
 async def list_heroes(
     # 👇 见证奇迹的一行！
@@ -39,7 +162,7 @@ async def list_heroes(
     page: int = Query(1, ge=1, description="页码"),
     limit: int = Query(10, ge=1, le=100, description="每页数量"),
     # --- 依赖注入不变 ---
-    service: HeroService = Depends(get_hero_service),
+    service: HeroService = Depends(get_hero_read_service),
 ) -> HeroListResponse:
     try:
         offset = (page - 1) * limit
@@ -50,48 +173,69 @@ async def list_heroes(
             limit=limit,
             offset=offset,
         )
-        total_pages = (total + limit - 1) // limit
-
-        # --- 返回结构组装逻辑 (与之前类似) ---
-        # 注意: order_by 现在可能是逗号分隔的字符串，需要处理
-        order_by_list = hero_filter.order_by[0].split(',') if hero_filter.order_by else []
-        order_rules = [
-            OrderByRule(field=f.lstrip("-"), dir="desc" if f.startswith("-") else "asc")
-            for f in order_by_list
-        ]
-
-        # 4. 组装最终的返回对象
-        return HeroListResponse(
-            data=heroes,
-            pagination=Pagination(
-                currentPage=page,
-                totalPages=total_pages,
-                totalItems=total,
-                limit=limit,
-                hasMore=page < total_pages,
-                previousPage=page - 1 if page > 1 else None,
-                nextPage=page + 1 if page < total_pages else None,
-            ),
-            sort=Sort(fields=order_rules), # 👈 使用组装好的规则列表
-            filters=Filters(search=hero_filter.search),
-        )
+        if sample("list_heroes"):
+            logger.info("Listed heroes page={} limit={} total={}", page, limit, total)
+
+        return build_hero_list_response(hero_filter, heroes, total=total, page=page, limit=limit)
     except Exception as e:
-        logger.error(f"Failed to fetch heroes: {e}")
+        logger.error("Failed to fetch heroes: {}", e)
         raise
 
 
+# 注意: /suggest、/tags 和 /changes 必须注册在 /{hero_id} 之前，否则会被当作 hero_id 解析
+@router.get("/suggest", response_model=HeroSuggestResponse)
+async def suggest_heroes(
+    prefix: str = Query(..., min_length=1, max_length=100, description="name/alias 前缀"),
+    limit: int = Query(settings.SUGGEST.MAX_RESULTS, ge=1, le=settings.SUGGEST.MAX_RESULTS, description="返回数量"),
+    service: HeroService = Depends(get_hero_read_service),
+) -> HeroSuggestResponse:
+    """Autocomplete heroes by name/alias prefix."""
+    return await service.suggest_heroes(prefix=prefix, limit=limit)
+
+
+@router.get("/tags", response_model=HeroTagFacetResponse)
+async def list_power_tags(
+    limit: int = Query(20, ge=1, le=settings.TAG_FACETS.MAX_RESULTS, description="返回数量"),
+    service: HeroService = Depends(get_hero_read_service),
+) -> HeroTagFacetResponse:
+    """Most common power tags with hero counts (cached aggregation)."""
+    return await service.get_power_tag_facets(limit=limit)
+
+
+@router.get("/changes", response_class=StreamingResponse)
+async def stream_hero_changes(
+    last_event_id: str | None = Header(None, alias="Last-Event-ID"),
+    broker: HeroChangeBroker = Depends(get_hero_change_broker),
+) -> StreamingResponse:
+    """
+    Stream hero create/update/delete events as Server-Sent Events.
+
+    Reconnects may send `Last-Event-ID` to resume. Event ids belong to the
+    worker that served the stream, so resuming only works with one worker or
+    sticky sessions. Whenever the stream can't prove nothing was missed it
+    sends `event: reset` with a `reason`; the client should then refetch the
+    hero list and keep reading this stream.
+    """
+    return StreamingResponse(
+        broker.stream(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/{hero_id}", response_model=HeroResponse)
 async def get_hero(
     hero_id: int,
-    service: HeroService = Depends(get_hero_service),
+    service: HeroService = Depends(get_hero_read_service),
 ) -> HeroResponse:
     """Get hero by id."""
     try:
         hero = await service.get_hero(hero_id=hero_id)
-        logger.info(f"Retrieved hero {hero_id}")
+        if sample("get_hero"):
+            logger.info("Retrieved hero {}", hero_id)
         return hero
     except Exception as e:
-        logger.error(f"Failed to get hero {hero_id}: {e}")
+        logger.error("Failed to get hero {}: {}", hero_id, e)
         raise
 
 
@@ -104,10 +248,11 @@ async def update_hero(
     """Update hero."""
     try:
         updated_hero = await service.update_hero(data=data, hero_id=hero_id)
-        logger.info(f"Updated hero {hero_id}")
+        if sample("update_hero"):
+            logger.info("Updated hero {}", hero_id)
         return updated_hero
     except Exception as e:
-        logger.error(f"Failed to update hero {hero_id}: {e}")
+        logger.error("Failed to update hero {}: {}", hero_id, e)
         raise
 
 
@@ -119,22 +264,24 @@ async def delete_hero(
     """Delete hero."""
     try:
         await service.delete_hero(hero_id=hero_id)
-        logger.info(f"Deleted hero {hero_id}")
+        if sample("delete_hero"):
+            logger.info("Deleted hero {}", hero_id)
     except Exception as e:
-        logger.error(f"Failed to delete hero {hero_id}: {e}")
+        logger.error("Failed to delete hero {}: {}", hero_id, e)
         raise
   
   
 @router.get("/{hero_id}/story", response_model=HeroStoryResponse)
 async def generate_hero_story(
     hero_id: int,
-    service: HeroService = Depends(get_hero_service),
+    service: HeroService = Depends(get_hero_read_service),
 ) -> HeroResponse:
     """Generate hero story."""
     try:
         story = await service.get_hero_with_story(hero_id=hero_id)
-        logger.info(f"Generated story for hero {hero_id}")
+        if sample("generate_hero_story"):
+            logger.info("Generated story for hero {}", hero_id)
         return story
     except Exception as e:
-        logger.error(f"Failed to generate hero's story for hero_id={hero_id}: {e}")
+        logger.error("Failed to generate hero's story for hero_id={}: {}", hero_id, e)
         raise
\ No newline at end of file
@@ -0,0 +1,220 @@
+# app/core/admission.py
+"""
+准入控制与过载降级 (load shedding)。
+
+连接池耗尽时，每个请求都会在连接池里排队最多 POOL_TIMEOUT 秒才失败，
+结果是过载时所有人的延迟都变成 30 秒。这里在请求进入路由之前做一次"准入"：
+
+- 按路由类别 (write / read / heavy) 限制并发，并有一个全局并发上限；
+- 超出上限的请求进入有界队列，排队超过 QUEUE_TIMEOUT 就快速失败；
+- 队列满时直接返回 503 + Retry-After；
+- 写接口优先于列表/搜索这类重查询被唤醒；
+- 根据连接池借出等待时间 (见 database.get_checkout_wait_ewma) 自适应收缩
+  read / heavy 的并发上限 (AIMD)，写接口的上限不受影响。
+"""
+import asyncio
+import json
+import math
+import time
+from collections import deque
+
+from loguru import logger
+
+from app.core.config import AdmissionSettings
+from app.core.database import get_checkout_wait_ewma
+from app.core.metrics import metrics
+
+# 路由类别，按优先级从高到低排列
+WRITE = "write"
+READ = "read"
+HEAVY = "heavy"
+PRIORITY_ORDER = (WRITE, READ, HEAVY)
+
+_WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+class AdmissionRejected(Exception):
+    """请求未被准入 (队列已满或排队超时)。"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """带优先级、有界队列和自适应并发上限的准入控制器。"""
+
+    def __init__(self, config: AdmissionSettings):
+        self.config = config
+        self.max_concurrency = config.MAX_CONCURRENCY
+        # 配置的上限 (天花板) 与当前生效的上限
+        self.limits = {
+            WRITE: config.WRITE_LIMIT,
+            READ: config.READ_LIMIT,
+            HEAVY: config.HEAVY_LIMIT,
+        }
+        self.effective_limits = dict(self.limits)
+        self.inflight = {c: 0 for c in PRIORITY_ORDER}
+        self._total = 0
+        self._queues: dict[str, deque[asyncio.Future]] = {
+            c: deque() for c in PRIORITY_ORDER
+        }
+        self._last_adapt = time.monotonic()
+
+    # --- 路由分类 ---
+    def classify(self, method: str, path: str) -> str:
+        if method in _WRITE_METHODS:
+            return WRITE
+        if path.rstrip("/") in self.config.HEAVY_PATHS:
+            return HEAVY
+        return READ
+
+    # --- 准入 / 释放 ---
+    def _can_admit(self, route_class: str) -> bool:
+        return (
+            self._total < self.max_concurrency
+            and self.inflight[route_class] < self.effective_limits[route_class]
+        )
+
+    def _has_priority_waiters(self, route_class: str) -> bool:
+        """是否存在同级或更高优先级的排队请求 (新请求不能插队)。"""
+        for c in PRIORITY_ORDER:
+            if self._queues[c]:
+                return True
+            if c == route_class:
+                return False
+        return False
+
+    def _admit(self, route_class: str) -> None:
+        self._total += 1
+        self.inflight[route_class] += 1
+        metrics.set_gauge("admission_inflight", self.inflight[route_class], route_class=route_class)
+
+    def retry_after(self) -> int:
+        """根据排队超时和连接池等待估算客户端的重试间隔 (秒)。"""
+        return max(1, math.ceil(self.config.QUEUE_TIMEOUT + get_checkout_wait_ewma()))
+
+    async def acquire(self, route_class: str) -> None:
+        """获取一个执行名额；无法准入时抛出 AdmissionRejected。"""
+        if self._can_admit(route_class) and not self._has_priority_waiters(route_class):
+            self._admit(route_class)
+            return
+
+        queue = self._queues[route_class]
+        if len(queue) >= self.config.MAX_QUEUE:
+            metrics.inc("admission_rejected_total", route_class=route_class, reason="queue_full")
+            raise AdmissionRejected("queue_full", self.retry_after())
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        queue.append(future)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.config.QUEUE_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # 超时与唤醒同时发生: 名额已经分配给我们，必须归还
+                self.release(route_class)
+            else:
+                future.cancel()
+                try:
+                    queue.remove(future)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            metrics.inc("admission_rejected_total", route_class=route_class, reason="queue_timeout")
+            raise AdmissionRejected("queue_timeout", self.retry_after())
+        finally:
+            metrics.observe("admission_queue_seconds", time.perf_counter() - start, route_class=route_class)
+
+    def release(self, route_class: str) -> None:
+        self._total -= 1
+        self.inflight[route_class] -= 1
+        metrics.set_gauge("admission_inflight", self.inflight[route_class], route_class=route_class)
+        self._maybe_adapt()
+        self._wake()
+
+    def _wake(self) -> None:
+        """按优先级唤醒排队的请求，直到没有空闲名额。"""
+        for route_class in PRIORITY_ORDER:
+            queue = self._queues[route_class]
+            while queue and self._can_admit(route_class):
+                future = queue.popleft()
+                if future.done():
+                    continue
+                self._admit(route_class)
+                future.set_result(None)
+            if self._total >= self.max_concurrency:
+                return
+
+    # --- 自适应并发上限 (AIMD) ---
+    def _maybe_adapt(self) -> None:
+        now = time.monotonic()
+        if now - self._last_adapt < self.config.ADAPT_INTERVAL:
+            return
+        self._last_adapt = now
+
+        wait = get_checkout_wait_ewma()
+        metrics.set_gauge("db_pool_checkout_wait_ewma_seconds", wait)
+        for route_class in (READ, HEAVY):
+            current = self.effective_limits[route_class]
+            if wait > self.config.TARGET_POOL_WAIT:
+                # 连接池饱和: 乘性减小，最少保留 1 个名额
+                new = max(1, int(current * 0.75))
+            else:
+                # 连接池健康: 加性恢复到配置的上限
+                new = min(self.limits[route_class], current + 1)
+            if new != current:
+                logger.info(
+                    "Admission limit for {} adjusted {} -> {} (pool wait {:.3f}s)",
+                    route_class, current, new, wait,
+                )
+                self.effective_limits[route_class] = new
+                metrics.set_gauge("admission_limit", new, route_class=route_class)
+
+
+class AdmissionControlMiddleware:
+    """
+    纯 ASGI 中间件 (不使用 BaseHTTPMiddleware，避免额外的任务与内存拷贝)。
+    只对 /api/ 下的业务接口生效，文档和健康检查接口不受限制。
+    """
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not scope["path"].startswith("/api/")
+            or scope["path"].rstrip("/") in self.controller.config.EXEMPT_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        route_class = self.controller.classify(scope["method"], scope["path"])
+        try:
+            await self.controller.acquire(route_class)
+        except AdmissionRejected as e:
+            await self._reject(send, e)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(route_class)
+
+    @staticmethod
+    async def _reject(send, exc: AdmissionRejected) -> None:
+        body = json.dumps({"detail": "Service overloaded, please retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(exc.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -6,7 +6,7 @@ from typing import Literal
 # 使用 Python 3.8+ 内置的 importlib.metadata
 from importlib import metadata
 
-from pydantic import computed_field
+from pydantic import Field, computed_field, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -35,12 +35,22 @@ class DatabaseSettings(BaseSettings):
     PASSWORD: str = "postgres"
     DB: str = "tutorial"
 
-    # 连接池配置
-    POOL_SIZE: int = 10
-    MAX_OVERFLOW: int = 20
-    POOL_TIMEOUT: int = 30
+    # 连接池配置 (可以热加载，见 app/core/reload.py)
+    POOL_SIZE: int = Field(10, ge=1)
+    MAX_OVERFLOW: int = Field(20, ge=0)
+    POOL_TIMEOUT: int = Field(30, gt=0)
     POOL_RECYCLE: int = 3600
     ECHO: bool = False
+    # 热加载替换引擎后，等待旧连接池中借出的连接归还的最长时间 (秒)，超时后强制关闭
+    DRAIN_TIMEOUT: float = Field(60.0, gt=0)
+    # 启动预热: 在接收请求之前打开 POOL_SIZE 个连接，并在每个连接上预先准备热点语句
+    WARMUP_ENABLED: bool = False
+    # 预热的总时间上限 (秒)，超时后放弃剩余部分继续启动
+    WARMUP_TIMEOUT: float = Field(10.0, gt=0)
+    # 英雄分片 (REPOSITORY.BACKEND=sharded): 每个分片的连接串，按 id 的哈希路由到其中一个。
+    # 上面配置的主库作为查找分片，负责全局 id 分配、alias 唯一性和变更通知。
+    # 增减分片后用 scripts/rebalance_hero_shards.py 迁移数据；修改后需要重启。
+    SHARD_URLS: list[str] = []
 
     # 使用 @computed_field，可以在模型内部根据其他字段动态生成新字段
     # 这比在模型外部手动拼接字符串要优雅得多。
@@ -51,7 +61,257 @@ class DatabaseSettings(BaseSettings):
         return f"postgresql+asyncpg://{self.USER}:{self.PASSWORD}@{self.HOST}:{self.PORT}/{self.DB}"
 
     # model_config 的设置在这里同样适用，用于 Pydantic 如何加载这些设置
-    model_config = SettingsConfigDict(env_prefix="DEMO_DB_")
+    model_config = SettingsConfigDict(env_prefix="DEMO_DB_", extra="ignore")
+
+
+class AdmissionSettings(BaseSettings):
+    """准入控制 (过载保护) 相关配置"""
+
+    ENABLED: bool = True
+    # 全局并发上限，默认与连接池容量 (POOL_SIZE + MAX_OVERFLOW) 对齐
+    MAX_CONCURRENCY: int = 30
+    # 按路由类别的并发上限: write 为写接口，read 为普通读接口，heavy 为列表/搜索接口
+    WRITE_LIMIT: int = 20
+    READ_LIMIT: int = 20
+    HEAVY_LIMIT: int = 10
+    # 每个类别最多允许多少请求排队等待
+    MAX_QUEUE: int = 100
+    # 排队的最长时间 (秒)，超过即快速失败返回 503，而不是等满 POOL_TIMEOUT
+    QUEUE_TIMEOUT: float = 1.0
+    # 连接池借出等待的目标值 (秒)，超过后自动收缩 read/heavy 的并发上限
+    TARGET_POOL_WAIT: float = 0.05
+    # 自适应调整的最小间隔 (秒)
+    ADAPT_INTERVAL: float = 1.0
+    # 被视为重查询 (列表/搜索) 的 GET 路径
+    HEAVY_PATHS: list[str] = ["/api/v1/heroes"]
+    # 不参与准入控制的长连接接口 (如 SSE)，否则它们会永久占用并发名额
+    EXEMPT_PATHS: list[str] = ["/api/v1/heroes/changes"]
+
+    model_config = SettingsConfigDict(env_prefix="DEMO_ADMISSION_", extra="ignore")
+
+
+class DeadlineSettings(BaseSettings):
+    """请求截止时间 (deadline) 相关配置"""
+
+    ENABLED: bool = True
+    # 未单独配置的接口使用的默认时间预算 (秒)
+    DEFAULT_BUDGET: float = 10.0
+    # 按 "METHOD 路径" 配置的时间预算 (秒)，路径不含末尾斜杠
+    ROUTE_BUDGETS: dict[str, float] = {
+        "GET /api/v1/heroes": 5.0,
+        "POST /api/v1/heroes": 3.0,
+    }
+    # 转换为 statement_timeout 时至少保留的毫秒数，避免预算即将耗尽时设置为 0 (即不限制)
+    MIN_STATEMENT_TIMEOUT_MS: int = 50
+    # 不设截止时间的长连接接口 (如 SSE)
+    EXEMPT_PATHS: list[str] = ["/api/v1/heroes/changes"]
+
+    model_config = SettingsConfigDict(env_prefix="DEMO_DEADLINE_", extra="ignore")
+
+
+class BatchSettings(BaseSettings):
+    """英雄异步批量创建 (write-behind) 相关配置"""
+
+    ENABLED: bool = False
+    # 单批最多合并多少条创建请求
+    MAX_BATCH_SIZE: int = 500
+    # 第一条请求入队后最多等待多久就刷写 (秒)
+    MAX_BATCH_DELAY: float = 0.05
+    # 队列容量，满了之后新的请求会收到 503 (背压)
+    MAX_QUEUE: int = 10000
+    # 保留最近多少条请求的处理结果，供 tracking id 查询
+    MAX_TRACKED: int = 100000
+    # 关闭时无法写入数据库的请求会落盘到这个文件，下次启动时重新入队
+    SPOOL_PATH: str = "hero_create_spool.jsonl"
+
+    model_config = SettingsConfigDict(env_prefix="DEMO_BATCH_", extra="ignore")
+
+
+class ChangeStreamSettings(BaseSettings):
+    """英雄变更事件流 (SSE + LISTEN/NOTIFY) 相关配置"""
+
+    ENABLED: bool = True
+    # 每个订阅者最多缓冲多少条未发送的事件，超过即断开该慢消费者
+    SUBSCRIBER_BUFFER: int = 256
+    # 每个 worker 在内存中保留最近多少条事件，用于 Last-Event-ID 断点续传
+    REPLAY_BUFFER: int = 10000
+    # SSE 心跳间隔 (秒)，防止代理因空闲断开连接
+    HEARTBEAT_INTERVAL: float = 15.0
+    # LISTEN 连接断开后的重连间隔 (秒)
+    RECONNECT_DELAY: float = 1.0
+
+    model_config = SettingsConfigDict(env_prefix="DEMO_CHANGES_", extra="ignore")
+
+
+class SuggestSettings(BaseSettings):
+    """英雄自动补全相关配置"""
+
+    ENABLED: bool = True
+    # 单次返回的最大条数
+    MAX_RESULTS: int = 10
+    # 索引构建期间最多缓存多少条变更事件，超过后丢弃缓存并重新构建
+    MAX_PENDING_EVENTS: int = 10000
+    # 构建失败后的重试间隔 (秒)，每次失败翻倍，最长 BUILD_RETRY_MAX
+    BUILD_RETRY_DELAY: float = 1.0
+    BUILD_RETRY_MAX: float = 60.0
+
+    model_config = SettingsConfigDict(env_prefix="DEMO_SUGGEST_", extra="ignore")
+
+
+class RepositorySettings(BaseSettings):
+    """英雄存储后端配置"""
+
+    # sqlalchemy: PostgreSQL; memory: 进程内存储，用于去掉数据库后压测/剖析纯 Python 开销;
+    # sharded: 英雄按 id 哈希分布在 DB.SHARD_URLS 的多个 PostgreSQL 上
+    BACKEND: Literal["sqlalchemy", "memory", "sharded"] = "sqlalchemy"
+    # memory 后端启动时生成的合成英雄数量
+    SEED_HEROES: int = 0
+    # sharded 后端列表的最大 offset: 每个分片都要返回 offset+limit 行，深分页的开销随分片数成倍增长
+    SHARDED_MAX_OFFSET: int = Field(1000, ge=0)
+
+    model_config = SettingsConfigDict(env_prefix="DEMO_REPOSITORY_", extra="ignore")
+
+
+class TagFacetSettings(BaseSettings):
+    """能力标签计数 (GET /heroes/tags) 配置"""
+
+    # 聚合需要扫描全表，结果在进程内缓存的时间 (秒)
+    CACHE_TTL: float = Field(60.0, gt=0)
+    # 单次请求最多返回的标签数量
+    MAX_RESULTS: int = Field(100, ge=1)
+
+    model_config = SettingsConfigDict(env_prefix="DEMO_TAG_FACETS_", extra="ignore")
+
+
+class LoopMonitorSettings(BaseSettings):
+    """事件循环延迟监控配置 (见 app/core/loop_monitor.py)"""
+
+    ENABLED: bool = True
+    # 采样间隔 (秒)
+    INTERVAL: float = Field(0.1, gt=0)
+    # 计算 p99/max 仪表的窗口 (秒)
+    WINDOW: float = Field(10.0, gt=0)
+    # 延迟超过这个值 (秒) 视为一次阻塞
+    BLOCK_THRESHOLD: float = Field(0.1, gt=0)
+    # 阻塞时是否抓取事件循环线程的调用栈；不设置时跟随 DEBUG
+    CAPTURE_STACKS: bool | None = None
+    STACK_LIMIT: int = 30
+
+    model_config = SettingsConfigDict(env_prefix="DEMO_LOOP_MONITOR_", extra="ignore")
+
+
+class ProfilingSettings(BaseSettings):
+    """单请求性能剖析配置 (见 app/core/profiling.py)"""
+
+    # 为 False 时不安装剖析中间件，没有任何开销
+    ENABLED: bool = False
+    # 请求头的值等于 DEMO_ADMIN_TOKEN 时剖析该请求
+    HEADER: str = "X-Profile"
+    # 随机抽样剖析的比例，0 表示只按请求头触发
+    SAMPLE_RATE: float = Field(0.0, ge=0.0, le=1.0)
+    # 剖析结果 (折叠栈) 的保存目录和保留数量
+    OUTPUT_DIR: str = "profiles"
+    MAX_PROFILES: int = Field(100, ge=1)
+
+    model_config = SettingsConfigDict(env_prefix="DEMO_PROFILE_", extra="ignore")
+
+
+class MemoryProfilingSettings(BaseSettings):
+    """内存诊断接口配置 (见 app/core/memory_profiling.py 和 /admin/memory)"""
+
+    # tracemalloc 为每个分配记录的调用栈深度；越深越容易定位，开销和内存占用也越大
+    TRACEMALLOC_FRAMES: int = Field(10, ge=1)
+    # 内存中保留的快照数量，超出时丢弃最早的
+    MAX_SNAPSHOTS: int = Field(10, ge=1)
+    # GET /admin/memory 总是报告这些类型的存活对象数量 (按类名匹配)
+    TRACKED_TYPES: list[str] = [
+        "Hero", "HeroResponse", "HeroListResponse", "AsyncSession", "Session",
+        "InstanceState", "traceback", "frame", "Task",
+    ]
+
+    model_config = SettingsConfigDict(env_prefix="DEMO_MEMORY_", extra="ignore")
+
+
+class TrafficCaptureSettings(BaseSettings):
+    """线上流量抽样录制配置 (见 app/core/traffic_capture.py，回放见 scripts/replay_traffic.py)"""
+
+    # 为 False 时不安装录制中间件，没有任何开销
+    ENABLED: bool = False
+    # 被录制的请求比例 (0~1)
+    SAMPLE_RATE: float = Field(0.01, ge=0.0, le=1.0)
+    # 录制文件 (JSONL，每行一个请求)，追加写入
+    OUTPUT_PATH: str = "requests.jsonl"
+    # 录满这么多条后停止录制，防止写满磁盘
+    MAX_RECORDS: int = Field(100000, ge=1)
+    # 请求体超过这个大小时不保存请求体
+    MAX_BODY_BYTES: int = Field(65536, ge=0)
+    # 后台写入队列容量，写入跟不上时丢弃记录而不是阻塞事件循环
+    QUEUE_SIZE: int = 10000
+    # 只录制这些前缀下的请求；其中 EXCLUDE_PATHS 列出的不录制 (流式接口、管理接口等)
+    PATH_PREFIXES: list[str] = ["/api/"]
+    EXCLUDE_PATHS: list[str] = ["/api/v1/heroes/changes"]
+    # 名称包含这些词 (不区分大小写) 的查询参数和请求体字段会被替换为 [REDACTED]
+    SCRUB_FIELDS: list[str] = ["password", "token", "secret", "api_key", "email", "phone"]
+
+    model_config = SettingsConfigDict(env_prefix="DEMO_CAPTURE_", extra="ignore")
+
+
+class AdminSettings(BaseSettings):
+    """管理接口 (/admin) 相关配置"""
+
+    # 通过 X-Admin-Token 请求头校验；未设置时管理接口全部禁用
+    TOKEN: str | None = None
+
+    model_config = SettingsConfigDict(env_prefix="DEMO_ADMIN_", extra="ignore")
+
+
+_DEFAULT_SECRET_KEY = "change-me-in-production"
+
+
+class AuthSettings(BaseSettings):
+    """认证相关配置"""
+
+    # 令牌签名密钥，生产环境必须通过 DEMO_AUTH_SECRET_KEY 覆盖 (否则启动失败)
+    SECRET_KEY: str = _DEFAULT_SECRET_KEY
+    # 访问令牌有效期 (秒)
+    TOKEN_TTL: int = 3600
+    # 已验证令牌的 LRU 缓存容量
+    TOKEN_CACHE_SIZE: int = 4096
+    # scrypt 参数: N=2^14, r=8 约 16MB 内存、几十毫秒 CPU
+    SCRYPT_N: int = 2**14
+    SCRYPT_R: int = 8
+    SCRYPT_P: int = 1
+    # 执行密码哈希的进程数，0 表示使用 CPU 核数
+    HASH_WORKERS: int = 0
+    # 为 True 时英雄接口需要登录
+    PROTECT_HEROES: bool = False
+
+    model_config = SettingsConfigDict(env_prefix="DEMO_AUTH_", extra="ignore")
+
+
+class LoggingSettings(BaseSettings):
+    """日志相关配置"""
+
+    LEVEL: str = "INFO"
+    # 输出结构化 JSON (每行一个对象)，便于日志平台采集
+    JSON: bool = True
+    # 在后台线程写入日志，事件循环只负责把格式化好的记录放入内存队列
+    BACKGROUND: bool = True
+    # 后台队列容量，写入速度跟不上时丢弃新日志而不是阻塞事件循环
+    QUEUE_SIZE: int = 10000
+    # loguru 的 diagnose 会在异常堆栈中展开变量值，开销大且可能泄露敏感数据
+    DIAGNOSE: bool = False
+    # 可选的日志文件路径 (为空时只输出到 stdout)
+    FILE_PATH: str | None = None
+    # 成功日志的默认采样率 (0~1)，错误日志总是记录
+    SUCCESS_SAMPLE_RATE: float = 1.0
+    # 按路由函数名单独设置的成功日志采样率
+    ROUTE_SAMPLE_RATES: dict[str, float] = {
+        "list_heroes": 0.01,
+        "get_hero": 0.1,
+    }
+
+    model_config = SettingsConfigDict(env_prefix="DEMO_LOG_", extra="ignore")
 
 
 class Settings(BaseSettings):
@@ -68,6 +328,20 @@ class Settings(BaseSettings):
     # 将 DatabaseSettings 作为主 Settings 的一个字段。
     # Pydantic 会自动处理带有 'DEMO_DB_' 前缀的环境变量，并填充到这个模型中。
     DB: DatabaseSettings = DatabaseSettings()
+    ADMISSION: AdmissionSettings = AdmissionSettings()
+    DEADLINE: DeadlineSettings = DeadlineSettings()
+    BATCH: BatchSettings = BatchSettings()
+    CHANGES: ChangeStreamSettings = ChangeStreamSettings()
+    LOG: LoggingSettings = LoggingSettings()
+    SUGGEST: SuggestSettings = SuggestSettings()
+    AUTH: AuthSettings = AuthSettings()
+    REPOSITORY: RepositorySettings = RepositorySettings()
+    ADMIN: AdminSettings = AdminSettings()
+    PROFILE: ProfilingSettings = ProfilingSettings()
+    CAPTURE: TrafficCaptureSettings = TrafficCaptureSettings()
+    MEMORY: MemoryProfilingSettings = MemoryProfilingSettings()
+    LOOP_MONITOR: LoopMonitorSettings = LoopMonitorSettings()
+    TAG_FACETS: TagFacetSettings = TagFacetSettings()
 
     # Pydantic-settings 的核心配置
     model_config = SettingsConfigDict(
@@ -77,10 +351,41 @@ class Settings(BaseSettings):
         env_prefix="DEMO_",
         # 允许大小写不敏感的环境变量
         case_sensitive=False,
+        # env 文件中同时包含各嵌套配置的变量 (如 DEMO_DB_HOST)，顶层忽略不认识的键
+        extra="ignore",
     )
 
+    @model_validator(mode="after")
+    def _check_production_secret_key(self) -> "Settings":
+        # 默认或空密钥签发的令牌任何人都能伪造，生产环境直接拒绝启动 (热加载时拒绝新配置)
+        if self.ENVIRONMENT == "prod" and self.AUTH.SECRET_KEY.strip() in ("", _DEFAULT_SECRET_KEY):
+            raise ValueError("DEMO_AUTH_SECRET_KEY must be set to a non-default value when ENVIRONMENT is prod")
+        return self
+
 
 # --- 缓存与依赖注入 ---
+def get_env_file() -> str:
+    """根据 ENVIRONMENT 环境变量来决定加载哪个 .env 文件"""
+    return f".env.{os.getenv('ENVIRONMENT', 'dev')}"
+
+
+def load_settings() -> Settings:
+    """
+    从环境变量和 env 文件读取并校验一份新的配置，校验失败时抛出 ValidationError。
+
+    嵌套配置的默认值在导入模块时就已经构造好了 (只读取了当时的环境变量)，
+    所以这里逐个重新构造，使它们同样读取 env 文件。
+    """
+    env_file = get_env_file()
+    sections = {
+        name: field.annotation(_env_file=env_file)
+        for name, field in Settings.model_fields.items()
+        if isinstance(field.default, BaseSettings)
+    }
+    # 动态创建 Settings 实例，会覆盖 SettingsConfigDict 中的 env_file 设置
+    return Settings(_env_file=env_file, **sections)  # type: ignore
+
+
 # 这是整个配置系统的关键入口点。
 @lru_cache
 def get_settings() -> Settings:
@@ -91,19 +396,22 @@ def get_settings() -> Settings:
     1. 性能: 配置只在应用启动时被加载和解析一次，而不是在每个请求中。
     2. 一致性 (单例): 应用的任何部分调用此函数都将获得完全相同的配置对象实例。
 
-    这意味着，如果你在应用运行时更改了 .env 文件，你需要重启应用才能使更改生效。
+    运行中修改 env 文件后，可以发送 SIGHUP 或调用 POST /admin/config/reload 重新加载
+    (见 app/core/reload.py)。重新加载会原地更新这个实例，所有持有它的模块都能看到新值。
     """
     print("正在加载配置...") # 这条消息只会在应用首次启动时打印一次
 
-    # 根据 ENVIRONMENT 环境变量来决定加载哪个 .env 文件
-    # 这是一个非常灵活的模式
-    env = os.getenv("ENVIRONMENT", "dev")
-    env_file = f".env.{env}"
-    # 动态创建 Settings 实例，会覆盖 SettingsConfigDict 中的 env_file 设置
-    settings = Settings(_env_file=env_file)  # type: ignore
-    print(f"成功加载 '{env}' 环境配置 for {settings.APP_NAME}")
+    settings = load_settings()
+    print(f"成功加载 '{os.getenv('ENVIRONMENT', 'dev')}' 环境配置 for {settings.APP_NAME}")
     return settings
 
 
+def apply_settings(new: Settings) -> None:
+    """把新配置原地写入全局的 settings 实例 (逐个替换顶层字段和嵌套配置)。"""
+    current = get_settings()
+    for name in Settings.model_fields:
+        setattr(current, name, getattr(new, name))
+
+
 # 在应用启动时就创建一个实例，方便在非 FastAPI 上下文中使用
-settings = get_settings()
\ No newline at end of file
+settings = get_settings()
@@ -1,5 +1,9 @@
 # /fastapi-demo-project/app/core/database.py
-from typing import Optional, AsyncGenerator
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional, AsyncGenerator
+from sqlalchemy import event, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
     async_sessionmaker,
@@ -7,13 +11,67 @@ from sqlalchemy.ext.asyncio import (
     AsyncEngine,
 )
 from loguru import logger
-from app.core.config import settings
+from app.core.config import DatabaseSettings, settings
+from app.core.metrics import metrics
+from app.core.deadline import remaining_budget
 # 导入统一的 Base 类
 from app.models.base import Base
 
 # --- 1. 全局变量定义 ---
 _engine: Optional[AsyncEngine] = None
 _SessionFactory: Optional[async_sessionmaker[AsyncSession]] = None
+# 只读请求使用的会话工厂: 与 _engine 共用连接池，事务以 BEGIN READ ONLY 开启
+_ReadSessionFactory: Optional[async_sessionmaker[AsyncSession]] = None
+# 分片模式 (REPOSITORY.BACKEND=sharded) 下每个英雄分片的引擎和会话工厂，下标即分片号
+_shard_engines: list[AsyncEngine] = []
+_ShardSessionFactories: list[async_sessionmaker[AsyncSession]] = []
+_ShardReadSessionFactories: list[async_sessionmaker[AsyncSession]] = []
+# 配置热加载后被替换下来、正在等待借出连接归还的旧引擎
+_draining: set[asyncio.Task] = set()
+
+# 连接池借出等待时间的指数加权移动平均 (秒)，供准入控制等组件感知连接池饱和度
+_checkout_wait_ewma: float = 0.0
+_EWMA_ALPHA = 0.2
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    在默认的异步队列连接池之上，统计每次借出连接的等待时间。
+
+    连接池耗尽时，请求会在 `connect()` 中最多阻塞 POOL_TIMEOUT 秒，
+    这里的耗时就是"连接池饱和"最直接的信号。
+    """
+
+    def connect(self):
+        global _checkout_wait_ewma
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            waited = time.perf_counter() - start
+            _checkout_wait_ewma += _EWMA_ALPHA * (waited - _checkout_wait_ewma)
+            metrics.observe("db_pool_checkout_wait_seconds", waited)
+
+
+def get_checkout_wait_ewma() -> float:
+    """返回最近一段时间连接池借出等待时间的平滑均值 (秒)。"""
+    return _checkout_wait_ewma
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+    connection_record.info["checked_out_at"] = time.perf_counter()
+
+
+def _on_checkin(dbapi_connection, connection_record) -> None:
+    # 连接被借出的总时长: 累计值除以墙钟时间即平均同时占用的连接数
+    checked_out_at = connection_record.info.pop("checked_out_at", None)
+    if checked_out_at is not None:
+        metrics.observe("db_connection_hold_seconds", time.perf_counter() - checked_out_at)
+
+
+def database_is_connected() -> bool:
+    return _engine is not None
+
 
 def get_engine() -> AsyncEngine:
     if _engine is None:
@@ -30,47 +88,250 @@ def get_session_factory() -> async_sessionmaker[AsyncSession]:
 # --- 2. 通用的数据库初始化和关闭函数 ---
 # 这些函数现在是通用的，可以在任何需要初始化数据库的地方调用。
 # 它们负责设置全局的 engine 和 SessionFactory。
+def _session_factories(
+    engine: AsyncEngine,
+) -> tuple[async_sessionmaker[AsyncSession], async_sessionmaker[AsyncSession]]:
+    """返回 (读写, 只读) 两个会话工厂。"""
+    # SessionFactory 是一个"会话的工厂"，配置一次，随处使用
+    factory = async_sessionmaker(class_=AsyncSession, expire_on_commit=False, bind=engine)
+    # 只读事务: 仍然有事务，SET LOCAL statement_timeout 才能生效 (AUTOCOMMIT 下会被忽略)；
+    # 连接归还连接池时 SQLAlchemy 会把 readonly 复位
+    read_factory = async_sessionmaker(
+        class_=AsyncSession,
+        expire_on_commit=False,
+        bind=engine.execution_options(postgresql_readonly=True),
+    )
+    return factory, read_factory
+
+
+def _install_engine(engine: AsyncEngine) -> None:
+    global _engine, _SessionFactory, _ReadSessionFactory
+    _engine = engine
+    _SessionFactory, _ReadSessionFactory = _session_factories(engine)
+
+
+def _create_engine(config: DatabaseSettings, url: Optional[str] = None) -> AsyncEngine:
+    engine = create_async_engine(
+        # 从我们上一章的 settings 对象中读取计算生成的数据库连接字符串 (分片使用各自的连接串)
+        url or config.DATABASE_URL,
+        pool_size=config.POOL_SIZE,
+        max_overflow=config.MAX_OVERFLOW,
+        pool_timeout=config.POOL_TIMEOUT,
+        pool_recycle=config.POOL_RECYCLE,
+        echo=config.ECHO,
+        pool_pre_ping=True,
+        # 使用带等待时间统计的连接池
+        poolclass=TimedQueuePool,
+    )
+    event.listen(engine.sync_engine.pool, "checkout", _on_checkout)
+    event.listen(engine.sync_engine.pool, "checkin", _on_checkin)
+    return engine
+
+
 async def setup_database_connection():
     """
     初始化全局的数据库引擎和会话工厂。
     这是一个通用的设置函数，可以在 FastAPI 启动时调用。
     """
-    global _engine, _SessionFactory
-    
     if _engine is not None:
         logger.info("数据库已初始化，跳过重复设置。")
         return
     
     logger.info("正在创建数据库引擎...")
-    _engine = create_async_engine(
-        # 从我们上一章的 settings 对象中读取计算生成的数据库连接字符串
-        settings.DB.DATABASE_URL,
-        pool_size=settings.DB.POOL_SIZE,
-        max_overflow=settings.DB.MAX_OVERFLOW,
-        pool_timeout=settings.DB.POOL_TIMEOUT,
-        pool_recycle=settings.DB.POOL_RECYCLE,
-        echo=settings.DB.ECHO,
-        pool_pre_ping=True,
-    )
-    
-    # SessionFactory 是一个"会话的工厂"，配置一次，随处使用
-    _SessionFactory = async_sessionmaker(
-        class_=AsyncSession, expire_on_commit=False, bind=_engine
-    )
+    _install_engine(_create_engine(settings.DB))
+    metrics.set_gauge("db_pool_size", settings.DB.POOL_SIZE)
+    metrics.set_gauge("db_pool_max_overflow", settings.DB.MAX_OVERFLOW)
     
     logger.info("数据库引擎和会话工厂已成功创建。")
 
+
+async def warm_up_database_pool(
+    config: DatabaseSettings,
+    prepare: Optional[Callable[[AsyncSession], Awaitable[None]]] = None,
+) -> int:
+    """
+    在接收请求之前把连接池预热到 POOL_SIZE 个连接。
+
+    同时借出 POOL_SIZE 个连接 (连接池为空，每次借出都会新建连接，完成 TCP/TLS、
+    认证和 asyncpg 的类型内省)，然后在每个连接上执行 prepare(session)，
+    让 asyncpg 的预备语句缓存和 SQLAlchemy 的编译缓存提前就绪。最后全部归还连接池。
+
+    整个过程最多 WARMUP_TIMEOUT 秒，超时或出错只记录日志，不阻止启动。
+    返回成功预热的连接数。
+    """
+    engine = get_engine()
+    start = time.perf_counter()
+
+    async def warm_one(conn) -> None:
+        if prepare is not None:
+            async with AsyncSession(bind=conn, expire_on_commit=False) as session:
+                await prepare(session)
+                await session.rollback()
+
+    # 每个连接建立后立即登记，超时取消 gather 时已建立的连接也能在 finally 中归还
+    connections = []
+
+    async def connect_one() -> None:
+        connections.append(await engine.connect())
+
+    warmed = 0
+    try:
+        async with asyncio.timeout(config.WARMUP_TIMEOUT):
+            results = await asyncio.gather(*(connect_one() for _ in range(config.POOL_SIZE)), return_exceptions=True)
+            errors = [e for e in results if isinstance(e, BaseException)]
+            if errors:
+                logger.warning("预热时有 {} 个连接建立失败: {}", len(errors), errors[0])
+            prepared = await asyncio.gather(*(warm_one(c) for c in connections), return_exceptions=True)
+            failures = [e for e in prepared if isinstance(e, BaseException)]
+            if failures:
+                logger.warning("预热时有 {} 个连接预备语句失败: {}", len(failures), failures[0])
+            warmed = len(connections) - len(failures)
+    except TimeoutError:
+        logger.warning("连接池预热超过 {}s，跳过剩余部分继续启动。", config.WARMUP_TIMEOUT)
+    finally:
+        # 关闭 AsyncConnection 会把底层连接归还连接池，而不是断开
+        for conn in connections:
+            await conn.close()
+
+    elapsed = time.perf_counter() - start
+    metrics.observe("db_warmup_seconds", elapsed)
+    metrics.set_gauge("db_warmup_connections", warmed)
+    logger.info("连接池预热完成: {}/{} 个连接，耗时 {:.3f}s。", warmed, config.POOL_SIZE, elapsed)
+    return warmed
+
+
+async def swap_database_engine(config: DatabaseSettings) -> None:
+    """
+    用新配置创建引擎并替换全局引擎，实现连接池的热调整。
+
+    新引擎先连一次数据库验证配置可用，失败时抛出异常、保持旧引擎不变。
+    替换之后新请求从新的会话工厂拿会话；已经在执行的请求持有的是旧引擎上的连接，
+    它们照常在旧连接池上完成。旧引擎在后台等待所有借出的连接归还 (最多
+    DRAIN_TIMEOUT 秒) 后再关闭，所以切换过程中不会中断任何请求。
+    """
+    if _engine is None:
+        raise RuntimeError("数据库引擎未初始化. 请先调用 setup_database_connection")
+
+    new_engine = _create_engine(config)
+    try:
+        async with new_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    except Exception:
+        await new_engine.dispose()
+        raise
+
+    old_engine = _engine
+    _install_engine(new_engine)
+    metrics.set_gauge("db_pool_size", config.POOL_SIZE)
+    metrics.set_gauge("db_pool_max_overflow", config.MAX_OVERFLOW)
+    metrics.inc("db_engine_swaps_total")
+
+    task = asyncio.create_task(_drain_engine(old_engine, config.DRAIN_TIMEOUT), name="db-engine-drain")
+    _draining.add(task)
+    task.add_done_callback(_draining.discard)
+    metrics.set_gauge("db_engines_draining", len(_draining))
+
+
+async def _drain_engine(engine: AsyncEngine, timeout: float) -> None:
+    """等待旧引擎借出的连接全部归还后关闭它；超时则强制关闭。"""
+    pool = engine.sync_engine.pool
+    start = time.perf_counter()
+    try:
+        while pool.checkedout() and time.perf_counter() - start < timeout:
+            await asyncio.sleep(0.05)
+        if pool.checkedout():
+            logger.warning("旧连接池在 {}s 内仍有 {} 个连接未归还，强制关闭。", timeout, pool.checkedout())
+        await engine.dispose()
+        elapsed = time.perf_counter() - start
+        metrics.observe("db_engine_drain_seconds", elapsed)
+        logger.info("旧数据库引擎已排空并关闭，耗时 {:.2f}s。", elapsed)
+    finally:
+        metrics.set_gauge("db_engines_draining", len(_draining) - 1)
+
+
+# --- 分片 ---
+def shard_for_id(hero_id: int, shard_count: int) -> int:
+    """
+    英雄 id -> 分片号，使用 Jump Consistent Hash (Lamping & Veach, 2014)。
+
+    与 `hash % N` 不同，分片数从 N 增加到 N+1 时只有约 1/(N+1) 的英雄需要迁移到新分片，
+    其余英雄的分片号保持不变；新分片追加在 SHARD_URLS 末尾即可。
+    """
+    key = hero_id & 0xFFFFFFFFFFFFFFFF
+    bucket, jump = -1, 0
+    while jump < shard_count:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+async def setup_shard_connections(config: DatabaseSettings) -> None:
+    """为 SHARD_URLS 中的每个分片创建引擎；每个分片使用与主库相同的连接池参数。"""
+    if _shard_engines:
+        return
+    if not config.SHARD_URLS:
+        raise RuntimeError("分片存储需要配置 DEMO_DB_SHARD_URLS")
+    for url in config.SHARD_URLS:
+        engine = _create_engine(config, url)
+        factory, read_factory = _session_factories(engine)
+        _shard_engines.append(engine)
+        _ShardSessionFactories.append(factory)
+        _ShardReadSessionFactories.append(read_factory)
+    metrics.set_gauge("db_shards", len(_shard_engines))
+    logger.info("已创建 {} 个英雄分片的数据库引擎。", len(_shard_engines))
+
+
+def get_shard_session_factories() -> list[async_sessionmaker[AsyncSession]]:
+    if not _ShardSessionFactories:
+        raise RuntimeError("分片未初始化. 请先调用 setup_shard_connections")
+    return _ShardSessionFactories
+
+
+def get_shard_read_session_factories() -> list[async_sessionmaker[AsyncSession]]:
+    if not _ShardReadSessionFactories:
+        raise RuntimeError("分片未初始化. 请先调用 setup_shard_connections")
+    return _ShardReadSessionFactories
+
+
 async def close_database_connection():
-    """在应用关闭时，关闭全局的数据库引擎连接池。"""
-    global _engine, _SessionFactory
+    """在应用关闭时，关闭全局的数据库引擎连接池 (包括分片)。"""
+    global _engine, _SessionFactory, _ReadSessionFactory
     
+    # 先等待热加载留下的旧引擎关闭
+    if _draining:
+        await asyncio.gather(*_draining, return_exceptions=True)
+    if _shard_engines:
+        await asyncio.gather(*(engine.dispose() for engine in _shard_engines))
+        _shard_engines.clear()
+        _ShardSessionFactories.clear()
+        _ShardReadSessionFactories.clear()
     if _engine:
         await _engine.dispose()
         _engine = None
         _SessionFactory = None
+        _ReadSessionFactory = None
         logger.info("数据库引擎连接池已关闭。")
 
 # --- 3. 依赖注入魔法：获取会话 ---
+def _apply_statement_timeout(session, transaction, connection) -> None:
+    """
+    在每个事务开始时，把当前请求剩余的时间预算设置为事务级的 statement_timeout。
+    使用 SET LOCAL，事务结束 (提交或回滚) 后自动失效，不会污染连接池里的连接。
+    """
+    budget = remaining_budget()
+    if budget is None:
+        return
+    timeout_ms = max(int(budget * 1000), settings.DEADLINE.MIN_STATEMENT_TIMEOUT_MS)
+    connection.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+
+def apply_request_deadline(session: AsyncSession) -> None:
+    """请求带有截止时间时，把剩余预算下推为会话中每个事务的 statement_timeout。"""
+    if remaining_budget() is not None:
+        event.listen(session.sync_session, "after_begin", _apply_statement_timeout)
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     FastAPI 依赖注入函数，为每个请求提供一个独立的数据库会话。
@@ -80,11 +341,27 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
     
     # 从会话工厂创建一个新的会话
     async with _SessionFactory() as session:
+        # 请求带有截止时间时，把剩余预算下推为数据库的 statement_timeout
+        apply_request_deadline(session)
         # 使用 yield 将会话提供给路径函数
         yield session
         # 当请求处理完成后，async with 会自动处理会话的关闭
 
 
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    只读请求的会话: 查询在 BEGIN READ ONLY 事务中执行，和 get_db 一样把剩余预算
+    下推为 SET LOCAL statement_timeout。仓储在最后一条查询后关闭会话 (回滚只读事务)，
+    连接在序列化响应之前就归还连接池。
+    """
+    if _ReadSessionFactory is None:
+        raise RuntimeError("数据库会话工厂未初始化。请确保在应用启动时调用了 setup_database_connection()。")
+    
+    async with _ReadSessionFactory() as session:
+        apply_request_deadline(session)
+        yield session
+
+
 # --- 4. 辅助工具：创建数据库表 ---
 async def create_db_and_tables():
     """
@@ -93,7 +370,9 @@ async def create_db_and_tables():
     """
     if not _engine:
         raise RuntimeError("数据库引擎未初始化。请确保在应用启动时调用了 setup_database_connection()。")
-    async with _engine.begin() as conn:
-        # 让 SQLAlchemy 根据所有继承了 Base 的模型类去创建表
-        await conn.run_sync(Base.metadata.create_all)
-        logger.info("数据库表已成功同步/创建。")
\ No newline at end of file
+    # 分片使用与主库相同的表结构
+    for engine in (_engine, *_shard_engines):
+        async with engine.begin() as conn:
+            # 让 SQLAlchemy 根据所有继承了 Base 的模型类去创建表
+            await conn.run_sync(Base.metadata.create_all)
+    logger.info("数据库表已成功同步/创建。")
\ No newline at end of file
@@ -0,0 +1,123 @@
+# app/core/deadline.py
+"""
+请求级截止时间 (deadline) 传播。
+
+每个接口有一个时间预算，中间件在请求开始时算出绝对截止时间并放进 ContextVar，
+下游的 get_db 会把剩余预算转换成 Postgres 的 statement_timeout。
+
+当截止时间到达或客户端断开连接时，中间件会取消正在执行的请求任务，
+asyncpg 收到取消后会向服务端发送 CancelRequest，正在执行的查询随之终止，
+连接尽快回到连接池，而不是把一个没人要的 count/分页查询跑完。
+"""
+import asyncio
+import json
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from loguru import logger
+
+from app.core.config import DeadlineSettings
+from app.core.metrics import metrics
+
+# 当前请求的绝对截止时间 (time.monotonic())，None 表示不限制
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def get_deadline() -> Optional[float]:
+    """返回当前请求的绝对截止时间。"""
+    return _deadline.get()
+
+
+def remaining_budget() -> Optional[float]:
+    """返回当前请求剩余的时间预算 (秒)，没有截止时间时返回 None。"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+class DeadlineMiddleware:
+    """
+    纯 ASGI 中间件: 为请求设置截止时间，并在超时或客户端断开时取消请求任务。
+    """
+
+    def __init__(self, app, config: DeadlineSettings):
+        self.app = app
+        self.config = config
+
+    def budget_for(self, method: str, path: str) -> tuple[str, float]:
+        key = f"{method} {path.rstrip('/')}"
+        budget = self.config.ROUTE_BUDGETS.get(key)
+        if budget is None:
+            return "default", self.config.DEFAULT_BUDGET
+        return key, budget
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not scope["path"].startswith("/api/")
+            or scope["path"].rstrip("/") in self.config.EXEMPT_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        route, budget = self.budget_for(scope["method"], scope["path"])
+        token = _deadline.set(time.monotonic() + budget)
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        # 由单独的任务读取 receive，再转交给应用；这样应用读完请求体之后，
+        # 我们仍然能第一时间感知到 http.disconnect。
+        inbox: asyncio.Queue = asyncio.Queue()
+        app_task = asyncio.create_task(self.app(scope, inbox.get, send_wrapper))
+        disconnected = False
+
+        async def watch_disconnect():
+            nonlocal disconnected
+            while True:
+                message = await receive()
+                await inbox.put(message)
+                if message["type"] == "http.disconnect":
+                    disconnected = True
+                    app_task.cancel()
+                    return
+
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            await asyncio.wait_for(asyncio.shield(app_task), budget)
+        except asyncio.TimeoutError:
+            app_task.cancel()
+            await asyncio.gather(app_task, return_exceptions=True)
+            metrics.inc("request_deadline_exceeded_total", route=route)
+            logger.warning("Deadline of {}s exceeded for {} {}", budget, scope["method"], scope["path"])
+            if not response_started:
+                await self._timeout_response(send)
+        except asyncio.CancelledError:
+            if not disconnected:
+                raise
+            metrics.inc("request_cancelled_on_disconnect_total", route=route)
+            logger.info("Client disconnected, cancelled {} {}", scope["method"], scope["path"])
+        finally:
+            watcher.cancel()
+            if not app_task.done():
+                app_task.cancel()
+            _deadline.reset(token)
+
+    @staticmethod
+    async def _timeout_response(send) -> None:
+        body = json.dumps({"detail": "Request deadline exceeded"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 504,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -2,6 +2,12 @@
 from fastapi import HTTPException, Request, status
 from fastapi.responses import JSONResponse
 from loguru import logger
+from sqlalchemy.exc import DBAPIError
+
+from app.core.metrics import metrics
+
+# Postgres 的 query_canceled 错误码 (statement_timeout 或主动取消)
+QUERY_CANCELED_SQLSTATE = "57014"
 
 # ------------------ 业务异常: 继承自 HTTPException，所以 FastAPI 能直接处理 ------------------
 
@@ -13,6 +19,10 @@ class AlreadyExistsException(HTTPException):
     def __init__(self, detail: str = "Resource already exists"):
         super().__init__(status_code=status.HTTP_409_CONFLICT, detail=detail)
 
+class BadRequestException(HTTPException):
+    def __init__(self, detail: str = "Bad request"):
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
 class UnauthorizedException(HTTPException):
     def __init__(self, detail: str = "Unauthorized access"):
         super().__init__(status_code=status.HTTP_401_UNAUTHORIZED, detail=detail)
@@ -21,11 +31,37 @@ class ForbiddenException(HTTPException):
     def __init__(self, detail: str = "Access forbidden"):
         super().__init__(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
 
+class GatewayTimeoutException(HTTPException):
+    def __init__(self, detail: str = "Request deadline exceeded"):
+        super().__init__(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=detail)
+
+class ServiceUnavailableException(HTTPException):
+    def __init__(self, detail: str = "Service unavailable", retry_after: int = 1):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": str(retry_after)},
+        )
+
+# ------------------ 数据库错误: 区分超时与其他错误 ------------------
+
+async def db_exception_handler(request: Request, exc: DBAPIError) -> JSONResponse:
+    # statement_timeout 触发的查询取消属于"预算耗尽"，返回 504 并计数
+    if getattr(exc.orig, "sqlstate", None) == QUERY_CANCELED_SQLSTATE:
+        metrics.inc("db_statement_timeout_total")
+        logger.warning("Statement timeout at {}", request.url.path)
+        return JSONResponse(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            content={"detail": "Request deadline exceeded"},
+        )
+    return await global_exception_handler(request, exc)
+
 # ------------------ 全局兜底: 捕获所有未被处理的异常 ------------------
 
 async def global_exception_handler(request: Request, exc: Exception) -> JSONResponse:
-    # 使用 loguru 记录详细的异常信息，包括堆栈跟踪
-    logger.exception(f"Unhandled exception at {request.url.path}: {exc}")
+    # 使用 loguru 记录异常信息和堆栈跟踪 (diagnose 默认关闭，不展开变量值)，
+    # 使用参数而不是 f-string，写入由后台 sink 完成
+    logger.opt(exception=exc).error("Unhandled exception at {}: {}", request.url.path, exc)
     # 向客户端返回一个通用的、安全的错误信息
     return JSONResponse(
         status_code=500,
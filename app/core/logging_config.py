@@ -0,0 +1,107 @@
+# app/core/logging_config.py
+"""
+日志配置: 后台写入 + 结构化输出 + 成功日志采样。
+
+- sink 的 I/O 在后台线程完成，事件循环只把格式化好的字符串放进内存队列；
+  队列满时丢弃并计数，绝不阻塞事件循环。
+  (没有使用 loguru 的 enqueue=True: 它经由 multiprocessing 管道和 pickle 传递记录，
+  sink 变慢时管道写满同样会阻塞调用方。)
+- serialize=True 输出每行一个 JSON 对象；
+- 成功日志按路由采样，错误日志总是记录。采样判断放在调用 logger 之前，
+  未被采样的请求连消息格式化都不会发生，例如:
+
+      if sample("get_hero"):
+          logger.info("Retrieved hero {}", hero_id)
+"""
+import queue
+import random
+import sys
+import threading
+from typing import Optional, TextIO
+
+from loguru import logger
+
+from app.core.config import LoggingSettings
+from app.core.metrics import metrics
+
+_default_rate: float = 1.0
+_route_rates: dict[str, float] = {}
+_background_sinks: list["BackgroundSink"] = []
+
+
+class BackgroundSink:
+    """把日志写入交给后台线程的 sink，调用方只做一次非阻塞的入队。"""
+
+    def __init__(self, stream: TextIO, max_queue: int, dropped_metric: str = "log_records_dropped_total"):
+        self._stream = stream
+        self._dropped_metric = dropped_metric
+        self._queue: queue.Queue[Optional[str]] = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    # 注意: 不要定义 flush()，loguru 会在每条日志后调用它
+    def write(self, message: str) -> None:
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            metrics.inc(self._dropped_metric)
+
+    def _run(self) -> None:
+        while True:
+            message = self._queue.get()
+            if message is None:
+                self._queue.task_done()
+                return
+            self._stream.write(message)
+            # 队列暂时为空时才 flush，高峰期合并多次写入
+            if self._queue.empty():
+                self._stream.flush()
+            self._queue.task_done()
+
+    def drain(self) -> None:
+        """阻塞直到队列中的日志全部写出。"""
+        self._queue.join()
+        self._stream.flush()
+
+    def close(self) -> None:
+        """写完队列中剩余的内容后停止后台线程。"""
+        self._queue.put(None)
+        self._thread.join()
+        self._stream.flush()
+
+
+def setup_logging(config: LoggingSettings) -> None:
+    """替换 loguru 的默认 handler (同步写 stderr)，应在应用启动时调用一次。"""
+    global _default_rate, _route_rates
+    _default_rate = config.SUCCESS_SAMPLE_RATE
+    _route_rates = dict(config.ROUTE_SAMPLE_RATES)
+
+    logger.remove()
+    options = dict(
+        level=config.LEVEL,
+        serialize=config.JSON,
+        diagnose=config.DIAGNOSE,
+        backtrace=False,
+    )
+    streams: list[TextIO] = [sys.stdout]
+    if config.FILE_PATH:
+        streams.append(open(config.FILE_PATH, "a", encoding="utf-8"))
+    for stream in streams:
+        if config.BACKGROUND:
+            sink = BackgroundSink(stream, config.QUEUE_SIZE)
+            _background_sinks.append(sink)
+            logger.add(sink, **options)
+        else:
+            logger.add(stream, **options)
+
+
+def sample(route: str) -> bool:
+    """按路由的采样率决定这次成功日志是否记录。"""
+    rate = _route_rates.get(route, _default_rate)
+    return rate >= 1.0 or random.random() < rate
+
+
+def flush_logging() -> None:
+    """等待后台队列中的日志全部写出，应用关闭时调用。"""
+    for sink in _background_sinks:
+        sink.drain()
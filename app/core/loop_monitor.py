@@ -0,0 +1,139 @@
+# app/core/loop_monitor.py
+"""
+事件循环延迟 (lag) 监控与阻塞调用检测。
+
+任何在事件循环线程上同步执行的耗时操作 (同步 I/O、print 到慢终端、CPU 密集计算……)
+都会让同一时刻所有并发请求一起变慢，而且在单个请求的耗时里看不出来。
+
+- 采样协程每 INTERVAL 秒 sleep 一次，实际醒来时间比预期晚多少就是循环延迟，
+  导出为 event_loop_lag_seconds 摘要，以及每个 WINDOW 内的 p99/max 仪表。
+- 调试模式 (DEBUG 或 CAPTURE_STACKS) 下再启动一个看门狗线程: 采样协程超过
+  BLOCK_THRESHOLD 秒没有心跳时，抓取事件循环线程当前的调用栈写入日志，
+  直接定位是哪段代码占住了循环。
+- 同时导出线程池的排队情况: 同步 (def) 路由和同步依赖由 anyio 的默认线程池执行，
+  令牌用完后请求会排队；asyncio.to_thread 使用的是事件循环的默认执行器。
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+import anyio.to_thread
+from loguru import logger
+
+from app.core.config import LoopMonitorSettings
+from app.core.metrics import metrics
+
+
+class LoopLagMonitor:
+    def __init__(self, config: LoopMonitorSettings, capture_stacks: bool):
+        self.config = config
+        self.capture_stacks = capture_stacks
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        # 采样协程最近一次运行的时间 (time.monotonic)，看门狗线程读取
+        self._heartbeat = time.monotonic()
+        self._window: list[float] = []
+        self._window_start = time.monotonic()
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.create_task(self._run(), name="loop-lag-monitor")
+        if self.capture_stacks:
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    # --- 采样 ---
+    async def _run(self) -> None:
+        interval = self.config.INTERVAL
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            lag = max(loop.time() - expected, 0.0)
+            self._heartbeat = time.monotonic()
+            self._record(lag)
+            self._report_threadpools(loop)
+
+    def _record(self, lag: float) -> None:
+        metrics.observe("event_loop_lag_seconds", lag)
+        metrics.set_gauge("event_loop_lag_last_seconds", lag)
+        if lag >= self.config.BLOCK_THRESHOLD:
+            metrics.inc("event_loop_stalls_total")
+        self._window.append(lag)
+        now = time.monotonic()
+        if now - self._window_start >= self.config.WINDOW:
+            values = sorted(self._window)
+            metrics.set_gauge("event_loop_lag_p99_seconds", values[min(len(values) - 1, int(len(values) * 0.99))])
+            metrics.set_gauge("event_loop_lag_max_seconds", values[-1])
+            self._window = []
+            self._window_start = now
+
+    @staticmethod
+    def _report_threadpools(loop: asyncio.AbstractEventLoop) -> None:
+        # 同步路由/依赖: anyio 默认线程池的容量限制器
+        stats = anyio.to_thread.current_default_thread_limiter().statistics()
+        metrics.set_gauge("threadpool_busy_threads", stats.borrowed_tokens)
+        metrics.set_gauge("threadpool_capacity", stats.total_tokens)
+        metrics.set_gauge("threadpool_queue_depth", stats.tasks_waiting)
+        # asyncio.to_thread / run_in_executor(None, ...) 使用的默认执行器
+        executor = getattr(loop, "_default_executor", None)
+        if executor is not None:
+            metrics.set_gauge("asyncio_executor_queue_depth", executor._work_queue.qsize())
+
+    # --- 阻塞检测 (调试模式) ---
+    def _watch(self) -> None:
+        threshold = self.config.BLOCK_THRESHOLD
+        reported_heartbeat = None
+        while not self._stop.wait(threshold / 4):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.config.INTERVAL
+            # 同一次阻塞只报告一次
+            if stalled < threshold or heartbeat == reported_heartbeat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            reported_heartbeat = heartbeat
+            metrics.inc("event_loop_blocked_stacks_total")
+            logger.warning(
+                "Event loop blocked for more than {:.3f}s, loop thread stack:\n{}",
+                stalled,
+                "".join(traceback.format_stack(frame, limit=self.config.STACK_LIMIT)),
+            )
+
+
+# --- 全局单例 ---
+_monitor: Optional[LoopLagMonitor] = None
+
+
+async def start_loop_monitor(config: LoopMonitorSettings, debug: bool) -> None:
+    global _monitor
+    if _monitor is not None:
+        return
+    capture = config.CAPTURE_STACKS if config.CAPTURE_STACKS is not None else debug
+    _monitor = LoopLagMonitor(config, capture_stacks=capture)
+    _monitor.start()
+    logger.info("事件循环延迟监控已启动 (interval={}s, 阻塞栈捕获={})。", config.INTERVAL, capture)
+
+
+async def stop_loop_monitor() -> None:
+    global _monitor
+    if _monitor is not None:
+        await _monitor.stop()
+        _monitor = None
@@ -0,0 +1,87 @@
+# app/core/metrics.py
+"""
+一个极简的进程内指标注册表。
+
+项目没有引入 prometheus_client，这里只实现计数器 (counter)、仪表 (gauge)
+和摘要 (summary: count/sum/max) 三种类型，并能渲染成 Prometheus 文本格式，
+由 `/metrics` 端点输出。所有操作都是纯内存的字典读写，可以放心在请求热路径上调用。
+"""
+from threading import Lock
+
+
+def _key(name: str, labels: dict[str, str]) -> str:
+    """把指标名和标签拼接成 Prometheus 风格的唯一键，如 `name{route="x"}`。"""
+    if not labels:
+        return name
+    body = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    return f"{name}{{{body}}}"
+
+
+class Metrics:
+    """进程内指标注册表。"""
+
+    def __init__(self) -> None:
+        self._counters: dict[str, float] = {}
+        self._gauges: dict[str, float] = {}
+        # 摘要: key -> [count, sum, max]
+        self._summaries: dict[str, list[float]] = {}
+        # 连接池事件可能在线程池中触发，用一把锁保护写入
+        self._lock = Lock()
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """计数器自增。"""
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        """设置仪表的当前值。"""
+        self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """记录一次观测值 (如耗时)，累计 count/sum/max。"""
+        key = _key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                self._summaries[key] = [1, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                if value > summary[2]:
+                    summary[2] = value
+
+    def get(self, name: str, **labels: str) -> float:
+        """读取计数器或仪表的当前值，主要用于调试和脚本。"""
+        key = _key(name, labels)
+        return self._counters.get(key, self._gauges.get(key, 0))
+
+    def snapshot(self) -> dict[str, dict]:
+        """返回所有指标的字典快照。"""
+        return {
+            "counters": dict(self._counters),
+            "gauges": dict(self._gauges),
+            "summaries": {
+                k: {"count": c, "sum": s, "max": m}
+                for k, (c, s, m) in self._summaries.items()
+            },
+        }
+
+    def render(self) -> str:
+        """渲染为 Prometheus 文本暴露格式。"""
+        lines: list[str] = []
+        for key, value in sorted(self._counters.items()):
+            lines.append(f"{key} {value}")
+        for key, value in sorted(self._gauges.items()):
+            lines.append(f"{key} {value}")
+        for key, (count, total, maximum) in sorted(self._summaries.items()):
+            name, _, labels = key.partition("{")
+            suffix = "{" + labels if labels else ""
+            lines.append(f"{name}_count{suffix} {count}")
+            lines.append(f"{name}_sum{suffix} {total}")
+            lines.append(f"{name}_max{suffix} {maximum}")
+        return "\n".join(lines) + "\n"
+
+
+# 全局单例，整个应用共用一个注册表
+metrics = Metrics()
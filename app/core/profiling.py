@@ -0,0 +1,305 @@
+# app/core/profiling.py
+"""
+按需的单请求性能剖析。
+
+请求带有 `X-Profile: <DEMO_ADMIN_TOKEN>` 请求头，或者按 SAMPLE_RATE 被抽中时，
+只剖析这一个请求:
+
+- Python CPU: 请求任务每次在事件循环上运行 (协程的每一步) 时临时安装 sys.setprofile，
+  按完整调用栈累计自身耗时。同一事件循环上交错执行的其他请求不会被计入。
+- DB 等待: 通过 SQLAlchemy 的 before/after_cursor_execute 事件累计本请求的查询耗时。
+- 其余时间 (连接池借出、线程池、网络 I/O 等) 记为 other wait。
+
+结果保存为折叠栈 (folded stacks) 格式，每行 `帧1;帧2;帧3 微秒数`，
+可以直接交给 flamegraph.pl、speedscope、inferno 等工具生成火焰图。
+DB 等待和其他等待作为 `[db wait]` / `[other wait]` 伪帧出现，火焰图的宽度即墙钟时间。
+响应会带上 X-Profile-Id 头，通过 GET /admin/profiles/{id} 取回。
+
+未启用 (PROFILE.ENABLED=False) 时既不安装中间件也不注册数据库事件，没有任何开销。
+"""
+import asyncio
+import hmac
+import json
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import ProfilingSettings, settings
+from app.core.metrics import metrics
+
+
+class RequestProfile:
+    """一个请求的剖析数据。"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:16]
+        # 调用栈 (帧标签元组) -> 自身耗时 (纳秒)
+        self.stacks: dict[tuple[str, ...], int] = defaultdict(int)
+        self.cpu_ns = 0
+        self.on_loop_ns = 0
+        self.db_ns = 0
+        self.db_queries = 0
+
+
+# 当前请求的剖析对象；只有被剖析的请求会设置
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+def _c_label(func) -> str:
+    # 内置方法 (如 str.lower) 的 __qualname__ 已包含类型名，没有 __module__
+    qualname = getattr(func, "__qualname__", repr(func))
+    module = getattr(func, "__module__", None)
+    return f"{module}.{qualname}" if module else qualname
+
+
+class _StepTracer:
+    """sys.setprofile 回调: 把两次事件之间的时间记到当前调用栈上。"""
+
+    def __init__(self, profile: RequestProfile):
+        self.profile = profile
+        self.stack: list[str] = []
+        self.last = 0
+
+    def __call__(self, frame, event_name, arg):
+        now = time.perf_counter_ns()
+        if self.stack:
+            self.profile.stacks[tuple(self.stack)] += now - self.last
+            self.profile.cpu_ns += now - self.last
+        if event_name == "call":
+            self.stack.append(_frame_label(frame))
+        elif event_name == "c_call":
+            self.stack.append(_c_label(arg))
+        elif self.stack:  # return / c_return / c_exception
+            self.stack.pop()
+        # 回调自身的耗时不计入
+        self.last = time.perf_counter_ns()
+
+
+class _ProfiledCoroutine:
+    """
+    包装一个协程，只在它每一步执行期间开启 sys.setprofile。
+    协程挂起时各层帧会触发 return、恢复时重新触发 call，所以每一步都能得到完整的调用栈。
+    """
+
+    def __init__(self, coro, profile: RequestProfile):
+        self._coro = coro
+        self._profile = profile
+
+    def _step(self, method, *args):
+        tracer = _StepTracer(self._profile)
+        previous = sys.getprofile()
+        start = time.perf_counter_ns()
+        tracer.last = start
+        sys.setprofile(tracer)
+        try:
+            return method(*args)
+        finally:
+            sys.setprofile(previous)
+            self._profile.on_loop_ns += time.perf_counter_ns() - start
+
+    def send(self, value):
+        return self._step(self._coro.send, value)
+
+    def throw(self, *args):
+        return self._step(self._coro.throw, *args)
+
+    def close(self):
+        return self._coro.close()
+
+    def __next__(self):
+        return self.send(None)
+
+    def __iter__(self):
+        return self
+
+    def __await__(self):
+        return self
+
+
+# --- 数据库等待 ---
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter_ns())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    starts = conn.info.get("profile_query_start")
+    if profile is not None and starts:
+        profile.db_ns += time.perf_counter_ns() - starts.pop()
+        profile.db_queries += 1
+
+
+def _handle_error(exception_context):
+    starts = exception_context.connection.info.get("profile_query_start") if exception_context.connection else None
+    profile = _current.get()
+    if profile is not None and starts:
+        profile.db_ns += time.perf_counter_ns() - starts.pop()
+        profile.db_queries += 1
+
+
+_listeners_installed = False
+
+
+def install_db_listeners() -> None:
+    """注册数据库耗时统计事件 (只在启用剖析时调用)。"""
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    _listeners_installed = True
+
+
+# --- 存储 ---
+class ProfileStore:
+    """把剖析结果写入 OUTPUT_DIR，只保留最近 MAX_PROFILES 个。"""
+
+    def __init__(self, config: ProfilingSettings):
+        self.dir = Path(config.OUTPUT_DIR)
+        self.max_profiles = config.MAX_PROFILES
+        self._index: deque[dict] = deque()
+
+    async def save(self, profile: RequestProfile, meta: dict) -> None:
+        """
+        索引在事件循环上更新 (只有循环线程访问 _index)，写文件和删除旧文件放到线程中，
+        抽样剖析时不会在每个被剖析的请求后阻塞事件循环。
+        """
+        lines = [f"{';'.join(stack)} {ns // 1000}" for stack, ns in profile.stacks.items() if ns >= 1000]
+        root = f"{meta['method']} {meta['path']}"
+        lines = [f"{root};{line}" for line in lines]
+        for label, ms in (("[db wait]", meta["db_wait_ms"]), ("[other wait]", meta["other_wait_ms"])):
+            if ms >= 0.001:
+                lines.append(f"{root};{label} {int(ms * 1000)}")
+
+        self._index.append(meta)
+        expired = []
+        while len(self._index) > self.max_profiles:
+            expired.append(self._index.popleft()["id"])
+        try:
+            await asyncio.to_thread(self._write, profile.id, "\n".join(lines) + "\n", meta, expired)
+        except OSError:
+            if meta in self._index:
+                self._index.remove(meta)
+            raise
+
+    def _write(self, profile_id: str, folded: str, meta: dict, expired: list[str]) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        (self.dir / f"{profile_id}.folded").write_text(folded, encoding="utf-8")
+        (self.dir / f"{profile_id}.json").write_text(json.dumps(meta), encoding="utf-8")
+        for old_id in expired:
+            for suffix in (".folded", ".json"):
+                (self.dir / f"{old_id}{suffix}").unlink(missing_ok=True)
+
+    def list(self) -> list[dict]:
+        return list(reversed(self._index))
+
+    def read(self, profile_id: str) -> Optional[str]:
+        # 只接受自己生成的 id，防止路径穿越
+        if not any(m["id"] == profile_id for m in self._index):
+            return None
+        path = self.dir / f"{profile_id}.folded"
+        return path.read_text(encoding="utf-8") if path.exists() else None
+
+
+_store: Optional[ProfileStore] = None
+
+
+def get_profile_store() -> Optional[ProfileStore]:
+    return _store
+
+
+# --- 中间件 ---
+class ProfilingMiddleware:
+    """
+    纯 ASGI 中间件: 对带授权请求头或被抽样的请求做单请求剖析。
+    """
+
+    def __init__(self, app, config: ProfilingSettings):
+        global _store
+        self.app = app
+        self.config = config
+        self.header = config.HEADER.lower().encode()
+        _store = ProfileStore(config)
+        install_db_listeners()
+
+    def _should_profile(self, scope) -> bool:
+        if self.config.SAMPLE_RATE and random.random() < self.config.SAMPLE_RATE:
+            return True
+        token = settings.ADMIN.TOKEN
+        if not token:
+            return False
+        for name, value in scope["headers"]:
+            if name == self.header:
+                return hmac.compare_digest(value.decode("latin-1"), token)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile.id.encode())]}
+            await send(message)
+
+        token = _current.set(profile)
+        start = time.perf_counter_ns()
+        try:
+            await _ProfiledCoroutine(self.app(scope, receive, send_wrapper), profile)
+        finally:
+            wall_ns = time.perf_counter_ns() - start
+            _current.reset(token)
+            await self._finish(scope, profile, status_code, wall_ns)
+
+    async def _finish(self, scope, profile: RequestProfile, status_code: int, wall_ns: int) -> None:
+        # 剖析回调自身的开销: 任务在循环上运行的时间减去记到调用栈上的时间
+        overhead_ns = max(profile.on_loop_ns - profile.cpu_ns, 0)
+        other_ns = max(wall_ns - profile.cpu_ns - profile.db_ns - overhead_ns, 0)
+        meta = {
+            "id": profile.id,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": scope.get("query_string", b"").decode("latin-1"),
+            "status": status_code,
+            "wall_ms": wall_ns / 1e6,
+            "cpu_ms": profile.cpu_ns / 1e6,
+            "db_wait_ms": profile.db_ns / 1e6,
+            "db_queries": profile.db_queries,
+            "other_wait_ms": other_ns / 1e6,
+            "profiler_overhead_ms": overhead_ns / 1e6,
+        }
+        try:
+            await _store.save(profile, meta)
+        except OSError as e:
+            logger.error("Failed to save request profile {}: {}", profile.id, e)
+            return
+        metrics.inc("request_profiles_total")
+        logger.info(
+            "Profiled {} {} -> {}: wall={:.1f}ms cpu={:.1f}ms db={:.1f}ms ({} queries) other={:.1f}ms",
+            meta["method"], meta["path"], profile.id,
+            meta["wall_ms"], meta["cpu_ms"], meta["db_wait_ms"], meta["db_queries"], meta["other_wait_ms"],
+        )
@@ -0,0 +1,167 @@
+# app/core/reload.py
+"""
+配置热加载。
+
+触发方式: 向 worker 进程发送 SIGHUP，或调用 POST /admin/config/reload。
+
+流程:
+1. 重新读取环境变量和 env 文件并校验 (load_settings)，校验失败则保持原配置不变。
+2. 数据库配置有变化时先创建新引擎并验证能连上，再原子地替换全局引擎；
+   旧连接池上正在执行的请求照常完成，旧引擎排空后在后台关闭 (swap_database_engine)。
+   只改了 ECHO 时直接修改现有引擎，不需要替换。
+3. 把新配置原地写入全局 settings，之后每次读取 settings 的代码都会看到新值。
+   AUTH.SECRET_KEY 变化时同时清空已验证令牌的缓存，旧密钥签发的令牌立即失效。
+
+启动时就把配置拷贝进自身状态的组件 (准入控制、截止时间中间件、批量写入器、
+变更流、日志等) 不会热更新；这些字段发生变化时会在日志中提示需要重启。
+"""
+import asyncio
+import signal
+from typing import Any
+
+from loguru import logger
+from pydantic import ValidationError
+
+from app.core.config import apply_settings, load_settings, settings
+from app.core.database import database_is_connected, get_engine, swap_database_engine
+from app.core.metrics import metrics
+from app.core.security import clear_token_cache
+
+# 可以在运行中生效的配置段 (其余配置段的改动只有在重启后才完全生效)
+LIVE_SECTIONS = {"DB"}
+# 可以热加载的配置段中，需要重启才能生效的字段 (分片引擎只在启动时创建)
+RESTART_ONLY_FIELDS = {"DB.SHARD_URLS"}
+# 其余配置段中每次使用时都从 settings 读取、可以立即生效的字段
+LIVE_FIELDS = {"AUTH.SECRET_KEY", "AUTH.TOKEN_TTL"}
+# 日志中不输出这些字段的值
+_SECRET_FIELDS = {"PASSWORD", "SECRET_KEY", "TOKEN", "DATABASE_URL"}
+# 值为连接串 (或连接串列表) 的字段，输出时隐藏其中的密码
+_URL_FIELDS = {"SHARD_URLS"}
+
+_lock = asyncio.Lock()
+_signal_tasks: set[asyncio.Task] = set()
+
+
+class ConfigReloadError(Exception):
+    """新配置无效或无法应用；原配置保持不变。"""
+
+
+def _mask_url(url: str) -> str:
+    head, sep, tail = url.rpartition("@")
+    if not sep:
+        return url
+    scheme, _, credentials = head.partition("://")
+    return f"{scheme}://{credentials.split(':')[0]}:***@{tail}"
+
+
+def _masked(key: str, value: Any) -> Any:
+    if key in _SECRET_FIELDS:
+        return "***"
+    if key in _URL_FIELDS:
+        return [_mask_url(url) for url in value] if isinstance(value, list) else _mask_url(str(value))
+    return value
+
+
+def _diff(old: dict, new: dict, prefix: str = "") -> dict[str, tuple[Any, Any]]:
+    changes: dict[str, tuple[Any, Any]] = {}
+    for key in old.keys() | new.keys():
+        a, b = old.get(key), new.get(key)
+        # 只展开配置段 (DB、ADMISSION...)，字段本身是 dict 的 (如 ROUTE_BUDGETS) 整体比较
+        if not prefix and isinstance(a, dict) and isinstance(b, dict):
+            changes.update(_diff(a, b, f"{prefix}{key}."))
+        elif a != b:
+            changes[f"{prefix}{key}"] = (_masked(key, a), _masked(key, b))
+    return changes
+
+
+async def reload_configuration(source: str) -> dict[str, Any]:
+    """
+    重新加载配置，返回变更摘要。
+    新配置校验失败或新数据库引擎无法连接时抛出 ConfigReloadError，原配置保持不变。
+    """
+    async with _lock:
+        try:
+            new = load_settings()
+        except ValidationError as e:
+            metrics.inc("config_reloads_total", result="invalid")
+            logger.error("配置重新加载失败 (source={})，新配置无效: {}", source, e)
+            raise ConfigReloadError(str(e)) from e
+
+        changes = _diff(settings.model_dump(), new.model_dump())
+        db_changes = {k for k in changes if k.startswith("DB.") and k not in RESTART_ONLY_FIELDS}
+        restart_required = sorted(
+            k
+            for k in changes
+            if k not in LIVE_FIELDS and (k.split(".", 1)[0] not in LIVE_SECTIONS or k in RESTART_ONLY_FIELDS)
+        )
+
+        # 没有使用数据库时 (例如内存存储后端) 只更新配置
+        if db_changes and database_is_connected():
+            try:
+                if db_changes == {"DB.ECHO"}:
+                    get_engine().echo = new.DB.ECHO
+                else:
+                    await swap_database_engine(new.DB)
+            except Exception as e:
+                metrics.inc("config_reloads_total", result="failed")
+                logger.error("配置重新加载失败 (source={})，新数据库引擎不可用: {}", source, e)
+                raise ConfigReloadError(f"New database engine is unusable: {e}") from e
+
+        apply_settings(new)
+        # 缓存中的令牌是用旧密钥验证过的，不清空的话会一直有效到被淘汰或过期
+        token_cache_cleared = "AUTH.SECRET_KEY" in changes
+        if token_cache_cleared:
+            clear_token_cache()
+        metrics.inc("config_reloads_total", result="ok")
+        if changes:
+            logger.info(
+                "配置已重新加载 (source={})，变更: {}",
+                source,
+                {k: f"{a!r} -> {b!r}" for k, (a, b) in sorted(changes.items())},
+            )
+        else:
+            logger.info("配置已重新加载 (source={})，没有变化。", source)
+        if restart_required:
+            logger.warning("以下配置项可能被启动时创建的组件持有，重启后才完全生效: {}", restart_required)
+
+        return {
+            "changed": sorted(changes),
+            "engine_swapped": bool(db_changes - {"DB.ECHO"}) and database_is_connected(),
+            "restart_required": restart_required,
+            "token_cache_cleared": token_cache_cleared,
+        }
+
+
+# --- SIGHUP ---
+def _on_sighup() -> None:
+    task = asyncio.create_task(_reload_quietly(), name="config-reload-sighup")
+    _signal_tasks.add(task)
+    task.add_done_callback(_signal_tasks.discard)
+
+
+async def _reload_quietly() -> None:
+    try:
+        await reload_configuration("sighup")
+    except ConfigReloadError:
+        pass  # 已记录日志
+
+
+def install_sighup_handler() -> None:
+    """在当前事件循环上注册 SIGHUP 处理器 (不支持信号的平台上跳过)。"""
+    if not hasattr(signal, "SIGHUP"):
+        return
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, _on_sighup)
+    except (NotImplementedError, RuntimeError):
+        # 非主线程中的事件循环 (例如 TestClient) 不能注册信号处理器
+        return
+    logger.info("已注册 SIGHUP 配置热加载。")
+
+
+def remove_sighup_handler() -> None:
+    if not hasattr(signal, "SIGHUP"):
+        return
+    try:
+        asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+    except (NotImplementedError, RuntimeError):
+        return
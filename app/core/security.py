@@ -0,0 +1,185 @@
+# app/core/security.py
+"""
+密码哈希与访问令牌。
+
+- 密码使用标准库的 scrypt 哈希。scrypt 是刻意设计得很慢的 KDF (几十毫秒 CPU)，
+  如果直接在事件循环中执行，一次登录风暴就会让所有其他请求一起卡住，
+  所以哈希和校验都放到独立的进程池中执行 (进程池绕开了 GIL)。
+- 访问令牌是 HS256 签名的 JWT，无需查库即可校验。校验结果 (签名是否有效、载荷)
+  放在一个 LRU 缓存中，同一个令牌的后续请求只需一次字典查找和过期时间比较。
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import Depends, Header
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from loguru import logger
+
+from app.core.config import AuthSettings, settings
+from app.core.exceptions import ForbiddenException, UnauthorizedException
+from app.core.metrics import metrics
+
+# --- 1. 密码哈希 (在子进程中执行的纯函数，必须可被 pickle) ---
+
+
+def hash_password_sync(password: str, n: int, r: int, p: int) -> str:
+    """返回 `scrypt$n$r$p$salt$hash` 格式的哈希串。"""
+    salt = os.urandom(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=128 * r * n * 2)
+    return "$".join(
+        ["scrypt", str(n), str(r), str(p), base64.b64encode(salt).decode(), base64.b64encode(digest).decode()]
+    )
+
+
+def verify_password_sync(password: str, encoded: str) -> bool:
+    try:
+        algorithm, n, r, p, salt, expected = encoded.split("$")
+    except ValueError:
+        return False
+    if algorithm != "scrypt":
+        return False
+    n, r, p = int(n), int(r), int(p)
+    digest = hashlib.scrypt(
+        password.encode(), salt=base64.b64decode(salt), n=n, r=r, p=p, maxmem=128 * r * n * 2
+    )
+    return hmac.compare_digest(digest, base64.b64decode(expected))
+
+
+# --- 2. 进程池 (与 database.py 中 engine 的管理方式一致) ---
+_pool: Optional[ProcessPoolExecutor] = None
+_config: AuthSettings = settings.AUTH
+# 用户不存在时也执行一次校验，使响应时间不暴露用户名是否存在
+_dummy_hash: Optional[str] = None
+
+
+async def setup_password_hasher(config: AuthSettings) -> None:
+    global _pool, _config, _dummy_hash
+    if _pool is not None:
+        return
+    _config = config
+    # 启动时后台日志线程、事件循环监控线程等已经在运行，fork 一个多线程进程时
+    # 子进程可能继承被其他线程持有的锁而死锁，所以不用默认的 fork 启动方式
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    _pool = ProcessPoolExecutor(
+        max_workers=config.HASH_WORKERS or None, mp_context=multiprocessing.get_context(start_method)
+    )
+    _dummy_hash = await hash_password("dummy-password")
+    logger.info("密码哈希进程池已启动 (workers={})。", _pool._max_workers)
+
+
+async def close_password_hasher() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+async def _run_in_pool(func, *args):
+    if _pool is None:
+        raise RuntimeError("密码哈希进程池未初始化。请先调用 setup_password_hasher()")
+    start = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_pool, func, *args)
+    finally:
+        metrics.observe("auth_kdf_seconds", time.perf_counter() - start)
+
+
+async def hash_password(password: str) -> str:
+    return await _run_in_pool(hash_password_sync, password, _config.SCRYPT_N, _config.SCRYPT_R, _config.SCRYPT_P)
+
+
+async def verify_password(password: str, encoded: Optional[str]) -> bool:
+    # 没有哈希 (用户不存在) 时对假哈希做一次同等开销的校验
+    ok = await _run_in_pool(verify_password_sync, password, encoded or _dummy_hash)
+    return ok and encoded is not None
+
+
+# --- 3. 访问令牌 (HS256 JWT) ---
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+_JWT_HEADER = _b64url(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+
+
+def _sign(message: bytes) -> str:
+    return _b64url(hmac.new(settings.AUTH.SECRET_KEY.encode(), message, hashlib.sha256).digest())
+
+
+def create_access_token(user_id: int, username: str) -> str:
+    now = int(time.time())
+    payload = {"sub": str(user_id), "name": username, "iat": now, "exp": now + settings.AUTH.TOKEN_TTL}
+    signing_input = f"{_JWT_HEADER}.{_b64url(json.dumps(payload, separators=(',', ':')).encode())}"
+    return f"{signing_input}.{_sign(signing_input.encode())}"
+
+
+@lru_cache(maxsize=settings.AUTH.TOKEN_CACHE_SIZE)
+def _decode_token(token: str) -> Optional[dict]:
+    """校验签名并解析载荷；签名无效时返回 None。结果被 LRU 缓存。"""
+    metrics.inc("auth_token_cache_misses_total")
+    try:
+        header, payload, signature = token.split(".")
+    except ValueError:
+        return None
+    if header != _JWT_HEADER or not hmac.compare_digest(signature, _sign(f"{header}.{payload}".encode())):
+        return None
+    try:
+        return json.loads(_b64url_decode(payload))
+    except ValueError:
+        return None
+
+
+def clear_token_cache() -> None:
+    """清空已验证令牌的缓存 (签名密钥轮换后，旧密钥签发的令牌必须重新校验)。"""
+    _decode_token.cache_clear()
+
+
+def verify_access_token(token: str) -> dict:
+    """返回令牌载荷；签名无效或已过期时抛出 401。"""
+    claims = _decode_token(token)
+    # 过期时间每次都要检查，缓存只省掉签名校验和 JSON 解析
+    if claims is None or claims["exp"] < time.time():
+        raise UnauthorizedException("Invalid or expired token")
+    return claims
+
+
+# --- 4. 依赖注入: 获取当前用户 ---
+_bearer = HTTPBearer(auto_error=False)
+
+
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer),
+) -> dict:
+    """
+    从 Authorization: Bearer <token> 中解析当前用户，不访问数据库。
+    声明为 async: 缓存命中时只是一次字典查找，直接在事件循环中执行，
+    比同步依赖被 FastAPI 派发到线程池要便宜得多。
+    """
+    if credentials is None:
+        raise UnauthorizedException("Not authenticated")
+    return verify_access_token(credentials.credentials)
+
+
+# --- 5. 依赖注入: 管理接口 ---
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """校验 X-Admin-Token 请求头；未配置 DEMO_ADMIN_TOKEN 时管理接口全部禁用。"""
+    expected = settings.ADMIN.TOKEN
+    if not expected:
+        raise ForbiddenException("Admin API is disabled")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, expected):
+        raise UnauthorizedException("Invalid admin token")
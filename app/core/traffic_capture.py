@@ -0,0 +1,233 @@
+# app/core/traffic_capture.py
+"""
+线上流量抽样录制，供 scripts/replay_traffic.py 回放做贴近真实的压测。
+
+合成基准测试的查询形状 (过滤条件、排序、翻页深度的组合) 和线上差别很大。
+启用后 (CAPTURE.ENABLED) 按 SAMPLE_RATE 抽样 /api/ 下的请求，每个请求写一行 JSON:
+
+    {"ts": 1760000000.123, "method": "GET", "path": "/api/v1/heroes",
+     "route": "/api/v1/heroes", "query": [["search", "man"], ["page", "2"]],
+     "content_type": null, "body": null, "body_format": null, "authenticated": false,
+     "status": 200, "duration_ms": 4.21}
+
+- ts 是请求到达时的墙钟时间，回放时用它还原请求间隔；
+- route 是匹配到的路由模板 (如 /api/v1/heroes/{hero_id})，没有匹配到时为 null；
+- duration_ms 从中间件收到请求到响应发送完毕，包含准入排队时间。
+
+脱敏: 只保存 content-type，不保存任何其他请求头 (Authorization、Cookie 等)，
+只记录请求是否带了 Authorization；查询参数和 JSON / 表单请求体中名称包含
+SCRUB_FIELDS 的字段替换为 [REDACTED]，其余字符串中的邮箱地址替换为 [email]。
+其他格式或超过 MAX_BODY_BYTES 的请求体不保存，只在 body_omitted 中说明原因。
+
+写文件在后台线程完成 (复用日志的 BackgroundSink)，队列满时丢弃记录，不阻塞事件循环；
+录满 MAX_RECORDS 条后自动停止。多个 worker 时 OUTPUT_PATH 可以写成
+requests-{pid}.jsonl，每个进程写自己的文件，回放时一起传入即可。
+"""
+import json
+import os
+import random
+import re
+import time
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import parse_qsl
+
+from loguru import logger
+
+from app.core.config import TrafficCaptureSettings
+from app.core.logging_config import BackgroundSink
+from app.core.metrics import metrics
+
+REDACTED = "[REDACTED]"
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+
+class Scrubber:
+    """按字段名和内容去掉请求中的个人信息和凭据。"""
+
+    def __init__(self, fields: list[str]):
+        self.fields = [f.lower() for f in fields]
+
+    def sensitive(self, name: str) -> bool:
+        name = name.lower()
+        return any(f in name for f in self.fields)
+
+    def value(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            return {k: REDACTED if self.sensitive(str(k)) else self.value(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.value(v) for v in value]
+        if isinstance(value, str):
+            return _EMAIL.sub("[email]", value)
+        return value
+
+    def pairs(self, pairs: list[tuple[str, str]]) -> list[list[str]]:
+        return [[k, REDACTED if self.sensitive(k) else self.value(v)] for k, v in pairs]
+
+
+def _route_template(scope) -> Optional[str]:
+    """返回匹配到的路由模板，如 /api/v1/heroes/{hero_id}；未匹配到路由时返回 None。"""
+    route = scope.get("route")
+    if scope.get("endpoint") is None or route is None or not hasattr(route, "path_regex"):
+        return None
+    # route.path 可能只是相对于 APIRouter/Mount 的模板 (不含 include_router 的 prefix)，
+    # 前缀取实际路径中路由正则匹配部分之前的那一段，不对参数值做字符串替换
+    path = scope["path"]
+    for i, char in enumerate(path):
+        if char == "/" and route.path_regex.match(path[i:]):
+            return path[:i] + route.path
+    return route.path
+
+
+class TrafficRecorder:
+    """把录制的请求追加写入 OUTPUT_PATH。"""
+
+    def __init__(self, config: TrafficCaptureSettings):
+        self.path = Path(config.OUTPUT_PATH.format(pid=os.getpid()))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.remaining = config.MAX_RECORDS
+        self._sink = BackgroundSink(
+            open(self.path, "a", encoding="utf-8"), config.QUEUE_SIZE, "traffic_capture_dropped_total"
+        )
+
+    @property
+    def full(self) -> bool:
+        return self.remaining <= 0
+
+    def write(self, record: dict) -> None:
+        if self.full:
+            return
+        self._sink.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.remaining -= 1
+        metrics.inc("traffic_capture_records_total")
+        if self.full:
+            logger.warning("Traffic capture reached MAX_RECORDS, recording stopped ({})", self.path)
+
+    def close(self) -> None:
+        self._sink.close()
+
+
+_recorder: Optional[TrafficRecorder] = None
+
+
+def get_traffic_recorder() -> Optional[TrafficRecorder]:
+    return _recorder
+
+
+def start_traffic_capture(config: TrafficCaptureSettings) -> None:
+    global _recorder
+    if _recorder is not None:
+        return
+    _recorder = TrafficRecorder(config)
+    logger.info("Traffic capture enabled: sample_rate={} -> {}", config.SAMPLE_RATE, _recorder.path)
+
+
+def stop_traffic_capture() -> None:
+    global _recorder
+    if _recorder is None:
+        return
+    _recorder.close()
+    _recorder = None
+
+
+class TrafficCaptureMiddleware:
+    """
+    纯 ASGI 中间件: 抽样录制请求。放在最外层，耗时包含准入排队和截止时间处理。
+    未被抽中的请求只多一次随机数判断。
+    """
+
+    def __init__(self, app, config: TrafficCaptureSettings):
+        self.app = app
+        self.config = config
+        self.scrubber = Scrubber(config.SCRUB_FIELDS)
+
+    def _should_capture(self, scope) -> bool:
+        if scope["type"] != "http":
+            return False
+        recorder = _recorder
+        if recorder is None or recorder.full or random.random() >= self.config.SAMPLE_RATE:
+            return False
+        path = scope["path"]
+        return (
+            any(path.startswith(prefix) for prefix in self.config.PATH_PREFIXES)
+            and path.rstrip("/") not in self.config.EXCLUDE_PATHS
+        )
+
+    async def __call__(self, scope, receive, send):
+        if not self._should_capture(scope):
+            await self.app(scope, receive, send)
+            return
+
+        ts = time.time()
+        start = time.perf_counter()
+        max_body = self.config.MAX_BODY_BYTES
+        chunks: list[bytes] = []
+        body_size = 0
+        status_code = 500
+
+        async def receive_wrapper():
+            nonlocal body_size
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                body_size += len(body)
+                if body_size <= max_body:
+                    chunks.append(body)
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            try:
+                self._finish(scope, ts, b"".join(chunks), body_size, status_code, duration_ms)
+            except Exception as e:
+                # 录制失败不能影响请求本身
+                logger.error("Failed to capture request {} {}: {}", scope["method"], scope["path"], e)
+
+    def _finish(self, scope, ts: float, body: bytes, body_size: int, status_code: int, duration_ms: float) -> None:
+        recorder = _recorder
+        if recorder is None:  # 应用正在关闭
+            return
+        headers = dict(scope["headers"])
+        content_type = headers.get(b"content-type", b"").decode("latin-1") or None
+        parsed, body_format, omitted = self._parse_body(content_type, body, body_size)
+        recorder.write({
+            "ts": round(ts, 6),
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": _route_template(scope),
+            "query": self.scrubber.pairs(
+                parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+            ),
+            "content_type": content_type,
+            "body": parsed,
+            "body_format": body_format,
+            "body_omitted": omitted,
+            "authenticated": b"authorization" in headers,
+            "status": status_code,
+            "duration_ms": round(duration_ms, 3),
+        })
+
+    def _parse_body(self, content_type: Optional[str], body: bytes, body_size: int):
+        """返回 (脱敏后的请求体, 格式, 未保存的原因)。"""
+        if not body_size:
+            return None, None, None
+        if body_size > self.config.MAX_BODY_BYTES:
+            return None, None, "too_large"
+        media_type = (content_type or "").split(";")[0].strip().lower()
+        if media_type == "application/json":
+            try:
+                return self.scrubber.value(json.loads(body)), "json", None
+            except ValueError:
+                return None, None, "invalid_json"
+        if media_type == "application/x-www-form-urlencoded":
+            pairs = parse_qsl(body.decode("utf-8", "replace"), keep_blank_values=True)
+            return self.scrubber.pairs(pairs), "form", None
+        return None, None, "unsupported_content_type"
@@ -0,0 +1,245 @@
+# app/domains/heroes/heroes_batcher.py
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from app.core.config import BatchSettings, settings
+from app.core.database import get_session_factory
+from app.core.exceptions import ServiceUnavailableException
+from app.core.metrics import metrics
+from app.domains.heroes.heroes_repository import HeroRepository
+from app.domains.heroes.heroes_sharded_repository import ShardedHeroRepository
+from app.schemas.heroes import HeroCreate, HeroCreateStatus
+
+
+class _PendingCreate:
+    """一条排队中的创建请求。"""
+
+    __slots__ = ("tracking_id", "data", "future")
+
+    def __init__(self, tracking_id: str, data: HeroCreate, future: Optional[asyncio.Future]):
+        self.tracking_id = tracking_id
+        self.data = data
+        # 只有"等待提交"模式的请求才有 future
+        self.future = future
+
+
+class HeroCreateBatcher:
+    """
+    英雄创建的 write-behind 批量写入器。
+
+    请求校验通过后进入有界队列，后台的 flusher 按数量/时间阈值把多条创建
+    合并成一条多行 INSERT，在一个事务中提交。队列满时直接拒绝 (背压)，
+    应用关闭时把队列刷空，刷不进数据库的请求落盘，下次启动时恢复到积压队列
+    (不受 MAX_QUEUE 限制，优先于新请求刷写)；无法解析的行移到 <SPOOL_PATH>.corrupt。
+    """
+
+    def __init__(self, config: BatchSettings):
+        self.config = config
+        self._queue: asyncio.Queue[_PendingCreate] = asyncio.Queue(maxsize=config.MAX_QUEUE)
+        # tracking_id -> 处理结果，只保留最近 MAX_TRACKED 条
+        self._statuses: OrderedDict[str, HeroCreateStatus] = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        # 关闭时尚未处理完的批次: 正在攒的批次，以及正在进行的刷写 (任务, 批次)
+        self._carry: list[_PendingCreate] = []
+        # 从落盘文件恢复的请求，数量可能超过 MAX_QUEUE，所以不放进有界队列
+        self._backlog: deque[_PendingCreate] = deque()
+        self._current: Optional[tuple[asyncio.Future, list[_PendingCreate]]] = None
+
+    # --- 生命周期 ---
+    async def start(self) -> None:
+        self._restore_spool()
+        self._task = asyncio.create_task(self._run(), name="hero-create-flusher")
+        logger.info("英雄批量写入器已启动。")
+
+    async def stop(self) -> None:
+        """停止 flusher，并把队列中剩余的请求全部刷写 (或落盘)。"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        if self._current is not None:
+            flush, batch = self._current
+            self._current = None
+            try:
+                await flush
+            except Exception:
+                logger.exception("关闭时刷写失败，{} 条请求已落盘。", len(batch))
+                self._spool(batch)
+
+        remaining = self._carry + list(self._backlog) + self._drain_nowait()
+        self._carry = []
+        self._backlog.clear()
+        while remaining:
+            batch, remaining = remaining[: self.config.MAX_BATCH_SIZE], remaining[self.config.MAX_BATCH_SIZE :]
+            try:
+                await self._flush(batch)
+            except Exception:
+                logger.exception("关闭时刷写失败，{} 条请求已落盘。", len(batch) + len(remaining))
+                self._spool(batch + remaining)
+                break
+        logger.info("英雄批量写入器已停止，队列已清空。")
+
+    # --- 入队 ---
+    def _track(self, tracking_id: str, status: HeroCreateStatus) -> None:
+        self._statuses[tracking_id] = status
+        self._statuses.move_to_end(tracking_id)
+        while len(self._statuses) > self.config.MAX_TRACKED:
+            self._statuses.popitem(last=False)
+
+    def submit(self, data: HeroCreate, wait: bool = False) -> _PendingCreate:
+        """把创建请求放入队列；队列已满时抛出 503。"""
+        tracking_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future() if wait else None
+        pending = _PendingCreate(tracking_id, data, future)
+        try:
+            self._queue.put_nowait(pending)
+        except asyncio.QueueFull:
+            metrics.inc("hero_batch_rejected_total")
+            raise ServiceUnavailableException("Hero create queue is full", retry_after=1)
+        self._track(tracking_id, HeroCreateStatus(tracking_id=tracking_id, status="queued"))
+        metrics.set_gauge("hero_batch_queue_depth", self._queue.qsize())
+        return pending
+
+    def get_status(self, tracking_id: str) -> Optional[HeroCreateStatus]:
+        return self._statuses.get(tracking_id)
+
+    # --- 后台刷写 ---
+    def _drain_nowait(self, limit: Optional[int] = None) -> list[_PendingCreate]:
+        items: list[_PendingCreate] = []
+        while not self._queue.empty() and (limit is None or len(items) < limit):
+            items.append(self._queue.get_nowait())
+        return items
+
+    async def _next_batch(self) -> list[_PendingCreate]:
+        # 先刷完恢复的积压，再处理新请求
+        if self._backlog:
+            size = min(len(self._backlog), self.config.MAX_BATCH_SIZE)
+            return [self._backlog.popleft() for _ in range(size)]
+        batch = [await self._queue.get()]
+        try:
+            deadline = time.monotonic() + self.config.MAX_BATCH_DELAY
+            while len(batch) < self.config.MAX_BATCH_SIZE:
+                batch.extend(self._drain_nowait(self.config.MAX_BATCH_SIZE - len(batch)))
+                timeout = deadline - time.monotonic()
+                if len(batch) >= self.config.MAX_BATCH_SIZE or timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # 攒批过程中被取消: 这一批交给 stop() 处理
+            self._carry = batch
+            raise
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            # 刷写放在独立任务中并用 shield 保护，关闭时不会打断一次进行中的提交
+            self._current = (asyncio.ensure_future(self._flush(batch)), batch)
+            try:
+                await asyncio.shield(self._current[0])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Failed to flush hero batch of {}", len(batch))
+                self._fail(batch, str(e))
+            self._current = None
+
+    async def _flush(self, batch: list[_PendingCreate]) -> None:
+        start = time.perf_counter()
+        async with get_session_factory()() as session:
+            # 分片模式下 session 位于查找分片，英雄按 id 写入各自的分片
+            repository_class = ShardedHeroRepository if settings.REPOSITORY.BACKEND == "sharded" else HeroRepository
+            inserted = await repository_class(session).create_many([p.data for p in batch])
+
+        for pending in batch:
+            hero_id = inserted.pop(pending.data.alias, None)
+            if hero_id is not None:
+                status = HeroCreateStatus(tracking_id=pending.tracking_id, status="committed", hero_id=hero_id)
+            else:
+                status = HeroCreateStatus(
+                    tracking_id=pending.tracking_id,
+                    status="conflict",
+                    detail=f"Hero with alias {pending.data.alias} already exists",
+                )
+            self._track(pending.tracking_id, status)
+            if pending.future is not None and not pending.future.done():
+                pending.future.set_result(status)
+
+        metrics.inc("hero_batch_flushed_total")
+        metrics.inc("hero_batch_rows_total", len(batch))
+        metrics.observe("hero_batch_flush_seconds", time.perf_counter() - start)
+        metrics.set_gauge("hero_batch_queue_depth", self._queue.qsize())
+
+    def _fail(self, batch: list[_PendingCreate], detail: str) -> None:
+        for pending in batch:
+            status = HeroCreateStatus(tracking_id=pending.tracking_id, status="failed", detail=detail)
+            self._track(pending.tracking_id, status)
+            if pending.future is not None and not pending.future.done():
+                pending.future.set_result(status)
+
+    # --- 落盘与恢复 ---
+    def _spool(self, items: list[_PendingCreate]) -> None:
+        with Path(self.config.SPOOL_PATH).open("a", encoding="utf-8") as f:
+            for pending in items:
+                f.write(json.dumps({"tracking_id": pending.tracking_id, "data": pending.data.model_dump()}) + "\n")
+
+    def _restore_spool(self) -> None:
+        """把落盘的请求恢复到积压队列；损坏或无法校验的行 (如写到一半断电) 移到 .corrupt 文件，不阻止启动。"""
+        path = Path(self.config.SPOOL_PATH)
+        if not path.exists():
+            return
+        corrupt: list[bytes] = []
+        for line in path.read_bytes().splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                pending = _PendingCreate(record["tracking_id"], HeroCreate(**record["data"]), None)
+            except (ValueError, KeyError, TypeError):
+                corrupt.append(line)
+                continue
+            self._backlog.append(pending)
+            self._track(pending.tracking_id, HeroCreateStatus(tracking_id=pending.tracking_id, status="queued"))
+        if corrupt:
+            with path.with_name(path.name + ".corrupt").open("ab") as f:
+                f.writelines(line + b"\n" for line in corrupt)
+            metrics.inc("hero_batch_spool_corrupt_lines_total", len(corrupt))
+            logger.error("落盘文件中有 {} 行无法解析，已移到 {}.corrupt。", len(corrupt), path.name)
+        path.unlink()
+        logger.info("从落盘文件恢复了 {} 条待创建的英雄。", len(self._backlog))
+
+
+# --- 全局单例，与 database.py 中 engine 的管理方式一致 ---
+_batcher: Optional[HeroCreateBatcher] = None
+
+
+async def start_hero_batcher(config: BatchSettings) -> None:
+    global _batcher
+    if _batcher is not None:
+        return
+    _batcher = HeroCreateBatcher(config)
+    await _batcher.start()
+
+
+async def stop_hero_batcher() -> None:
+    global _batcher
+    if _batcher is not None:
+        await _batcher.stop()
+        _batcher = None
+
+
+def get_hero_batcher() -> HeroCreateBatcher:
+    if _batcher is None:
+        raise ServiceUnavailableException("Batched hero creation is not enabled")
+    return _batcher
@@ -0,0 +1,233 @@
+# app/domains/heroes/heroes_events.py
+import asyncio
+import json
+import uuid
+from collections import deque
+from typing import AsyncIterator, Callable, Optional
+
+import asyncpg
+from loguru import logger
+
+from app.core.config import ChangeStreamSettings, settings
+from app.core.exceptions import ServiceUnavailableException
+from app.core.metrics import metrics
+
+# 写路径通过 pg_notify 发布到这个频道，每个 worker 的监听连接从这里接收
+HERO_CHANGES_CHANNEL = "hero_changes"
+
+
+def _reset(reason: str) -> str:
+    """提示客户端无法续传的 SSE 事件: 客户端应重新拉取列表，然后继续读取本连接上的事件。"""
+    return f"event: reset\ndata: {json.dumps({'reason': reason})}\n\n"
+
+
+class _Subscriber:
+    """一个 SSE 订阅者: 有界缓冲 + 唤醒事件。缓冲满即视为慢消费者并断开。"""
+
+    __slots__ = ("buffer", "maxlen", "wakeup", "dropped")
+
+    def __init__(self, maxlen: int):
+        self.buffer: deque[dict] = deque()
+        self.maxlen = maxlen
+        self.wakeup = asyncio.Event()
+        self.dropped = False
+
+    def push(self, event: dict) -> bool:
+        if len(self.buffer) >= self.maxlen:
+            self.dropped = True
+            self.wakeup.set()
+            return False
+        self.buffer.append(event)
+        self.wakeup.set()
+        return True
+
+
+class HeroChangeBroker:
+    """
+    英雄变更事件的扇出器。
+
+    每个 worker 只持有一条 LISTEN 连接 (独立于连接池)，收到的 NOTIFY 会
+    广播给本进程内所有订阅者。最近的事件保存在环形缓冲区中，客户端可以用
+    Last-Event-ID 从断点继续。
+
+    事件 id 是 "<epoch>-<seq>"，在 NOTIFY 到达时分配，而不是在写事务中用序列分配:
+    序列值在事务内取得，提交顺序和 id 顺序不一致，按 "id 大于断点" 续传会永久漏掉
+    之后才提交的较小 id。Postgres 按提交顺序投递通知，所以同一条监听连接上
+    seq 与提交顺序一致且连续。每次 (重新) 建立监听连接都会换一个 epoch 并清空缓冲:
+    断线期间的通知已经丢失，换到另一个 worker 的 epoch 也不同。
+    只有断点的 epoch 与当前一致、且断点之后的事件都还在缓冲区中时才回放，
+    其他情况 (缓冲为空、断点太旧、id 无法识别) 都发送 reset 事件，提示全量重新同步。
+
+    epoch 是每个 worker 各自的，所以续传只在单 worker 或负载均衡按客户端粘滞
+    (sticky session) 时有效；多 worker 无粘滞时重连通常落到另一个 worker，
+    每次都会收到 reset (reason=resume_unavailable)。数据库里没有与提交顺序一致、
+    又能在事务内取得的共享编号 (序列和 txid 都按分配顺序)，所以不用它们做 id。
+    """
+
+    def __init__(self, config: ChangeStreamSettings):
+        self.config = config
+        self._subscribers: set[_Subscriber] = set()
+        self._recent: deque[dict] = deque(maxlen=config.REPLAY_BUFFER)
+        self._epoch = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._connected = False
+        self._conn: Optional[asyncpg.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        # 进程内的事件回调 (如自动补全索引)，在扇出给 SSE 订阅者之前同步调用
+        self._listeners: list[Callable[[dict], None]] = []
+
+    def add_listener(self, callback: Callable[[dict], None]) -> None:
+        self._listeners.append(callback)
+
+    # --- 生命周期 ---
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._listen_forever(), name="hero-change-listener")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.close()
+        # 让所有订阅者的生成器退出
+        for sub in self._subscribers:
+            sub.dropped = True
+            sub.wakeup.set()
+
+    async def _listen_forever(self) -> None:
+        # asyncpg 需要标准的 postgresql:// DSN，而不是 SQLAlchemy 的 postgresql+asyncpg://
+        dsn = settings.DB.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+        while True:
+            try:
+                self._conn = await asyncpg.connect(dsn)
+                self._new_epoch()
+                lost = asyncio.Event()
+                self._conn.add_termination_listener(lambda _conn: lost.set())
+                await self._conn.add_listener(HERO_CHANGES_CHANNEL, self._on_notify)
+                logger.info("正在监听英雄变更频道 '{}'。", HERO_CHANGES_CHANNEL)
+                await lost.wait()
+                logger.warning("英雄变更监听连接已断开，准备重连。")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Failed to listen on {}: {}", HERO_CHANGES_CHANNEL, e)
+            metrics.inc("hero_changes_listener_reconnects_total")
+            await asyncio.sleep(self.config.RECONNECT_DELAY)
+
+    def _new_epoch(self) -> None:
+        """开始新的事件编号周期；之前的断点都无法证明连续，续传时一律 reset。"""
+        self._epoch = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._recent.clear()
+        if self._connected:
+            # 重连: 断线期间的通知已经丢失，已连接的订阅者同样需要重新同步
+            self._push({"type": "reset", "reason": "listener_reconnected"})
+        self._connected = True
+
+    # --- 扇出 ---
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        event = json.loads(payload)
+        self._seq += 1
+        event["seq"] = self._seq
+        event["id"] = f"{self._epoch}-{self._seq}"
+        self._recent.append(event)
+        metrics.inc("hero_changes_events_total")
+        for callback in self._listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error("Hero change listener failed: {}", e)
+        self._push(event)
+
+    def _push(self, event: dict) -> None:
+        """把事件放入每个 SSE 订阅者的缓冲；缓冲已满的慢消费者被断开。"""
+        dropped = [sub for sub in self._subscribers if not sub.push(event)]
+        for sub in dropped:
+            self._subscribers.discard(sub)
+            metrics.inc("hero_changes_slow_consumers_dropped_total")
+
+    def _replay_since(self, last_event_id: str) -> Optional[list[dict]]:
+        """
+        返回断点之后的缓存事件；无法证明从断点到现在是连续的时候返回 None (reset)。
+        """
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self._epoch or not seq.isdigit():
+            return None
+        last_seq = int(seq)
+        if last_seq > self._seq:
+            return None
+        if last_seq == self._seq:
+            return []
+        # seq 在同一 epoch 内连续，断点的下一条必须还在缓冲区中
+        if not self._recent or self._recent[0]["seq"] > last_seq + 1:
+            return None
+        return [e for e in self._recent if e["seq"] > last_seq]
+
+    # --- SSE 输出 ---
+    @staticmethod
+    def _format(event: dict) -> str:
+        if event["type"] == "reset":
+            return _reset(event["reason"])
+        return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['hero'])}\n\n"
+
+    async def stream(self, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        sub = _Subscriber(self.config.SUBSCRIBER_BUFFER)
+        self._subscribers.add(sub)
+        metrics.set_gauge("hero_changes_subscribers", len(self._subscribers))
+        try:
+            if last_event_id is not None:
+                replay = self._replay_since(last_event_id)
+                if replay is None:
+                    # 断点来自另一个 worker、另一个 epoch 或已超出缓冲
+                    metrics.inc("hero_changes_resume_resets_total")
+                    yield _reset("resume_unavailable")
+                else:
+                    seen = {e["id"] for e in replay}
+                    for event in replay:
+                        yield self._format(event)
+                    # 回放期间可能已有同一事件进入实时缓冲，跳过重复
+                    sub.buffer = deque(e for e in sub.buffer if e.get("id") not in seen)
+
+            while not sub.dropped:
+                try:
+                    await asyncio.wait_for(sub.wakeup.wait(), self.config.HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                sub.wakeup.clear()
+                while sub.buffer:
+                    yield self._format(sub.buffer.popleft())
+        finally:
+            self._subscribers.discard(sub)
+            metrics.set_gauge("hero_changes_subscribers", len(self._subscribers))
+
+
+# --- 全局单例，与 database.py 中 engine 的管理方式一致 ---
+_broker: Optional[HeroChangeBroker] = None
+
+
+async def start_hero_change_broker(config: ChangeStreamSettings) -> None:
+    global _broker
+    if _broker is not None:
+        return
+    _broker = HeroChangeBroker(config)
+    await _broker.start()
+
+
+async def stop_hero_change_broker() -> None:
+    global _broker
+    if _broker is not None:
+        await _broker.stop()
+        _broker = None
+
+
+def get_running_hero_change_broker() -> Optional[HeroChangeBroker]:
+    """返回已启动的 broker，未启用时返回 None (供进程内组件订阅事件)。"""
+    return _broker
+
+
+def get_hero_change_broker() -> HeroChangeBroker:
+    if _broker is None:
+        raise ServiceUnavailableException("Hero change stream is not enabled")
+    return _broker
@@ -0,0 +1,226 @@
+# app/domains/heroes/heroes_memory_repository.py
+import random
+from bisect import bisect_left, insort
+from collections import Counter
+from itertools import count
+from typing import Optional
+
+from loguru import logger
+
+from app.core.config import RepositorySettings
+from app.core.exceptions import AlreadyExistsException, NotFoundException
+from app.domains.heroes.heroes_ordering import ALIAS_LOWER, NAME_LOWER, OrderSpec, field_value, order_spec, sort_key
+from app.domains.heroes.heroes_repository import BaseHeroRepository, suggest_match_key
+from app.models.heroes import Hero, normalize_power_tags
+from app.schemas.heroes import HeroCreate, HeroUpdate
+from app.schemas.heroes_filter import HeroFilter
+
+
+class InMemoryHeroRepository(BaseHeroRepository):
+    """
+    In-process hero store with the same semantics as HeroRepository.
+
+    Used to load-test and profile the service/schema/route layers with the
+    database removed from the picture. Each ORDER BY shape gets a sorted index
+    (built on first use, then maintained incrementally on writes), so a list
+    request without search is a slice and with search a filtered scan in
+    order, like an index scan.
+
+    All methods complete without awaiting, so each call is atomic with
+    respect to the event loop. Rows are transient Hero instances, so
+    serialization goes through exactly the same model_validate path.
+    """
+
+    def __init__(self):
+        self._heroes: dict[int, Hero] = {}
+        self._ids_by_alias: dict[str, int] = {}
+        self._indexes: dict[OrderSpec, list[tuple[tuple, int]]] = {}
+        self._next_id = count(1)
+        # 默认排序 (name, id) 和自动补全回退查询的索引始终维护
+        self._index_for((("name", False), ("id", False)))
+        self._index_for(((NAME_LOWER, False), ("id", False)))
+        self._index_for(((ALIAS_LOWER, False), ("id", False)))
+
+    def __len__(self) -> int:
+        return len(self._heroes)
+
+    # --- 索引维护 ---
+    def _index_for(self, spec: OrderSpec) -> list[tuple[tuple, int]]:
+        index = self._indexes.get(spec)
+        if index is None:
+            index = sorted((sort_key(h, spec), h.id) for h in self._heroes.values())
+            self._indexes[spec] = index
+        return index
+
+    def _index_add(self, hero: Hero) -> None:
+        for spec, index in self._indexes.items():
+            insort(index, (sort_key(hero, spec), hero.id))
+
+    def _index_remove(self, hero: Hero) -> None:
+        for spec, index in self._indexes.items():
+            entry = (sort_key(hero, spec), hero.id)
+            i = bisect_left(index, entry)
+            if i < len(index) and index[i][1] == hero.id:
+                del index[i]
+
+    def _insert(self, name: str, alias: str, powers: Optional[str] = None) -> Hero:
+        hero = Hero(
+            id=next(self._next_id), name=name, alias=alias, powers=powers, powers_tags=normalize_power_tags(powers)
+        )
+        self._heroes[hero.id] = hero
+        self._ids_by_alias[hero.alias] = hero.id
+        self._index_add(hero)
+        return hero
+
+    # --- BaseHeroRepository ---
+    async def create(self, hero_data: HeroCreate) -> Hero:
+        """Create a new hero."""
+        if hero_data.alias in self._ids_by_alias:
+            raise AlreadyExistsException(f"Hero with alias {hero_data.alias} already exists")
+        return self._insert(**hero_data.model_dump())
+
+    async def create_many(self, heroes_data: list[HeroCreate]) -> dict[str, int]:
+        """Insert many heroes, skipping existing aliases (like ON CONFLICT DO NOTHING)."""
+        inserted: dict[str, int] = {}
+        for data in heroes_data:
+            if data.alias not in self._ids_by_alias:
+                inserted[data.alias] = self._insert(**data.model_dump()).id
+        return inserted
+
+    async def list_suggest_entries(self) -> list[tuple[int, str, str]]:
+        """Fetch (id, name, alias) of all heroes for building the suggest index."""
+        return [(h.id, h.name, h.alias) for h in self._heroes.values()]
+
+    async def suggest_by_prefix(self, prefix: str, limit: int) -> list[tuple[int, str, str]]:
+        """Find heroes whose name or alias starts with `prefix` (case-insensitive)."""
+        prefix = prefix.lower()
+        matches: dict[int, tuple[int, str, str]] = {}
+        # 与数据库回退查询相同: 每个索引各取前 limit 条，再按较小的匹配键合并去重
+        for field in (NAME_LOWER, ALIAS_LOWER):
+            index = self._indexes[((field, False), ("id", False))]
+            i = bisect_left(index, (((False, prefix),),))
+            taken = 0
+            while i < len(index) and taken < limit:
+                hero = self._heroes[index[i][1]]
+                if not field_value(hero, field).startswith(prefix):
+                    break
+                matches[hero.id] = (hero.id, hero.name, hero.alias)
+                taken += 1
+                i += 1
+        return sorted(matches.values(), key=lambda entry: suggest_match_key(prefix, entry))[:limit]
+
+    async def get_by_id(self, hero_id: int) -> Hero:
+        """Fetch a hero by id."""
+        hero = self._heroes.get(hero_id)
+        if not hero:
+            raise NotFoundException(f"Hero with id {hero_id} not found")
+        return hero
+
+    async def get_all(
+        self,
+        *,
+        hero_filter: HeroFilter,
+        limit: int = 10,
+        offset: int = 0,
+    ) -> tuple[int, list[Hero]]:
+        index = self._index_for(order_spec(hero_filter))
+        heroes = self._heroes
+
+        term = hero_filter.search.lower() if hero_filter.search else None
+        tags_any = set(hero_filter.powers__contains_any or ())
+        tags_all = set(hero_filter.powers__contains_all or ())
+        if not (term or tags_any or tags_all):
+            return len(index), [heroes[hero_id] for _, hero_id in index[offset : offset + limit]]
+
+        def matches(hero: Hero) -> bool:
+            # 与 ILIKE '%term%' 一致: name/alias/powers 任一包含即可，不区分大小写
+            if term and not (
+                term in hero.name.lower()
+                or term in hero.alias.lower()
+                or (hero.powers is not None and term in hero.powers.lower())
+            ):
+                return False
+            # 与 powers_tags && / @> 一致
+            tags = set(hero.powers_tags or ())
+            return (not tags_any or not tags_any.isdisjoint(tags)) and tags_all <= tags
+
+        total = 0
+        page: list[Hero] = []
+        for _, hero_id in index:
+            hero = heroes[hero_id]
+            if matches(hero):
+                if offset <= total < offset + limit:
+                    page.append(hero)
+                total += 1
+        return total, page
+
+    async def count_power_tags(self) -> list[tuple[str, int]]:
+        """Count heroes per power tag, most common first."""
+        counts = Counter(tag for hero in self._heroes.values() for tag in hero.powers_tags or ())
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+    async def update(self, hero_data: HeroUpdate, hero_id: int) -> Hero:
+        """Update an existing hero."""
+        hero = await self.get_by_id(hero_id)
+
+        update_data = hero_data.model_dump(exclude_unset=True)
+        if not update_data:
+            raise ValueError("No fields to update")
+        new_alias = update_data.get("alias", hero.alias)
+        if new_alias != hero.alias and new_alias in self._ids_by_alias:
+            raise AlreadyExistsException(f"Hero with alias {new_alias} already exists")
+
+        self._index_remove(hero)
+        del self._ids_by_alias[hero.alias]
+        for key, value in update_data.items():
+            setattr(hero, key, value)
+        self._ids_by_alias[hero.alias] = hero.id
+        self._index_add(hero)
+        return hero
+
+    async def delete(self, hero_id: int) -> None:
+        """Delete a hero."""
+        hero = await self.get_by_id(hero_id)
+        self._index_remove(hero)
+        del self._ids_by_alias[hero.alias]
+        del self._heroes[hero_id]
+
+    # --- 压测数据 ---
+    def seed(self, n: int, seed: int = 42) -> None:
+        """生成 n 个合成英雄 (约 1/5 没有 powers)，结果可复现。"""
+        rng = random.Random(seed)
+        syllables = ["ka", "zor", "mi", "lux", "ter", "von", "ra", "shi", "qu", "el", "man", "dra"]
+        for i in range(n):
+            word = "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+            # 逗号分隔的能力，规范化后每项是一个标签
+            powers = ", ".join(rng.choice(syllables) for _ in range(rng.randint(1, 5)))
+            self._insert(
+                name=f"{word.title()} {rng.choice(syllables).title()}",
+                alias=f"{word}-{i}",
+                powers=powers if rng.random() < 0.8 else None,
+            )
+
+
+# --- 全局单例 (与 database.py 中 engine 的管理方式一致) ---
+_repository: Optional[InMemoryHeroRepository] = None
+
+
+def setup_memory_hero_repository(config: RepositorySettings) -> InMemoryHeroRepository:
+    global _repository
+    if _repository is None:
+        _repository = InMemoryHeroRepository()
+        if config.SEED_HEROES:
+            _repository.seed(config.SEED_HEROES)
+        logger.info("内存英雄存储已启用，共 {} 条数据。", len(_repository))
+    return _repository
+
+
+def get_memory_hero_repository() -> InMemoryHeroRepository:
+    if _repository is None:
+        raise RuntimeError("内存英雄存储未初始化. 请先调用 setup_memory_hero_repository")
+    return _repository
+
+
+def close_memory_hero_repository() -> None:
+    global _repository
+    _repository = None
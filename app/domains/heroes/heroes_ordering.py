@@ -0,0 +1,65 @@
+# app/domains/heroes/heroes_ordering.py
+"""
+英雄列表排序的 Python 实现，与 HeroFilter.sort 生成的 ORDER BY 保持一致。
+
+内存后端用它维护有序索引，分片后端用它合并各分片已排好序的结果。
+字符串按码点比较，相当于 C collation (分片查询因此带 COLLATE "C")。
+"""
+from app.models.heroes import Hero
+from app.schemas.heroes_filter import HeroFilter
+
+# 排序规则: ((字段名, 是否降序), ...)
+OrderSpec = tuple[tuple[str, bool], ...]
+# 自动补全回退查询使用的 lower(name) / lower(alias) 排序
+NAME_LOWER = "lower(name)"
+ALIAS_LOWER = "lower(alias)"
+
+
+class _Desc:
+    """反转比较方向的包装，用于在同一个元组键里混合升序和降序字段。"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other: "_Desc") -> bool:
+        return other.value < self.value
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Desc) and self.value == other.value
+
+
+def field_value(hero: Hero, field: str):
+    if field == NAME_LOWER:
+        return hero.name.lower()
+    if field == ALIAS_LOWER:
+        return hero.alias.lower()
+    return getattr(hero, field)
+
+
+def sort_key(hero: Hero, spec: OrderSpec) -> tuple:
+    """
+    构造与 PostgreSQL ORDER BY 一致的排序键:
+    NULL 在升序时排最后、降序时排最前 (PostgreSQL 默认的 NULLS LAST/FIRST)。
+    字符串按码点比较，相当于 C collation。
+    """
+    key = []
+    for field, descending in spec:
+        value = field_value(hero, field)
+        component = (value is None, value)
+        key.append(_Desc(component) if descending else component)
+    return tuple(key)
+
+
+def order_spec(hero_filter: HeroFilter) -> OrderSpec:
+    """与 HeroFilter.sort 生成的 ORDER BY 相同: 请求的字段 + name 兜底 + id 兜底。"""
+    spec: list[tuple[str, bool]] = []
+    for value in hero_filter.ordering_values or []:
+        spec.append((value.lstrip("+-"), value.startswith("-")))
+    if not any(field == "name" for field, _ in spec):
+        spec.append(("name", False))
+    spec.append(("id", False))
+    # 同一字段再次出现不影响结果，去掉后可以与其他请求共用索引
+    seen: set[str] = set()
+    return tuple((f, d) for f, d in spec if not (f in seen or seen.add(f)))
@@ -1,29 +1,139 @@
 # app/domains/heroes/heroes_repository.py
+from abc import ABC, abstractmethod
+from typing import Optional
+
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_, desc, asc # 👈 新增导入
+from sqlalchemy import select, func, or_, desc, asc, text, true, union_all, Select # 👈 新增导入
+from sqlalchemy.dialects.postgresql import insert
+import json
 
+from app.core.config import settings
 from app.core.exceptions import AlreadyExistsException, NotFoundException
+from app.domains.heroes.heroes_events import HERO_CHANGES_CHANNEL
 from app.models.heroes import Hero
 from app.schemas.heroes import HeroCreate, HeroUpdate
 from app.schemas.heroes_filter import HeroFilter
 
 
+def suggest_match_key(prefix: str, entry: tuple[int, str, str]) -> tuple[str, int]:
+    """
+    Sort key of a suggestion for a lowercased `prefix`: the smallest of the
+    hero's lowercased name/alias that matches, then id. This is the order the
+    in-memory suggest index returns results in.
+    """
+    hero_id, name, alias = entry
+    return min(key for key in (name.lower(), alias.lower()) if key.startswith(prefix)), hero_id
+
+
+class BaseHeroRepository(ABC):
+    """
+    Interface of hero storage backends used by HeroService.
+
+    Implemented by HeroRepository (PostgreSQL) and InMemoryHeroRepository
+    (heroes_memory_repository.py); the backend is selected by
+    settings.REPOSITORY.BACKEND.
+    """
+
+    @abstractmethod
+    async def create(self, hero_data: HeroCreate) -> Hero:
+        """Create a new hero; raises AlreadyExistsException on duplicate alias."""
+
+    @abstractmethod
+    async def create_many(self, heroes_data: list[HeroCreate]) -> dict[str, int]:
+        """Insert many heroes, skipping existing aliases. Returns alias -> new id."""
+
+    @abstractmethod
+    async def list_suggest_entries(self) -> list[tuple[int, str, str]]:
+        """Fetch (id, name, alias) of all heroes."""
+
+    @abstractmethod
+    async def suggest_by_prefix(self, prefix: str, limit: int) -> list[tuple[int, str, str]]:
+        """
+        Find heroes whose name or alias starts with `prefix` (case-insensitive),
+        in suggest_match_key order.
+        """
+
+    @abstractmethod
+    async def get_by_id(self, hero_id: int) -> Hero:
+        """Fetch a hero by id; raises NotFoundException."""
+
+    @abstractmethod
+    async def get_all(
+        self, *, hero_filter: HeroFilter, limit: int = 10, offset: int = 0
+    ) -> tuple[int, list[Hero]]:
+        """Return (total, page) with HeroFilter search and sort semantics."""
+
+    @abstractmethod
+    async def count_power_tags(self) -> list[tuple[str, int]]:
+        """Return (tag, number of heroes) for every power tag, most common first."""
 
-class HeroRepository:
-    """Repository for handling hero database operations."""
+    @abstractmethod
+    async def update(self, hero_data: HeroUpdate, hero_id: int) -> Hero:
+        """Update an existing hero."""
+
+    @abstractmethod
+    async def delete(self, hero_id: int) -> None:
+        """Delete a hero."""
 
-    def __init__(self, session: AsyncSession):
+
+class HeroRepository(BaseHeroRepository):
+    """
+    Repository for handling hero database operations.
+
+    With `read_only=True` the session is expected to come from `get_read_db`
+    (a read-only transaction): each read method closes the session after
+    its last query, so the connection is back in the pool before the route
+    validates and serializes the result. Loaded heroes stay usable because
+    closing expunges them without expiring their attributes.
+
+    `sort_collation` is applied to string ORDER BY expressions; the sharded
+    backend passes "C" so each shard's order matches its code-point merge.
+    """
+
+    def __init__(self, session: AsyncSession, read_only: bool = False, sort_collation: Optional[str] = None):
         self.session = session
+        self.read_only = read_only
+        self.sort_collation = sort_collation
+
+    async def _release(self) -> None:
+        if self.read_only:
+            await self.session.close()
+
+    async def _publish_changes(self, change_type: str, heroes: list[dict]) -> None:
+        """
+        Publish change events with pg_notify inside the current transaction.
+
+        Postgres only delivers notifications when the transaction commits, so
+        listeners never see changes that were rolled back. Events carry no id:
+        the broker numbers them in delivery (commit) order, see
+        heroes_events.HeroChangeBroker.
+        """
+        if not settings.CHANGES.ENABLED or not heroes:
+            return
+        await self.session.execute(
+            text(
+                "SELECT pg_notify(:channel, json_build_object('type', :type, 'hero', h)::text) "
+                "FROM json_array_elements(CAST(:heroes AS json)) AS h"
+            ),
+            {"channel": HERO_CHANGES_CHANNEL, "type": change_type, "heroes": json.dumps(heroes)},
+        )
+
+    @staticmethod
+    def _as_event(hero: Hero) -> dict:
+        return {"id": hero.id, "name": hero.name, "alias": hero.alias, "powers": hero.powers}
 
     async def create(self, hero_data: HeroCreate) -> Hero:
         """Create a new hero."""
         hero = Hero(**hero_data.model_dump())
         try:
             self.session.add(hero)
+            await self.session.flush()
+            await self._publish_changes("create", [self._as_event(hero)])
+            # id 在 flush 时已由 RETURNING 填充，其余字段都是刚写入的值，
+            # 不再 refresh: 省一次 SELECT，也不会在提交后重新占用连接
             await self.session.commit()
-            await self.session.refresh(hero)
             return hero
         except IntegrityError:
             await self.session.rollback()
@@ -31,14 +141,110 @@ class HeroRepository:
                 f"Hero with alias {hero_data.alias} already exists"
             )
 
+    async def create_many(self, heroes_data: list[HeroCreate]) -> dict[str, int]:
+        """
+        Insert many heroes with one multi-row INSERT in a single transaction.
+
+        Rows whose alias already exists are skipped (ON CONFLICT DO NOTHING).
+        Returns a mapping of inserted alias -> new id.
+        """
+        if not heroes_data:
+            return {}
+        stmt = (
+            insert(Hero)
+            .values([h.model_dump() for h in heroes_data])
+            .on_conflict_do_nothing(index_elements=[Hero.alias])
+            .returning(Hero.id, Hero.name, Hero.alias, Hero.powers)
+        )
+        result = await self.session.execute(stmt)
+        rows = result.all()
+        await self._publish_changes(
+            "create",
+            [{"id": r.id, "name": r.name, "alias": r.alias, "powers": r.powers} for r in rows],
+        )
+        inserted = {r.alias: r.id for r in rows}
+        await self.session.commit()
+        return inserted
+
+    async def list_suggest_entries(self) -> list[tuple[int, str, str]]:
+        """Fetch (id, name, alias) of all heroes for building the suggest index."""
+        result = await self.session.stream(select(Hero.id, Hero.name, Hero.alias))
+        entries = [tuple(row) async for row in result]
+        await self._release()
+        return entries
+
+    async def suggest_by_prefix(self, prefix: str, limit: int) -> list[tuple[int, str, str]]:
+        """
+        Find heroes whose name or alias starts with `prefix` (case-insensitive).
+
+        Matches the in-memory suggest index: each branch is served by its
+        `lower(...) text_pattern_ops` index and limited on its own, then a hero
+        matching on both is kept once at its smaller key. LIKE wildcards in
+        the prefix are escaped so user input can't turn it into a scan.
+        """
+        escaped = prefix.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+        def matching(column) -> Select:
+            lowered = func.lower(column)
+            # WHERE 用不带 COLLATE 的表达式，才能走 text_pattern_ops 索引
+            key = lowered.collate(self.sort_collation) if self.sort_collation else lowered
+            return (
+                select(Hero.id, Hero.name, Hero.alias, key.label("key"))
+                .where(lowered.like(f"{escaped}%", escape="\\"))
+                .order_by(key, Hero.id)
+                .limit(limit)
+            )
+
+        matches = union_all(matching(Hero.name), matching(Hero.alias)).subquery()
+        query = (
+            select(matches.c.id, matches.c.name, matches.c.alias)
+            .group_by(matches.c.id, matches.c.name, matches.c.alias)
+            .order_by(func.min(matches.c.key), matches.c.id)
+            .limit(limit)
+        )
+        rows = (await self.session.execute(query)).all()
+        await self._release()
+        return [tuple(row) for row in rows]
+
+    async def prepare_hot_statements(self) -> None:
+        """
+        Run the hottest read statements once (get by id, default list page and
+        its count) so the connection has them prepared before real traffic.
+        Used by the startup pool warm-up.
+        """
+        await self.session.get(Hero, 0)
+        await self.get_all(hero_filter=HeroFilter())
+
     async def get_by_id(self, hero_id: int) -> Hero:
         """Fetch a hero by id."""
         hero = await self.session.get(Hero, hero_id)
+        await self._release()
         if not hero:
             raise NotFoundException(f"Hero with id {hero_id} not found")
         return hero
 
     # 👇 更新 get_all 方法
+    @staticmethod
+    def build_list_queries(
+        hero_filter: HeroFilter, limit: int = 10, offset: int = 0, collation: Optional[str] = None
+    ) -> tuple[Select, Select]:
+        """
+        Build the (count, page) queries used by get_all.
+
+        Kept separate so tools like scripts/index_advisor.py can EXPLAIN exactly
+        the SQL the API runs.
+        """
+        # 1. 应用过滤和搜索
+        filtered = hero_filter.filter(select(Hero))
+
+        # 2. 获取总数 (分页前)
+        # count 基于未排序的查询构建: 排序不影响总数，带 ORDER BY 的子查询反而可能多做一次排序
+        count_query = select(func.count()).select_from(filtered.subquery())
+
+        # 3. 应用排序并分页
+        paginated_query = hero_filter.sort(filtered, collation).offset(offset).limit(limit)
+        return count_query, paginated_query
+
     async def get_all(
         self,
         *,
@@ -46,25 +252,34 @@ class HeroRepository:
         limit: int = 10,
         offset: int = 0,
     ) -> tuple[int, list[Hero]]:
-        query = select(Hero)
-
-        # 1. 应用过滤和搜索
-        query = hero_filter.filter(query)
-
-        # 2. 应用排序
-        query = hero_filter.sort(query)
+        count_query, paginated_query = self.build_list_queries(hero_filter, limit, offset, self.sort_collation)
 
-        # 3. 获取总数 (分页前)
-        # 先构建一个只查 count 的查询
-        count_query = select(func.count()).select_from(query.subquery())
         total = (await self.session.scalar(count_query)) or 0
-
-        # 4. 分页获取数据
-        paginated_query = query.offset(offset).limit(limit)
         items = list(await self.session.scalars(paginated_query))
-      
+        await self._release()
+
         return total, items
 
+    async def count_power_tags(self) -> list[tuple[str, int]]:
+        """
+        Aggregate heroes per power tag (unnest + GROUP BY over powers_tags).
+
+        This reads every row, so callers should serve it from a cache
+        (see heroes_tags.HeroTagFacetCache) rather than per request.
+        """
+        tag = func.unnest(Hero.powers_tags).table_valued("tag").render_derived(name="t")
+        count = func.count().label("count")
+        query = (
+            select(tag.c.tag, count)
+            .select_from(Hero)
+            .join(tag, true())
+            .group_by(tag.c.tag)
+            .order_by(count.desc(), tag.c.tag)
+        )
+        rows = (await self.session.execute(query)).all()
+        await self._release()
+        return [(row.tag, row.count) for row in rows]
+
     async def update(self, hero_data: HeroUpdate, hero_id: int) -> Hero:
         """Update an existing hero."""
         hero = await self.get_by_id(hero_id) # 复用了 get_by_id 逻辑
@@ -75,9 +290,10 @@ class HeroRepository:
           
         for key, value in update_data.items():
             setattr(hero, key, value)
-          
+
+        await self.session.flush()
+        await self._publish_changes("update", [self._as_event(hero)])
         await self.session.commit()
-        await self.session.refresh(hero)
         return hero
 
     async def delete(self, hero_id: int) -> None:
@@ -85,4 +301,5 @@ class HeroRepository:
         hero = await self.get_by_id(hero_id) # 复用了 get_by_id 逻辑
 
         await self.session.delete(hero)
+        await self._publish_changes("delete", [self._as_event(hero)])
         await self.session.commit()
\ No newline at end of file
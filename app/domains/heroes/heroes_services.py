@@ -1,16 +1,19 @@
 # app/domains/heroes/heroes_services.py
-from app.domains.heroes.heroes_repository import HeroRepository
-from app.schemas.heroes import HeroCreate, HeroUpdate, HeroResponse, HeroStoryResponse
+from app.domains.heroes.heroes_repository import BaseHeroRepository
+from app.domains.heroes.heroes_suggest import get_hero_suggest_index
+from app.domains.heroes.heroes_tags import get_hero_tag_facet_cache
+from app.schemas.heroes import HeroCreate, HeroUpdate, HeroResponse, HeroStoryResponse, HeroSuggestion, HeroSuggestResponse, HeroTagFacet, HeroTagFacetResponse
 from app.schemas.heroes_filter import HeroFilter
 
 
 class HeroService:
-    def __init__(self, repository: HeroRepository):
+    def __init__(self, repository: BaseHeroRepository):
         """Service layer for hero operations."""
         self.repository = repository
 
     async def create_hero(self, data: HeroCreate) -> HeroResponse:
         new_hero = await self.repository.create(data)
+        self._index_upsert(new_hero)
         return HeroResponse.model_validate(new_hero)
 
     async def get_hero(self, hero_id: int) -> HeroResponse:
@@ -40,10 +43,49 @@ class HeroService:
 
     async def update_hero(self, data: HeroUpdate, hero_id: int) -> HeroResponse:
         hero = await self.repository.update(data, hero_id)
+        self._index_upsert(hero)
         return HeroResponse.model_validate(hero)
 
     async def delete_hero(self, hero_id: int) -> None:
         await self.repository.delete(hero_id)
+        index = get_hero_suggest_index()
+        if index is not None:
+            index.apply_event({"type": "delete", "hero": {"id": hero_id}})
+
+    @staticmethod
+    def _index_upsert(hero) -> None:
+        """
+        立即更新本进程的自动补全索引 (读己之写)。
+        其他进程通过 LISTEN/NOTIFY 事件更新，重复应用是幂等的。
+        """
+        index = get_hero_suggest_index()
+        if index is not None:
+            index.apply_event(
+                {"type": "upsert", "hero": {"id": hero.id, "name": hero.name, "alias": hero.alias}}
+            )
+
+    async def suggest_heroes(self, prefix: str, limit: int) -> HeroSuggestResponse:
+        """
+        按前缀返回自动补全建议。
+        优先使用内存索引；索引未就绪 (冷启动) 时回退到数据库的前缀索引查询。
+        """
+        index = get_hero_suggest_index()
+        if index is not None and index.ready:
+            rows, source = index.suggest(prefix, limit), "memory"
+        else:
+            rows, source = await self.repository.suggest_by_prefix(prefix, limit), "database"
+        return HeroSuggestResponse(
+            data=[HeroSuggestion(id=i, name=n, alias=a) for i, n, a in rows],
+            source=source,
+        )
+
+    async def get_power_tag_facets(self, limit: int) -> HeroTagFacetResponse:
+        """返回最常见的能力标签及英雄数量，来自定期刷新的缓存聚合。"""
+        facets, age = await get_hero_tag_facet_cache().get(self.repository.count_power_tags)
+        return HeroTagFacetResponse(
+            data=[HeroTagFacet(tag=tag, count=count) for tag, count in facets[:limit]],
+            cache_age_seconds=round(age, 3),
+        )
 
     async def get_hero_with_story(self, hero_id: int) -> HeroStoryResponse:
         """
@@ -0,0 +1,288 @@
+# app/domains/heroes/heroes_sharded_repository.py
+import asyncio
+import heapq
+from collections import Counter
+from itertools import islice
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from loguru import logger
+from sqlalchemy import Executable, delete, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import (
+    apply_request_deadline,
+    get_shard_read_session_factories,
+    get_shard_session_factories,
+    shard_for_id,
+)
+from app.core.config import settings
+from app.core.exceptions import AlreadyExistsException, BadRequestException, NotFoundException
+from app.core.metrics import metrics
+from app.domains.heroes.heroes_ordering import order_spec, sort_key
+from app.domains.heroes.heroes_repository import BaseHeroRepository, HeroRepository, suggest_match_key
+from app.models.heroes import Hero, HeroAlias, hero_global_id_seq
+from app.schemas.heroes import HeroCreate, HeroUpdate
+from app.schemas.heroes_filter import HeroFilter
+
+T = TypeVar("T")
+
+# 分片上的字符串排序使用 C collation，与合并时按码点比较的 sort_key 一致
+SHARD_SORT_COLLATION = "C"
+
+
+class ShardedHeroRepository(BaseHeroRepository):
+    """
+    Heroes spread over several Postgres shards by a consistent hash of id.
+
+    The primary database is the lookup shard: it allocates ids from
+    `hero_global_id_seq`, owns `hero_aliases` (which keeps aliases globally
+    unique) and carries the pg_notify change events. A write runs its lookup
+    statements in the request's lookup transaction, commits on the hero's
+    shard, then publishes and commits the lookup transaction. If the shard
+    write fails the lookup transaction is rolled back; if the final lookup
+    commit fails the shard write is undone with a compensating statement.
+
+    Reads go straight to the shards in read-only transactions that carry the
+    request's statement_timeout. Lists are scatter-gather: every shard
+    returns its first offset+limit rows in the requested order, the rows are
+    merged with `heroes_ordering.sort_key` and the counts are summed. The
+    merge compares strings by code point, so shard queries sort strings with
+    COLLATE "C"; a shard's default collation (e.g. en_US) would hand the
+    merge out-of-order input and pages would skip or repeat rows.
+    """
+
+    def __init__(self, lookup: Optional[AsyncSession] = None):
+        self.lookup = lookup
+        self.shards = get_shard_session_factories()
+        self.read_shards = get_shard_read_session_factories()
+
+    def _shard(self, hero_id: int) -> int:
+        return shard_for_id(hero_id, len(self.shards))
+
+    def _require_lookup(self) -> AsyncSession:
+        if self.lookup is None:
+            raise RuntimeError("Writes need a session on the lookup shard")
+        return self.lookup
+
+    # --- 写路径 ---
+    @staticmethod
+    async def _commit_shard(session: AsyncSession, lookup: AsyncSession) -> None:
+        try:
+            await session.commit()
+        except BaseException:
+            await lookup.rollback()
+            raise
+
+    async def _commit_lookup(
+        self,
+        lookup: AsyncSession,
+        change_type: str,
+        events: list[dict],
+        undo: list[tuple[int, Executable]],
+    ) -> None:
+        """发布变更并提交查找分片的事务；失败时在各分片上执行补偿语句，撤销已提交的写入。"""
+        try:
+            await HeroRepository(lookup)._publish_changes(change_type, events)
+            await lookup.commit()
+        except BaseException:
+            await lookup.rollback()
+            await asyncio.gather(*(self._undo(shard_no, statement) for shard_no, statement in undo))
+            raise
+
+    async def _undo(self, shard_no: int, statement: Executable) -> None:
+        try:
+            async with self.shards[shard_no]() as session:
+                await session.execute(statement)
+                await session.commit()
+        except Exception as e:
+            # 补偿失败会留下查找表中没有记录的英雄，scripts/rebalance_hero_shards.py --check 可以找出来
+            metrics.inc("hero_shard_undo_failures_total")
+            logger.error("Failed to undo write on hero shard {}: {}", shard_no, e)
+
+    async def create(self, hero_data: HeroCreate) -> Hero:
+        """Create a new hero."""
+        lookup = self._require_lookup()
+        try:
+            hero_id = await lookup.scalar(
+                insert(HeroAlias)
+                .values(alias=hero_data.alias, hero_id=hero_global_id_seq.next_value())
+                .returning(HeroAlias.hero_id)
+            )
+        except IntegrityError:
+            await lookup.rollback()
+            raise AlreadyExistsException(f"Hero with alias {hero_data.alias} already exists")
+
+        shard_no = self._shard(hero_id)
+        hero = Hero(id=hero_id, **hero_data.model_dump())
+        async with self.shards[shard_no]() as session:
+            session.add(hero)
+            await self._commit_shard(session, lookup)
+        await self._commit_lookup(
+            lookup, "create", [HeroRepository._as_event(hero)], [(shard_no, delete(Hero).where(Hero.id == hero_id))]
+        )
+        return hero
+
+    async def create_many(self, heroes_data: list[HeroCreate]) -> dict[str, int]:
+        """
+        Reserve all aliases with one multi-row INSERT on the lookup shard, then
+        insert the heroes on their shards concurrently.
+
+        Aliases that already exist are skipped (ON CONFLICT DO NOTHING).
+        Returns a mapping of inserted alias -> new id.
+        """
+        lookup = self._require_lookup()
+        if not heroes_data:
+            return {}
+        rows = (
+            await lookup.execute(
+                insert(HeroAlias)
+                .values([{"alias": h.alias, "hero_id": hero_global_id_seq.next_value()} for h in heroes_data])
+                .on_conflict_do_nothing(index_elements=[HeroAlias.alias])
+                .returning(HeroAlias.alias, HeroAlias.hero_id)
+            )
+        ).all()
+        inserted = {r.alias: r.hero_id for r in rows}
+
+        by_shard: dict[int, list[dict]] = {}
+        seen: set[int] = set()
+        for data in heroes_data:
+            hero_id = inserted.get(data.alias)
+            # 同一批中重复的 alias 只有第一条生效
+            if hero_id is None or hero_id in seen:
+                continue
+            seen.add(hero_id)
+            by_shard.setdefault(self._shard(hero_id), []).append({"id": hero_id, **data.model_dump()})
+
+        async def write(shard_no: int, values: list[dict]) -> list[dict]:
+            async with self.shards[shard_no]() as session:
+                rows = (
+                    await session.execute(
+                        insert(Hero).values(values).returning(Hero.id, Hero.name, Hero.alias, Hero.powers)
+                    )
+                ).all()
+                await session.commit()
+                return [dict(row._mapping) for row in rows]
+
+        shard_nos = list(by_shard)
+        undo = [(n, delete(Hero).where(Hero.id.in_([v["id"] for v in by_shard[n]]))) for n in shard_nos]
+        try:
+            results = await asyncio.gather(*(write(n, by_shard[n]) for n in shard_nos), return_exceptions=True)
+            errors = [r for r in results if isinstance(r, BaseException)]
+            if errors:
+                raise errors[0]
+            # 事件取自分片 RETURNING 的行，而不是请求体 (HeroCreate 不含 powers)
+            events = [event for rows in results for event in rows]
+        except BaseException:
+            # 在提交查找分片之前出错或被取消时无法确定哪些分片已经提交；
+            # 这些 id 刚从序列分配，按 id 删除是幂等的，所以对所有分片执行补偿
+            await lookup.rollback()
+            await asyncio.gather(*(self._undo(n, stmt) for n, stmt in undo))
+            raise
+
+        await self._commit_lookup(lookup, "create", events, undo)
+        return inserted
+
+    async def update(self, hero_data: HeroUpdate, hero_id: int) -> Hero:
+        """Update an existing hero."""
+        lookup = self._require_lookup()
+        shard_no = self._shard(hero_id)
+        async with self.shards[shard_no]() as session:
+            hero = await session.get(Hero, hero_id)
+            if not hero:
+                raise NotFoundException(f"Hero with id {hero_id} not found")
+
+            update_data = hero_data.model_dump(exclude_unset=True)
+            if not update_data:
+                raise ValueError("No fields to update")
+            previous = HeroRepository._as_event(hero)
+
+            new_alias = update_data.get("alias", hero.alias)
+            if new_alias != hero.alias:
+                try:
+                    await lookup.execute(
+                        update(HeroAlias).where(HeroAlias.hero_id == hero_id).values(alias=new_alias)
+                    )
+                except IntegrityError:
+                    await lookup.rollback()
+                    raise AlreadyExistsException(f"Hero with alias {new_alias} already exists")
+
+            for key, value in update_data.items():
+                setattr(hero, key, value)
+            await self._commit_shard(session, lookup)
+
+        restore = update(Hero).where(Hero.id == hero_id).values(
+            name=previous["name"], alias=previous["alias"], powers=previous["powers"]
+        )
+        await self._commit_lookup(lookup, "update", [HeroRepository._as_event(hero)], [(shard_no, restore)])
+        return hero
+
+    async def delete(self, hero_id: int) -> None:
+        """Delete a hero."""
+        lookup = self._require_lookup()
+        shard_no = self._shard(hero_id)
+        async with self.shards[shard_no]() as session:
+            hero = await session.get(Hero, hero_id)
+            if not hero:
+                raise NotFoundException(f"Hero with id {hero_id} not found")
+            event = HeroRepository._as_event(hero)
+            await lookup.execute(delete(HeroAlias).where(HeroAlias.hero_id == hero_id))
+            await session.delete(hero)
+            await self._commit_shard(session, lookup)
+
+        await self._commit_lookup(lookup, "delete", [event], [(shard_no, insert(Hero).values(**event))])
+
+    # --- 读路径 ---
+    async def _on_shard(self, shard_no: int, call: Callable[[HeroRepository], Awaitable[T]]) -> T:
+        async with self.read_shards[shard_no]() as session:
+            apply_request_deadline(session)
+            return await call(HeroRepository(session, read_only=True, sort_collation=SHARD_SORT_COLLATION))
+
+    async def _scatter(self, call: Callable[[HeroRepository], Awaitable[T]]) -> list[T]:
+        return await asyncio.gather(*(self._on_shard(n, call) for n in range(len(self.read_shards))))
+
+    async def list_suggest_entries(self) -> list[tuple[int, str, str]]:
+        """Fetch (id, name, alias) of all heroes on all shards."""
+        results = await self._scatter(lambda repo: repo.list_suggest_entries())
+        return [entry for entries in results for entry in entries]
+
+    async def suggest_by_prefix(self, prefix: str, limit: int) -> list[tuple[int, str, str]]:
+        """Find heroes whose name or alias starts with `prefix` (case-insensitive) on all shards."""
+        results = await self._scatter(lambda repo: repo.suggest_by_prefix(prefix, limit))
+        lowered = prefix.lower()
+        merged = heapq.merge(*results, key=lambda entry: suggest_match_key(lowered, entry))
+        return list(islice(merged, limit))
+
+    async def get_by_id(self, hero_id: int) -> Hero:
+        """Fetch a hero by id from its shard."""
+        return await self._on_shard(self._shard(hero_id), lambda repo: repo.get_by_id(hero_id))
+
+    async def get_all(
+        self,
+        *,
+        hero_filter: HeroFilter,
+        limit: int = 10,
+        offset: int = 0,
+    ) -> tuple[int, list[Hero]]:
+        """
+        Scatter-gather list. Each shard has to return offset+limit rows, so
+        the cost of deep pages grows with the number of shards; offsets past
+        REPOSITORY.SHARDED_MAX_OFFSET are rejected with 400.
+        """
+        max_offset = settings.REPOSITORY.SHARDED_MAX_OFFSET
+        if offset > max_offset:
+            raise BadRequestException(f"Offset {offset} exceeds the maximum of {max_offset} for sharded listing")
+        results = await self._scatter(
+            lambda repo: repo.get_all(hero_filter=hero_filter, limit=offset + limit, offset=0)
+        )
+        spec = order_spec(hero_filter)
+        merged = heapq.merge(*(items for _, items in results), key=lambda hero: sort_key(hero, spec))
+        return sum(total for total, _ in results), list(islice(merged, offset, offset + limit))
+
+    async def count_power_tags(self) -> list[tuple[str, int]]:
+        """Sum the per-shard tag counts (a hero lives on exactly one shard)."""
+        counts: Counter = Counter()
+        for shard_counts in await self._scatter(lambda repo: repo.count_power_tags()):
+            counts.update(dict(shard_counts))
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
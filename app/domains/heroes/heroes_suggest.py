@@ -0,0 +1,204 @@
+# app/domains/heroes/heroes_suggest.py
+import asyncio
+from collections.abc import Awaitable, Callable
+from bisect import bisect_left, insort
+from operator import itemgetter
+from typing import Optional
+
+from loguru import logger
+
+from app.core.config import SuggestSettings
+from app.core.database import get_session_factory
+from app.core.metrics import metrics
+from app.domains.heroes.heroes_repository import HeroRepository
+
+_key = itemgetter(0)
+
+
+class HeroSuggestIndex:
+    """
+    英雄名称/称号的内存前缀索引，用于搜索框自动补全。
+
+    所有 (小写的 name/alias, hero_id) 保存在一个有序数组中，前缀查询就是一次
+    二分查找加顺序扫描，复杂度 O(log n + k)，不需要访问数据库。
+    相比逐字符的 trie，有序数组内存紧凑、对 CPython 更友好，插入/删除的
+    O(n) 内存移动在十万级数据量下也只是微秒级。
+
+    索引在启动时从数据库构建；构建完成前 ready 为 False，调用方应回退到数据库查询。
+    构建失败时按指数退避重试。之后通过写路径 (本进程的 HeroService 和其他进程经
+    LISTEN/NOTIFY 推送的事件) 增量维护，所有更新都是幂等的。
+    """
+
+    def __init__(self, max_pending: int = 10000):
+        self._entries: list[tuple[str, int]] = []
+        # hero_id -> (name, alias)
+        self._heroes: dict[int, tuple[str, str]] = {}
+        self.ready = False
+        # 加载期间收到的变更事件，加载完成后重放，避免丢失更新
+        self._pending: list[dict] = []
+        self._max_pending = max_pending
+        # 缓存的事件超过上限被丢弃: 正在加载的数据重放不完整，必须重新构建
+        self._overflowed = False
+
+    def __len__(self) -> int:
+        return len(self._heroes)
+
+    # --- 维护 ---
+    @staticmethod
+    def _keys_of(name: str, alias: str) -> set[str]:
+        return {name.lower(), alias.lower()}
+
+    def _remove_entries(self, hero_id: int) -> None:
+        old = self._heroes.pop(hero_id, None)
+        if old is None:
+            return
+        for key in self._keys_of(*old):
+            i = bisect_left(self._entries, (key, hero_id))
+            if i < len(self._entries) and self._entries[i] == (key, hero_id):
+                del self._entries[i]
+
+    def upsert(self, hero_id: int, name: str, alias: str) -> None:
+        if self._heroes.get(hero_id) == (name, alias):
+            return
+        self._remove_entries(hero_id)
+        self._heroes[hero_id] = (name, alias)
+        for key in self._keys_of(name, alias):
+            insort(self._entries, (key, hero_id))
+
+    def delete(self, hero_id: int) -> None:
+        self._remove_entries(hero_id)
+
+    def apply_event(self, event: dict) -> None:
+        """应用一条英雄变更事件 (格式见 HeroRepository._publish_changes)。"""
+        if not self.ready:
+            if self._overflowed:
+                return
+            if len(self._pending) >= self._max_pending:
+                self._pending = []
+                self._overflowed = True
+                metrics.inc("hero_suggest_pending_overflows_total")
+                return
+            self._pending.append(event)
+            return
+        hero = event["hero"]
+        if event["type"] == "delete":
+            self.delete(hero["id"])
+        else:
+            self.upsert(hero["id"], hero["name"], hero["alias"])
+
+    @classmethod
+    def prepare(cls, rows: list[tuple[int, str, str]]) -> tuple[dict, list]:
+        """由全量数据构建映射和有序数组。纯 CPU 计算，可以放到线程中执行。"""
+        heroes = {hero_id: (name, alias) for hero_id, name, alias in rows}
+        entries = sorted(
+            (key, hero_id)
+            for hero_id, (name, alias) in heroes.items()
+            for key in cls._keys_of(name, alias)
+        )
+        return heroes, entries
+
+    def load(self, rows: list[tuple[int, str, str]]) -> None:
+        """用全量数据一次性重建索引。"""
+        self.begin_build()
+        self.install(*self.prepare(rows))
+
+    def begin_build(self) -> None:
+        """开始一次 (重新) 加载: 之后收到的事件会缓存起来，在 install() 时重放。"""
+        self._pending = []
+        self._overflowed = False
+
+    def install(self, heroes: dict, entries: list) -> bool:
+        """
+        换入 prepare() 的结果，并重放加载期间收到的事件。
+        加载期间缓存的事件溢出时不换入 (数据可能缺少更新)，返回 False，应重新构建。
+        """
+        if self._overflowed:
+            return False
+        self._heroes, self._entries = heroes, entries
+        self.ready = True
+        pending, self._pending = self._pending, []
+        for event in pending:
+            self.apply_event(event)
+        return True
+
+    # --- 查询 ---
+    def suggest(self, prefix: str, limit: int) -> list[tuple[int, str, str]]:
+        """返回 name 或 alias 以 prefix 开头 (不区分大小写) 的前 limit 个英雄。"""
+        prefix = prefix.lower()
+        results: list[tuple[int, str, str]] = []
+        seen: set[int] = set()
+        i = bisect_left(self._entries, prefix, key=_key)
+        entries = self._entries
+        while i < len(entries) and len(results) < limit:
+            key, hero_id = entries[i]
+            if not key.startswith(prefix):
+                break
+            if hero_id not in seen:
+                seen.add(hero_id)
+                name, alias = self._heroes[hero_id]
+                results.append((hero_id, name, alias))
+            i += 1
+        return results
+
+
+# --- 全局单例 ---
+_index: Optional[HeroSuggestIndex] = None
+_build_task: Optional[asyncio.Task] = None
+
+
+async def start_hero_suggest_index(
+    config: SuggestSettings,
+    load_entries: Optional[Callable[[], Awaitable[list[tuple[int, str, str]]]]] = None,
+) -> None:
+    """
+    创建索引并在后台加载；加载期间接口回退到仓库的前缀查询。
+    load_entries 默认从数据库读取，使用内存存储后端时传入其 list_suggest_entries。
+    """
+    global _index, _build_task
+    if _index is not None:
+        return
+    _index = HeroSuggestIndex(config.MAX_PENDING_EVENTS)
+    _build_task = asyncio.create_task(
+        _build(_index, load_entries or _load_from_db, config), name="hero-suggest-build"
+    )
+
+
+async def _load_from_db() -> list[tuple[int, str, str]]:
+    async with get_session_factory()() as session:
+        return await HeroRepository(session).list_suggest_entries()
+
+
+async def _build(index: HeroSuggestIndex, load_entries, config: SuggestSettings) -> None:
+    """加载直到成功: 出错或加载期间事件溢出时按指数退避重新加载。"""
+    delay = config.BUILD_RETRY_DELAY
+    while True:
+        index.begin_build()
+        try:
+            rows = await load_entries()
+            # 排序在线程中完成，避免大数据量时阻塞事件循环
+            if index.install(*await asyncio.to_thread(HeroSuggestIndex.prepare, rows)):
+                metrics.set_gauge("hero_suggest_index_size", len(index))
+                logger.info("英雄自动补全索引已加载，共 {} 条。", len(index))
+                return
+            metrics.inc("hero_suggest_build_failures_total")
+            logger.warning(
+                "英雄自动补全索引加载期间变更事件超过 {} 条，{}s 后重新加载。", config.MAX_PENDING_EVENTS, delay
+            )
+        except Exception as e:
+            metrics.inc("hero_suggest_build_failures_total")
+            logger.error("Failed to build hero suggest index, retrying in {}s: {}", delay, e)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, config.BUILD_RETRY_MAX)
+
+
+def get_hero_suggest_index() -> Optional[HeroSuggestIndex]:
+    return _index
+
+
+async def stop_hero_suggest_index() -> None:
+    global _index, _build_task
+    if _build_task is not None:
+        _build_task.cancel()
+        await asyncio.gather(_build_task, return_exceptions=True)
+        _build_task = None
+    _index = None
@@ -0,0 +1,66 @@
+# app/domains/heroes/heroes_tags.py
+"""
+能力标签计数 (facet) 的缓存。
+
+按标签计数需要展开并聚合整张表的 powers_tags，不能每个请求都查一次。
+结果在进程内缓存 TAG_FACETS.CACHE_TTL 秒: 过期后第一个请求负责刷新，
+同时到达的其他请求等待同一次刷新 (不会并发地重复聚合)；刷新失败时继续返回旧结果。
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+TagCounts = list[tuple[str, int]]
+
+
+class HeroTagFacetCache:
+    def __init__(self):
+        self._facets: Optional[TagCounts] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _age(self) -> float:
+        return time.monotonic() - self._loaded_at
+
+    def _fresh(self) -> bool:
+        # 每次读取 settings，热加载修改 TTL 后立即生效
+        return self._facets is not None and self._age() < settings.TAG_FACETS.CACHE_TTL
+
+    async def get(self, load: Callable[[], Awaitable[TagCounts]]) -> tuple[TagCounts, float]:
+        """返回 (标签计数, 缓存年龄秒数)。"""
+        if self._fresh():
+            metrics.inc("hero_tag_facets_cache_total", result="hit")
+            return self._facets, self._age()
+
+        async with self._lock:
+            # 等锁期间可能已经被其他请求刷新
+            if not self._fresh():
+                metrics.inc("hero_tag_facets_cache_total", result="miss")
+                start = time.perf_counter()
+                try:
+                    self._facets = await load()
+                    self._loaded_at = time.monotonic()
+                except Exception as e:
+                    if self._facets is None:
+                        raise
+                    metrics.inc("hero_tag_facets_refresh_errors_total")
+                    logger.error("Failed to refresh hero tag facets, serving stale result: {}", e)
+                else:
+                    metrics.observe("hero_tag_facets_refresh_seconds", time.perf_counter() - start)
+                    metrics.set_gauge("hero_tag_facets_tags", len(self._facets))
+        return self._facets, self._age()
+
+
+_cache: Optional[HeroTagFacetCache] = None
+
+
+def get_hero_tag_facet_cache() -> HeroTagFacetCache:
+    global _cache
+    if _cache is None:
+        _cache = HeroTagFacetCache()
+    return _cache
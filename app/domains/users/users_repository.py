@@ -0,0 +1,30 @@
+# app/domains/users/users_repository.py
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.exceptions import AlreadyExistsException
+from app.models.user import User
+
+
+class UserRepository:
+    """Repository for handling user database operations."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def create(self, username: str, password_hash: str) -> User:
+        """Create a new user."""
+        user = User(username=username, password_hash=password_hash)
+        try:
+            self.session.add(user)
+            await self.session.commit()
+            await self.session.refresh(user)
+            return user
+        except IntegrityError:
+            await self.session.rollback()
+            raise AlreadyExistsException(f"User {username} already exists")
+
+    async def get_by_username(self, username: str) -> User | None:
+        """Fetch a user by username, or None if it does not exist."""
+        return await self.session.scalar(select(User).where(User.username == username))
@@ -0,0 +1,24 @@
+# app/domains/users/users_services.py
+from app.core.exceptions import UnauthorizedException
+from app.core.security import create_access_token, hash_password, verify_password
+from app.domains.users.users_repository import UserRepository
+from app.schemas.user import TokenResponse, UserCreate, UserLogin, UserResponse
+
+
+class UserService:
+    def __init__(self, repository: UserRepository):
+        """Service layer for user registration and login."""
+        self.repository = repository
+
+    async def register(self, data: UserCreate) -> UserResponse:
+        # 哈希在进程池中执行，不阻塞事件循环
+        password_hash = await hash_password(data.password)
+        user = await self.repository.create(data.username, password_hash)
+        return UserResponse.model_validate(user)
+
+    async def login(self, data: UserLogin) -> TokenResponse:
+        user = await self.repository.get_by_username(data.username)
+        # 用户不存在时 verify_password 仍会执行一次同等开销的校验，避免通过耗时枚举用户名
+        if not await verify_password(data.password, user.password_hash if user else None):
+            raise UnauthorizedException("Incorrect username or password")
+        return TokenResponse(access_token=create_access_token(user.id, user.username))
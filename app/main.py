@@ -1,39 +1,137 @@
 # /fastapi-demo-project/app/main.py
 from loguru import logger
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, Response
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 # 从 config 模块导入 get_settings 函数和 get_project_version 函数
 from app.core.config import Settings, get_settings, get_project_version, settings
+from app.core.logging_config import setup_logging, flush_logging
 # 从 core.database 模块导入 setup_database_connection 和 close_database_connection 函数
 from app.core.database import (
     setup_database_connection,
     close_database_connection,
     create_db_and_tables,
     get_db,
+    setup_shard_connections,
+    warm_up_database_pool,
 )
 # 导入所有模型，确保它们被注册到 Base.metadata 中
 import app.models
 # 导入全局异常处理函数
-from app.core.exceptions import global_exception_handler
+from app.core.exceptions import global_exception_handler, db_exception_handler
+from sqlalchemy.exc import DBAPIError
+# 导入准入控制中间件和指标注册表
+from app.core.admission import AdmissionController, AdmissionControlMiddleware
+from app.core.metrics import metrics
+from app.core.deadline import DeadlineMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.core.traffic_capture import TrafficCaptureMiddleware, start_traffic_capture, stop_traffic_capture
+from app.core.loop_monitor import start_loop_monitor, stop_loop_monitor
 from app.api.v1 import heroes_route # 导入我们创建的路由模块
+from app.api.v1 import auth_route
+from app.api.v1 import admin_route
+from app.core.reload import install_sighup_handler, remove_sighup_handler
+from app.core.security import setup_password_hasher, close_password_hasher, get_current_user
+from app.domains.heroes.heroes_batcher import start_hero_batcher, stop_hero_batcher
+from app.domains.heroes.heroes_events import (
+    start_hero_change_broker,
+    stop_hero_change_broker,
+    get_running_hero_change_broker,
+)
+from app.domains.heroes.heroes_repository import HeroRepository
+from app.domains.heroes.heroes_memory_repository import (
+    setup_memory_hero_repository,
+    close_memory_hero_repository,
+    get_memory_hero_repository,
+)
+from app.domains.heroes.heroes_sharded_repository import ShardedHeroRepository
+from app.domains.heroes.heroes_suggest import (
+    start_hero_suggest_index,
+    stop_hero_suggest_index,
+    get_hero_suggest_index,
+)
+
+# 尽早替换默认的同步日志 handler，使启动日志也走后台写入
+setup_logging(settings.LOG)
 
 # 使用 lifespan 管理应用生命周期事件
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 应用启动时执行
     get_settings()  # 应用启动时触发配置加载和缓存
-    await setup_database_connection()
+    # 尽早启动事件循环延迟监控，启动阶段的阻塞也能被发现
+    if settings.LOOP_MONITOR.ENABLED:
+        await start_loop_monitor(settings.LOOP_MONITOR, debug=settings.DEBUG)
+    # memory 存储后端用于去掉数据库后压测/剖析: 不连接数据库，
+    # 依赖数据库的功能 (认证、批量写入、变更流) 不可用
+    memory_backend = settings.REPOSITORY.BACKEND == "memory"
+    # sharded 存储后端: 主库作为查找分片 (id 分配、alias 唯一、变更通知)，英雄数据在各分片上
+    sharded_backend = settings.REPOSITORY.BACKEND == "sharded"
+    if memory_backend:
+        setup_memory_hero_repository(settings.REPOSITORY)
+        logger.warning("英雄存储使用内存后端，数据库相关功能已禁用。")
+    else:
+        await setup_database_connection()
+    if sharded_backend:
+        await setup_shard_connections(settings.DB)
+    # 启动密码哈希进程池，KDF 不在事件循环中执行
+    await setup_password_hasher(settings.AUTH)
     # [可选] 在开发时创建表
-    if settings.ENVIRONMENT == "dev":
+    if settings.ENVIRONMENT == "dev" and not memory_backend:
         await create_db_and_tables()
+    # [可选] 预热连接池并预先准备热点语句；完成之前不接收请求 (uvicorn 在 lifespan 启动完成后才开始监听)
+    # 分片模式下主库不承担英雄读请求，只预热连接
+    if settings.DB.WARMUP_ENABLED and not memory_backend:
+        await warm_up_database_pool(
+            settings.DB,
+            None if sharded_backend else lambda session: HeroRepository(session).prepare_hot_statements(),
+        )
+    # [可选] 启动英雄批量写入器
+    if settings.BATCH.ENABLED and not memory_backend:
+        await start_hero_batcher(settings.BATCH)
+    # 启动英雄变更事件的 LISTEN 连接 (每个 worker 一条)
+    if settings.CHANGES.ENABLED and not memory_backend:
+        await start_hero_change_broker(settings.CHANGES)
+    # [可选] 在后台构建自动补全的内存索引，并订阅变更事件保持同步
+    if settings.SUGGEST.ENABLED:
+        if memory_backend:
+            load_suggest_entries = get_memory_hero_repository().list_suggest_entries
+        elif sharded_backend:
+            load_suggest_entries = ShardedHeroRepository().list_suggest_entries
+        else:
+            load_suggest_entries = None
+        await start_hero_suggest_index(settings.SUGGEST, load_suggest_entries)
+        broker = get_running_hero_change_broker()
+        if broker is not None:
+            broker.add_listener(get_hero_suggest_index().apply_event)
 
+    # [可选] 抽样录制线上流量，供 scripts/replay_traffic.py 回放
+    if settings.CAPTURE.ENABLED:
+        start_traffic_capture(settings.CAPTURE)
+
+    # kill -HUP <pid> 重新加载配置 (连接池参数热生效)
+    install_sighup_handler()
+
+    app.state.ready = True
     logger.info("🚀 应用启动，数据库已连接。")
     yield
+    app.state.ready = False
+    remove_sighup_handler()
     # 应用关闭时执行
+    # 先把批量写入队列刷空，再关闭数据库连接
+    await stop_hero_batcher()
+    await stop_hero_change_broker()
+    await stop_hero_suggest_index()
+    await close_password_hasher()
     await close_database_connection()
+    close_memory_hero_repository()
+    await stop_loop_monitor()
+    stop_traffic_capture()
     logger.info("应用关闭，数据库连接已释放。")
+    # 等待后台队列中的日志全部写出
+    flush_logging()
 
 
 
@@ -49,8 +147,34 @@ app = FastAPI(
 # 将 global_exception_handler 注册为处理所有 Exception 类型（及其子类）的处理器
 # 这会捕获所有类型为 Exception 的异常
 app.add_exception_handler(Exception, global_exception_handler)
+# 数据库错误单独处理: statement_timeout 返回 504，其余交给全局处理器
+app.add_exception_handler(DBAPIError, db_exception_handler)
+# [可选] 单请求剖析: 放在最内层，只统计路由本身的执行；未启用时不安装
+if settings.PROFILE.ENABLED:
+    app.add_middleware(ProfilingMiddleware, config=settings.PROFILE)
+# 准入控制: 过载时让部分请求快速失败 (503)，而不是所有请求都在连接池里等满 POOL_TIMEOUT
+if settings.ADMISSION.ENABLED:
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        controller=AdmissionController(settings.ADMISSION),
+    )
+# 截止时间中间件放在最外层，使时间预算覆盖排队时间；超时或客户端断开时取消请求
+if settings.DEADLINE.ENABLED:
+    app.add_middleware(DeadlineMiddleware, config=settings.DEADLINE)
+# [可选] 流量录制放在截止时间中间件之外，记录的耗时就是客户端看到的耗时
+if settings.CAPTURE.ENABLED:
+    app.add_middleware(TrafficCaptureMiddleware, config=settings.CAPTURE)
 # 将英雄路由注册到主应用中
-app.include_router(heroes_route.router, prefix="/api/v1")
+app.include_router(
+    heroes_route.router,
+    prefix="/api/v1",
+    # [可选] 要求登录才能访问英雄接口；令牌校验命中缓存时几乎没有开销
+    dependencies=[Depends(get_current_user)] if settings.AUTH.PROTECT_HEROES else [],
+)
+# 注册认证路由
+app.include_router(auth_route.router, prefix="/api/v1")
+# 管理接口 (需要 X-Admin-Token)
+app.include_router(admin_route.router)
 
 @app.get("/")
 def read_root(
@@ -89,6 +213,25 @@ async def db_check(db: AsyncSession = Depends(get_db)):
         return {"status": "error", "message": f"数据库连接失败: {e}"}
 
 
+@app.get("/ready")
+async def ready(response: Response):
+    """
+    就绪探针: 启动流程 (包括连接池预热) 完成后返回 200，之前和关闭过程中返回 503。
+    """
+    is_ready = getattr(app.state, "ready", False)
+    if not is_ready:
+        response.status_code = 503
+    return {"ready": is_ready}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    以 Prometheus 文本格式输出进程内指标。
+    """
+    return metrics.render()
+
+
 # --- 异常处理测试端点 ---
 from app.core.exceptions import (
     NotFoundException,
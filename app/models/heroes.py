@@ -1,17 +1,91 @@
 # app/models/heroes.py
-from sqlalchemy import String, Integer, Text
+import re
+
+from sqlalchemy import DDL, String, Integer, Text, Sequence, Index, event, text
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.base import Base
 
+# 分片模式下英雄 id 的全局分配器 (只在查找分片，即主库上使用)
+hero_global_id_seq = Sequence("hero_global_id_seq", metadata=Base.metadata)
+
+# --- powers 标签 ---
+# powers 是自由文本 (如 "Flight, heat vision & invulnerability")。按 , ; & 切分、转小写、
+# 合并空白、去重后得到规范化的标签数组 powers_tags，配合 GIN 索引支持 && / @> 查询。
+# 数据库端由触发器维护 (任何写入路径都生效)，Python 端的 normalize_power_tags 与之保持一致。
+_TAG_SEPARATORS = re.compile(r"[,;&]")
+_WHITESPACE = re.compile(r"\s+")
+
+HERO_POWER_TAGS_FUNCTION = r"""
+CREATE OR REPLACE FUNCTION hero_power_tags(powers text) RETURNS text[]
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT coalesce(array_agg(DISTINCT tag ORDER BY tag), '{}')
+    FROM (
+        SELECT btrim(regexp_replace(lower(part), '\s+', ' ', 'g')) AS tag
+        FROM regexp_split_to_table(coalesce(powers, ''), '[,;&]') AS part
+    ) AS parts
+    WHERE tag <> ''
+$$
+"""
+HERO_POWER_TAGS_TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION heroes_set_powers_tags() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.powers_tags := hero_power_tags(NEW.powers);
+    RETURN NEW;
+END
+$$
+"""
+HERO_POWER_TAGS_TRIGGER = """
+CREATE TRIGGER heroes_powers_tags
+BEFORE INSERT OR UPDATE OF powers ON heroes
+FOR EACH ROW EXECUTE FUNCTION heroes_set_powers_tags()
+"""
+
+
+def normalize_power_tags(powers: str | None) -> list[str]:
+    """与数据库函数 hero_power_tags 相同的规范化规则。"""
+    if not powers:
+        return []
+    tags = {_WHITESPACE.sub(" ", part.lower()).strip() for part in _TAG_SEPARATORS.split(powers)}
+    tags.discard("")
+    return sorted(tags)
+
+
 class Hero(Base):
     __tablename__ = "heroes"
+    __table_args__ = (
+        # 自动补全的数据库回退查询: lower(name/alias) LIKE 'prefix%' 需要 text_pattern_ops 才能走索引
+        Index("ix_heroes_alias_lower_pattern", text("lower(alias) text_pattern_ops")),
+        Index("ix_heroes_name_lower_pattern", text("lower(name) text_pattern_ops")),
+        # 按标签过滤: powers_tags && / @> ARRAY[...] 走 GIN 索引
+        Index("ix_heroes_powers_tags", "powers_tags", postgresql_using="gin"),
+    )
     # 一个英雄的表，包含了名字以及称号两个字段
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     alias: Mapped[str] = mapped_column(String(100), unique=True, nullable=False, index=True)
     # 💡 新增一个 powers 字段，注意它必须是可选的！
     powers: Mapped[str | None] = mapped_column(Text, nullable=True) # 使用Text可以存储更长的文本
+    # 由触发器根据 powers 维护，应用代码不直接写入；回填完成前旧数据可能为 NULL
+    powers_tags: Mapped[list[str] | None] = mapped_column(ARRAY(Text), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<Hero(id={self.id!r}, name={self.name!r}, alias={self.alias!r})>"
+
+
+# create_all (开发环境) 建表后同样安装标签触发器；生产环境由迁移创建
+for _ddl in (HERO_POWER_TAGS_FUNCTION, HERO_POWER_TAGS_TRIGGER_FUNCTION, HERO_POWER_TAGS_TRIGGER):
+    event.listen(Hero.__table__, "after_create", DDL(_ddl).execute_if(dialect="postgresql"))
+
+
+class HeroAlias(Base):
+    """分片模式的查找表 (位于主库): alias -> 英雄 id，在写入分片之前保证 alias 全局唯一。"""
+    __tablename__ = "hero_aliases"
+
+    alias: Mapped[str] = mapped_column(String(100), primary_key=True)
+    hero_id: Mapped[int] = mapped_column(Integer, unique=True, nullable=False)
 
     def __repr__(self) -> str:
-        return f"<Hero(id={self.id!r}, name={self.name!r}, alias={self.alias!r})>"
\ No newline at end of file
+        return f"<HeroAlias(alias={self.alias!r}, hero_id={self.hero_id!r})>"
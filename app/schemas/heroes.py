@@ -31,6 +31,32 @@ class HeroStoryResponse(HeroResponse):
     """
     story: str
 
+# 异步批量创建: 请求被接受 (202) 后返回的跟踪信息
+class HeroCreateStatus(BaseModel):
+    tracking_id: str
+    status: Literal["queued", "committed", "conflict", "failed"]
+    hero_id: int | None = None
+    detail: str | None = None
+
+# 自动补全的返回结构
+class HeroSuggestion(BaseModel):
+    id: int
+    name: str
+    alias: str
+
+class HeroSuggestResponse(BaseModel):
+    data: list[HeroSuggestion]
+    source: Literal["memory", "database"] # 结果来自内存索引还是数据库回退查询
+
+# 能力标签计数 (facet)
+class HeroTagFacet(BaseModel):
+    tag: str
+    count: int
+
+class HeroTagFacetResponse(BaseModel):
+    data: list[HeroTagFacet]
+    cache_age_seconds: float # 聚合结果已缓存的时间
+
 # --- 新增的返回结构模型 ---
 
 # 1. 分页信息模型
@@ -59,6 +85,8 @@ class Sort(BaseModel):
 # 3. 过滤信息模型
 class Filters(BaseModel):
     search: str | None
+    powers__contains_any: list[str] | None = None
+    powers__contains_all: list[str] | None = None
 
 # 4. 最终的、集大成的列表响应模型
 class HeroListResponse(BaseModel):
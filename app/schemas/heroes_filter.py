@@ -1,31 +1,77 @@
 # app/schemas/heroes_filter.py
 from fastapi_filter.contrib.sqlalchemy import Filter
-from pydantic import Field
-from app.models.heroes import Hero
+from pydantic import Field, field_validator
+from sqlalchemy import String
+from app.models.heroes import Hero, normalize_power_tags
+
+# 基类的运算符表里没有这两个，由 HeroFilter.filter 自己处理
+TAG_FILTER_FIELDS = ("powers__contains_any", "powers__contains_all")
 
 class HeroFilter(Filter):
     # 1. 定义查询参数
     search: str | None = Field(None, description="按 name/alias/powers 模糊搜索")
+    powers__contains_any: list[str] | None = Field(
+        None,
+        description="包含任一能力标签，逗号分隔，如 'flight,heat vision'",
+    )
+    powers__contains_all: list[str] | None = Field(
+        None,
+        description="同时包含所有能力标签，逗号分隔",
+    )
     order_by: list[str] = Field(
         [],
         description="排序字段，如 '-name,powers'", # 注意：库的默认行为是用逗号分隔
         json_schema_extra={"example": ["-name", "powers"]},
     )
 
+    # 标签按与 powers_tags 相同的规则规范化 (大小写、空白)，查询参数中的逗号即分隔符
+    @field_validator(*TAG_FILTER_FIELDS, mode="before")
+    @classmethod
+    def normalize_tags(cls, value):
+        if isinstance(value, str):
+            value = [value]
+        if isinstance(value, list):
+            return normalize_power_tags(",".join(value)) or None
+        return value
+
+    @property
+    def filtering_fields(self):
+        return [(name, value) for name, value in super().filtering_fields if name not in TAG_FILTER_FIELDS]
+
+    def filter(self, query):
+        query = super().filter(query)
+        # && / @> 都能走 powers_tags 上的 GIN 索引
+        if self.powers__contains_any:
+            query = query.filter(Hero.powers_tags.overlap(self.powers__contains_any))
+        if self.powers__contains_all:
+            query = query.filter(Hero.powers_tags.contains(self.powers__contains_all))
+        return query
+
     # 2. 保留我们的自定义排序增强逻辑
-    def sort(self, query):
-        # a. 首先，让父类的 sort 方法处理来自前端的 order_by 参数
-        if self.ordering_values:
-            query = super().sort(query)
+    def sort(self, query, collation: str | None = None):
+        """
+        追加 ORDER BY。collation 不为空时字符串字段按该排序规则比较
+        (分片后端用 "C"，使各分片的顺序与合并时的码点比较一致)。
+        """
+        # a. 首先，处理来自前端的 order_by 参数 (与父类的 sort 相同)
+        for value in self.ordering_values or []:
+            column = self._order_column(value.lstrip("+-"), collation)
+            query = query.order_by(column.desc() if value.startswith("-") else column.asc())
 
         # b. 然后，追加我们自己的默认/固定排序规则
-        if not any(v.lstrip("+-") == "name" for v in self.ordering_values):
-            query = query.order_by(Hero.name.asc())
+        if not any(v.lstrip("+-") == "name" for v in self.ordering_values or []):
+            query = query.order_by(self._order_column("name", collation).asc())
         query = query.order_by(Hero.id.asc())
 
         return query
 
+    def _order_column(self, field: str, collation: str | None):
+        column = getattr(self.Constants.model, field)
+        if collation is not None and isinstance(column.type, String):
+            return column.collate(collation)
+        return column
+
     # 3. 配置元数据
     class Constants(Filter.Constants):
         model = Hero  # 指定此 Filter 关联的 SQLAlchemy 模型
-        search_model_fields = ["name", "alias", "powers"] # 指定 `search` 参数应该搜索哪些字段
\ No newline at end of file
+        search_model_fields = ["name", "alias", "powers"] # 指定 `search` 参数应该搜索哪些字段
@@ -1,14 +1,19 @@
 # app/schemas/user.py
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 # 基础模型，包含所有用户共有的字段
 class UserBase(BaseModel):
-    username: str
+    # 与 users.username 列的 String(64) 一致，超长时返回 422 而不是数据库报错 (500)
+    username: str = Field(min_length=1, max_length=64)
 
 # 创建用户时，从请求体中读取的模型
 # 需要提供密码
 class UserCreate(UserBase):
-    password: str
+    password: str = Field(min_length=8, max_length=128)
+
+# 登录时提交的凭据
+class UserLogin(UserBase):
+    password: str = Field(max_length=128)
 
 # 从数据库读取并返回给客户端的模型
 # 不应该包含密码，但应该包含 id
@@ -16,4 +21,9 @@ class UserResponse(UserBase):
     id: int
     # Pydantic V2 的新配置方式
     class Config:
-        from_attributes = True  # 告诉 Pydantic 模型可以从 ORM 对象属性中读取数据
\ No newline at end of file
+        from_attributes = True  # 告诉 Pydantic 模型可以从 ORM 对象属性中读取数据
+
+# 登录成功后返回的访问令牌
+class TokenResponse(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
@@ -0,0 +1,164 @@
+# scripts/bench_connection_hold.py
+"""
+连接占用时间 / 连接池占用率基准测试。
+
+以固定并发请求正在运行的服务，测试前后各读取一次 /metrics，根据差值计算:
+
+  - 吞吐 (req/s)
+  - 每次借出连接的平均占用时长 (db_connection_hold_seconds)
+  - 平均同时占用的连接数 = 占用时长累计 / 测试时长
+  - 每个连接每秒服务的请求数 = 吞吐 / 平均占用连接数
+
+连接占用得越短，同样大小的连接池能撑住的并发就越高。改动前后各跑一次同样的参数即可对比:
+--save NAME 把结果保存到 .benchmarks/connection_hold-NAME.json，
+--compare NAME 把本次结果与保存的结果并排输出 (含变化百分比)。
+
+用法:
+    python scripts/bench_connection_hold.py --url http://127.0.0.1:8000 --concurrency 50 --duration 20
+    python scripts/bench_connection_hold.py --route get --heroes 1000
+    git checkout <改动前>  && python scripts/bench_connection_hold.py --route list --save before
+    git checkout <改动后>  && python scripts/bench_connection_hold.py --route list --compare before --save after
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+
+ROUTES = {
+    "get": ("/api/v1/heroes/{id}", None),
+    "list": ("/api/v1/heroes", {"page": 3}),
+    "list_sorted": ("/api/v1/heroes", {"order_by": "-powers,alias", "page": 3}),
+    "list_search": ("/api/v1/heroes", {"search": "man", "page": 2}),
+    "story": ("/api/v1/heroes/{id}/story", None),
+}
+_METRIC_LINE = re.compile(r"^(\S+)\s+(\S+)$")
+BASELINE_DIR = project_root / ".benchmarks"
+# (结果字段, 显示名称, 单位, 数值越大越好)
+COMPARED = [
+    ("throughput", "throughput", "req/s", True),
+    ("checkouts_per_request", "checkouts per request", "", False),
+    ("avg_hold_ms", "avg hold time", "ms", False),
+    ("avg_occupancy", "avg pool occupancy", "conns", False),
+    ("avg_checkout_wait_ms", "avg checkout wait", "ms", False),
+    ("requests_per_connection", "req/s per connection", "", True),
+]
+
+
+async def read_metrics(client: httpx.AsyncClient) -> dict[str, float]:
+    resp = await client.get("/metrics")
+    resp.raise_for_status()
+    values: dict[str, float] = {}
+    for line in resp.text.splitlines():
+        match = _METRIC_LINE.match(line)
+        if match:
+            values[match.group(1)] = float(match.group(2))
+    return values
+
+
+async def worker(client: httpx.AsyncClient, routes: list[str], heroes: int, deadline: float, stats: dict) -> None:
+    rng = random.Random()
+    while time.perf_counter() < deadline:
+        path, params = ROUTES[rng.choice(routes)]
+        resp = await client.get(path.format(id=rng.randint(1, heroes)), params=params)
+        stats["ok" if resp.status_code < 400 else "errors"] += 1
+
+
+async def main_async(args) -> None:
+    routes = [args.route] if args.route else list(ROUTES)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+        before = await read_metrics(client)
+        stats = {"ok": 0, "errors": 0}
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(worker(client, routes, args.heroes, deadline, stats) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+        after = await read_metrics(client)
+
+    def delta(name: str) -> float:
+        return after.get(name, 0.0) - before.get(name, 0.0)
+
+    requests = stats["ok"] + stats["errors"]
+    checkouts = delta("db_connection_hold_seconds_count")
+    hold_sum = delta("db_connection_hold_seconds_sum")
+    occupancy = hold_sum / elapsed
+    throughput = requests / elapsed
+
+    print(f"routes:                 {', '.join(routes)}")
+    print(f"requests:               {requests} ({stats['errors']} errors) in {elapsed:.1f}s")
+    print(f"throughput:             {throughput:.1f} req/s")
+    if not checkouts:
+        print("no connection checkouts recorded (memory backend, or metrics unavailable)")
+        return
+    result = {
+        "routes": routes,
+        "concurrency": args.concurrency,
+        "duration": elapsed,
+        "requests": requests,
+        "errors": stats["errors"],
+        "throughput": throughput,
+        "checkouts_per_request": checkouts / max(requests, 1),
+        "avg_hold_ms": hold_sum / checkouts * 1000,
+        "avg_occupancy": occupancy,
+        "pool_size": after.get("db_pool_size", 0),
+        "avg_checkout_wait_ms": (
+            delta("db_pool_checkout_wait_seconds_sum") / max(delta("db_pool_checkout_wait_seconds_count"), 1) * 1000
+        ),
+        "requests_per_connection": throughput / occupancy if occupancy else 0,
+    }
+    print(f"connection checkouts:   {checkouts:.0f} ({result['checkouts_per_request']:.2f} per request)")
+    print(f"avg hold time:          {result['avg_hold_ms']:.2f}ms")
+    print(f"avg pool occupancy:     {occupancy:.2f} connections (pool_size={result['pool_size']:.0f})")
+    print(f"avg checkout wait:      {result['avg_checkout_wait_ms']:.2f}ms")
+    print(f"req/s per connection:   {result['requests_per_connection']:.1f}")
+
+    if args.compare:
+        compare(result, args.compare)
+    if args.save:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path = BASELINE_DIR / f"connection_hold-{args.save}.json"
+        path.write_text(json.dumps(result, indent=2))
+        print(f"\nsaved to {path}")
+
+
+def compare(result: dict, name: str) -> None:
+    """与保存的结果并排输出；参数不同 (路由、并发) 时给出提示。"""
+    path = BASELINE_DIR / f"connection_hold-{name}.json"
+    if not path.exists():
+        sys.exit(f"baseline {path} not found")
+    baseline = json.loads(path.read_text())
+    if (baseline["routes"], baseline["concurrency"]) != (result["routes"], result["concurrency"]):
+        print(f"\nwarning: baseline was run with routes={baseline['routes']} "
+              f"concurrency={baseline['concurrency']}, numbers are not directly comparable")
+    print(f"\n{'':28}{name:>12}{'current':>12}{'change':>10}")
+    for key, label, unit, higher_is_better in COMPARED:
+        old, new = baseline[key], result[key]
+        change = (new - old) / old * 100 if old else 0.0
+        better = (change > 0) == higher_is_better if change else None
+        mark = {True: " better", False: " worse", None: ""}[better]
+        print(f"{label + (f' ({unit})' if unit else ''):28}{old:>12.2f}{new:>12.2f}{change:>+9.1f}%{mark}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="服务地址")
+    parser.add_argument("--route", choices=sorted(ROUTES), help="只测一个路由 (默认混合所有读路由)")
+    parser.add_argument("--concurrency", type=int, default=50, help="并发请求数")
+    parser.add_argument("--duration", type=float, default=20, help="测试时长 (秒)")
+    parser.add_argument("--heroes", type=int, default=1000, help="随机请求的英雄 id 范围 1..N")
+    parser.add_argument("--save", metavar="NAME", help="保存结果到 .benchmarks/connection_hold-NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="与保存的结果对比")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
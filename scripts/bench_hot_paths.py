@@ -0,0 +1,417 @@
+# scripts/bench_hot_paths.py
+"""
+英雄接口热点函数的微基准测试 (纯 Python，不需要 PostgreSQL)。
+
+bench_request_overhead.py 测的是整个请求；这里把列表接口拆成单独的步骤分别计时:
+
+  query     HeroFilter.filter / sort 构建查询、build_list_queries
+  compile   count 子查询和分页查询的完整编译 (asyncpg 方言)，以及编译缓存命中时仍要做的缓存键计算
+  validate  HeroResponse.model_validate 100 个 ORM 对象
+  response  list_heroes 的排序规则解析 (parse_order_rules) 和 HeroListResponse 组装
+  json      响应的 JSON 编码 (与 FastAPI JSONResponse 相同的方式，以及 model_dump_json)
+
+计时方式与 pytest-benchmark 相同: 先校准每轮的调用次数，使一轮至少持续 --min-time，
+再在 --max-time 内重复多轮 (至少 --min-rounds 轮)，报告每次调用的 min/median/mean/stddev/ops。
+
+基线:
+  --save NAME      把结果保存到 .benchmarks/NAME.json (带机器和版本信息)
+  --compare NAME   与保存的基线对比，任一基准的 --compare-stat (默认 median)
+                   比基线慢超过 --fail-slowdown 百分比时退出码为 1，可直接用作 CI 门禁
+基线只在同一台机器、同样的 Python/依赖版本下可比，机器信息不同时会给出提示。
+
+用法:
+    python scripts/bench_hot_paths.py
+    python scripts/bench_hot_paths.py --save main
+    python scripts/bench_hot_paths.py --compare main --fail-slowdown 10
+    python scripts/bench_hot_paths.py -k validate --max-time 3
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+# 必须在导入 app 之前设置: 存储后端在导入路由时确定 (这里不会连接任何数据库)
+os.environ.setdefault("DEMO_REPOSITORY_BACKEND", "memory")
+
+BASELINE_DIR = project_root / ".benchmarks"
+
+# name -> (group, setup)；setup 在计时之外执行，返回被计时的无参函数
+BENCHMARKS: dict[str, tuple[str, Callable[[], Callable[[], object]]]] = {}
+
+
+def benchmark(name: str, group: str):
+    def register(setup: Callable[[], Callable[[], object]]):
+        BENCHMARKS[name] = (group, setup)
+        return setup
+    return register
+
+
+# --- 测试数据 ---
+def make_heroes(count: int) -> list:
+    from app.models.heroes import Hero, normalize_power_tags
+
+    heroes = []
+    for i in range(1, count + 1):
+        powers = f"flight, power {i % 17:03d}, heat vision"
+        heroes.append(Hero(
+            id=i, name=f"Hero {i:05d}", alias=f"alias-{i:05d}", powers=powers,
+            powers_tags=normalize_power_tags(powers),
+        ))
+    return heroes
+
+
+def make_filter(**fields):
+    from app.schemas.heroes_filter import HeroFilter
+
+    # 与 FilterDepends 一样经过校验 (order_by 按逗号拆分、标签规范化)
+    return HeroFilter.model_validate(fields)
+
+
+FILTERS = {
+    "none": {},
+    "search": {"search": "man"},
+    "tags": {"powers__contains_any": "flight,heat vision", "powers__contains_all": "flight,power 003"},
+    "sorted": {"order_by": "-powers,alias"},
+    "search_sorted": {"search": "man", "order_by": "-powers,alias"},
+}
+
+
+def _select_hero():
+    from sqlalchemy import select
+
+    from app.models.heroes import Hero
+
+    return select(Hero)
+
+
+# --- query ---
+def _filter_bench(shape: str):
+    def setup():
+        hero_filter, base = make_filter(**FILTERS[shape]), _select_hero()
+        return lambda: hero_filter.filter(base)
+    return setup
+
+
+for _shape in ("none", "search", "tags"):
+    benchmark(f"filter[{_shape}]", "query")(_filter_bench(_shape))
+
+
+@benchmark("sort[-powers,alias]", "query")
+def _sort():
+    hero_filter, base = make_filter(**FILTERS["sorted"]), _select_hero()
+    return lambda: hero_filter.sort(base)
+
+
+@benchmark("build_list_queries[search_sorted]", "query")
+def _build_list_queries():
+    from app.domains.heroes.heroes_repository import HeroRepository
+
+    hero_filter = make_filter(**FILTERS["search_sorted"])
+    return lambda: HeroRepository.build_list_queries(hero_filter, limit=10, offset=20)
+
+
+# --- compile ---
+def _queries(shape: str):
+    from app.domains.heroes.heroes_repository import HeroRepository
+
+    return HeroRepository.build_list_queries(make_filter(**FILTERS[shape]), limit=10, offset=20)
+
+
+def _dialect():
+    from sqlalchemy.dialects.postgresql import asyncpg
+
+    return asyncpg.dialect()
+
+
+@benchmark("count_compile[search]", "compile")
+def _count_compile():
+    count_query, _ = _queries("search")
+    dialect = _dialect()
+    return lambda: count_query.compile(dialect=dialect)
+
+
+@benchmark("count_compile[tags]", "compile")
+def _count_compile_tags():
+    count_query, _ = _queries("tags")
+    dialect = _dialect()
+    return lambda: count_query.compile(dialect=dialect)
+
+
+@benchmark("page_compile[search_sorted]", "compile")
+def _page_compile():
+    _, page_query = _queries("search_sorted")
+    dialect = _dialect()
+    return lambda: page_query.compile(dialect=dialect)
+
+
+@benchmark("build_list_queries+cache_key[search_sorted]", "compile")
+def _cache_key():
+    # 执行时编译缓存命中，但每个请求都是新构建的语句，仍要计算缓存键 (结果缓存在语句对象上，
+    # 所以必须连同构建一起计时)。减去 build_list_queries 的耗时即缓存键的成本
+    from app.domains.heroes.heroes_repository import HeroRepository
+
+    hero_filter = make_filter(**FILTERS["search_sorted"])
+
+    def build_and_key():
+        count_query, page_query = HeroRepository.build_list_queries(hero_filter, limit=10, offset=20)
+        return count_query._generate_cache_key(), page_query._generate_cache_key()
+
+    return build_and_key
+
+
+# --- validate ---
+@benchmark("HeroResponse.model_validate x100", "validate")
+def _model_validate():
+    from app.schemas.heroes import HeroResponse
+
+    heroes = make_heroes(100)
+    validate = HeroResponse.model_validate
+    return lambda: [validate(hero) for hero in heroes]
+
+
+# --- response ---
+@benchmark("parse_order_rules[-powers,alias]", "response")
+def _parse_order_rules():
+    from app.api.v1.heroes_route import parse_order_rules
+
+    hero_filter = make_filter(**FILTERS["sorted"])
+    return lambda: parse_order_rules(hero_filter)
+
+
+@benchmark("build_hero_list_response[100 heroes]", "response")
+def _build_list_response():
+    from app.api.v1.heroes_route import build_hero_list_response
+
+    hero_filter = make_filter(**FILTERS["search_sorted"])
+    heroes = make_heroes(100)
+    return lambda: build_hero_list_response(hero_filter, heroes, total=12345, page=3, limit=100)
+
+
+# --- json ---
+def _list_response():
+    from app.api.v1.heroes_route import build_hero_list_response
+
+    return build_hero_list_response(
+        make_filter(**FILTERS["search_sorted"]), make_heroes(100), total=12345, page=3, limit=100
+    )
+
+
+@benchmark("json[JSONResponse, 100 heroes]", "json")
+def _json_response():
+    from fastapi.responses import JSONResponse
+
+    response = _list_response()
+    # FastAPI 先按 response_model 转成 JSON 兼容的 Python 对象，再由 JSONResponse.render 编码
+    return lambda: JSONResponse(response.model_dump(mode="json")).body
+
+
+@benchmark("json[model_dump_json, 100 heroes]", "json")
+def _json_model_dump_json():
+    response = _list_response()
+    return lambda: response.model_dump_json().encode()
+
+
+# --- 计时 ---
+def calibrate(func: Callable[[], object], min_time: float) -> int:
+    """找到让一轮至少持续 min_time 的调用次数。"""
+    iterations = 1
+    while iterations < 1_000_000:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        if time.perf_counter() - start >= min_time:
+            break
+        iterations *= 2
+    return iterations
+
+
+def run_benchmark(func: Callable[[], object], args) -> dict:
+    iterations = calibrate(func, args.min_time)
+    # 预热: 填满各种缓存 (SQLAlchemy 编译缓存、pydantic 校验器等)
+    warmup_deadline = time.perf_counter() + args.warmup
+    while time.perf_counter() < warmup_deadline:
+        func()
+
+    rounds: list[float] = []
+    gc_was_enabled = gc.isenabled()
+    if args.disable_gc:
+        gc.disable()
+    try:
+        deadline = time.perf_counter() + args.max_time
+        while len(rounds) < args.min_rounds or time.perf_counter() < deadline:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                func()
+            rounds.append((time.perf_counter() - start) / iterations)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    quartiles = statistics.quantiles(rounds, n=4) if len(rounds) > 1 else [rounds[0]] * 3
+    median = statistics.median(rounds)
+    return {
+        "min": min(rounds),
+        "max": max(rounds),
+        "mean": statistics.fmean(rounds),
+        "stddev": statistics.stdev(rounds) if len(rounds) > 1 else 0.0,
+        "median": median,
+        "iqr": quartiles[2] - quartiles[0],
+        "ops": 1 / median if median else math.inf,
+        "rounds": len(rounds),
+        "iterations": iterations,
+    }
+
+
+def fmt_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def machine_info() -> dict:
+    import pydantic
+    import sqlalchemy
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_root, capture_output=True, text=True, timeout=5
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "node": platform.node(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "python_implementation": platform.python_implementation(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "pydantic": pydantic.VERSION,
+        "commit": commit,
+    }
+
+
+def baseline_path(name: str) -> Path:
+    path = Path(name)
+    if path.suffix == ".json" or path.parent != Path("."):
+        return path
+    return BASELINE_DIR / f"{name}.json"
+
+
+def print_results(results: dict[str, dict]) -> None:
+    width = max(len(name) for name in results) + 2
+    print(f"{'benchmark':<{width}}{'min':>10}{'median':>10}{'mean':>10}{'stddev':>10}{'iqr':>10}"
+          f"{'ops/s':>12}{'rounds':>8}{'iters':>8}")
+    group = None
+    for name, stats in results.items():
+        if stats["group"] != group:
+            group = stats["group"]
+            print(f"-- {group}")
+        print(
+            f"{name:<{width}}{fmt_time(stats['min']):>10}{fmt_time(stats['median']):>10}"
+            f"{fmt_time(stats['mean']):>10}{fmt_time(stats['stddev']):>10}{fmt_time(stats['iqr']):>10}"
+            f"{stats['ops']:>12,.0f}{stats['rounds']:>8}{stats['iterations']:>8}"
+        )
+
+
+def compare(results: dict[str, dict], baseline: dict, args) -> bool:
+    """与基线对比，返回是否通过。"""
+    stat = args.compare_stat
+    current_machine = machine_info()
+    differs = [
+        key for key in ("machine", "processor", "cpu_count", "python", "sqlalchemy", "pydantic")
+        if baseline["machine_info"].get(key) != current_machine.get(key)
+    ]
+    print(f"\ncompare {stat} against baseline {args.compare} "
+          f"(commit {baseline['machine_info'].get('commit') or '?'}, {baseline['datetime']})")
+    if differs:
+        print(f"warning: baseline was recorded with a different {', '.join(differs)}; numbers may not be comparable")
+
+    width = max(len(name) for name in results) + 2
+    print(f"{'benchmark':<{width}}{'baseline':>10}{'current':>10}{'change':>10}")
+    regressions = []
+    for name, stats in results.items():
+        old = baseline["benchmarks"].get(name)
+        if old is None:
+            print(f"{name:<{width}}{'-':>10}{fmt_time(stats[stat]):>10}{'new':>10}")
+            continue
+        change = (stats[stat] / old[stat] - 1) * 100
+        flag = ""
+        if change > args.fail_slowdown:
+            flag = "  SLOWER"
+            regressions.append(name)
+        print(f"{name:<{width}}{fmt_time(old[stat]):>10}{fmt_time(stats[stat]):>10}{change:>+9.1f}%{flag}")
+
+    if regressions:
+        print(f"\nFAIL: {len(regressions)} benchmark(s) more than {args.fail_slowdown:g}% slower than baseline")
+        return False
+    print(f"\nOK: no benchmark more than {args.fail_slowdown:g}% slower than baseline")
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="keyword", help="只运行名称包含该子串的基准")
+    parser.add_argument("--list", action="store_true", help="列出所有基准")
+    parser.add_argument("--min-time", type=float, default=0.001, help="每轮的最短时长 (秒)，用于校准每轮调用次数")
+    parser.add_argument("--max-time", type=float, default=1.0, help="每个基准的计时时长 (秒)")
+    parser.add_argument("--min-rounds", type=int, default=5, help="每个基准的最少轮数")
+    parser.add_argument("--warmup", type=float, default=0.1, help="计时前的预热时长 (秒)")
+    parser.add_argument("--disable-gc", action="store_true", help="计时期间关闭 GC，结果更稳定但不含 GC 开销")
+    parser.add_argument("--save", metavar="NAME", help="把结果保存为基线 .benchmarks/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="与基线对比 (名称或 json 路径)")
+    parser.add_argument("--compare-stat", choices=["min", "median", "mean"], default="median", help="对比使用的统计量")
+    parser.add_argument("--fail-slowdown", type=float, default=10.0, help="慢于基线超过该百分比时失败")
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if not args.keyword or args.keyword in name]
+    if args.list:
+        for name in names:
+            print(f"{BENCHMARKS[name][0]:<10}{name}")
+        return
+    if not names:
+        parser.error(f"no benchmark matches {args.keyword!r}")
+
+    baseline = None
+    if args.compare:
+        path = baseline_path(args.compare)
+        if not path.exists():
+            parser.error(f"baseline {path} not found (create it with --save)")
+        baseline = json.loads(path.read_text(encoding="utf-8"))
+
+    results: dict[str, dict] = {}
+    for name in names:
+        group, setup = BENCHMARKS[name]
+        results[name] = {"group": group, **run_benchmark(setup(), args)}
+    print_results(results)
+
+    if args.save:
+        path = baseline_path(args.save)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({
+            "datetime": datetime.now(timezone.utc).isoformat(),
+            "machine_info": machine_info(),
+            "options": {k: getattr(args, k) for k in ("min_time", "max_time", "min_rounds", "disable_gc")},
+            "benchmarks": results,
+        }, indent=2), encoding="utf-8")
+        print(f"\nsaved baseline {path}")
+
+    if baseline is not None and not compare(results, baseline, args):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# scripts/bench_logging.py
+"""
+日志吞吐量与事件循环延迟基准测试。
+
+对比三种配置下:
+  1. sync      : 同步写 sink (loguru 默认行为)
+  2. background: 后台线程写 sink (app.core.logging_config.BackgroundSink)
+  3. sampled   : 后台写 + 1% 成功日志采样
+
+分别测量 "每秒日志条数" 和 "并发请求期间事件循环的调度延迟 (p50/p99)"。
+可用 --slow-sink-ms 模拟慢速磁盘/管道，观察同步 sink 对事件循环的影响。
+
+用法:
+    python scripts/bench_logging.py --messages 20000 --slow-sink-ms 0.2
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from loguru import logger
+
+from app.core.logging_config import BackgroundSink
+
+
+class SlowStream:
+    """一个模拟 I/O 延迟的输出流，写入内容直接丢弃。"""
+
+    def __init__(self, slow_ms: float):
+        self.slow_ms = slow_ms
+
+    def write(self, message: str) -> None:
+        if self.slow_ms:
+            time.sleep(self.slow_ms / 1000)
+
+    def flush(self) -> None:
+        pass
+
+
+_background: BackgroundSink | None = None
+
+
+def configure(mode: str, slow_ms: float) -> float:
+    """按模式配置 loguru，返回成功日志的采样率。"""
+    global _background
+    logger.remove()
+    stream = SlowStream(slow_ms)
+    if mode == "sync":
+        _background = None
+        logger.add(stream, serialize=True, diagnose=False)
+    else:
+        _background = BackgroundSink(stream, max_queue=10000)
+        logger.add(_background, serialize=True, diagnose=False)
+    return 0.01 if mode == "sampled" else 1.0
+
+
+async def fake_request(i: int, rate: float) -> None:
+    # 模拟一个路由: 一次 await (数据库) + 一条成功日志
+    await asyncio.sleep(0)
+    if rate >= 1.0 or random.random() < rate:
+        logger.info("Retrieved hero {}", i)
+
+
+async def measure(mode: str, messages: int, concurrency: int, slow_ms: float) -> dict:
+    rate = configure(mode, slow_ms)
+    lags: list[float] = []
+    stop = asyncio.Event()
+
+    async def ticker():
+        # 每 1ms 期望醒来一次，实际醒来的延迟就是事件循环的调度延迟
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append((time.perf_counter() - start - 0.001) * 1000)
+
+    tick = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    for batch_start in range(0, messages, concurrency):
+        await asyncio.gather(*(fake_request(i, rate) for i in range(batch_start, batch_start + concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+    # 等待后台队列写完，不计入请求耗时
+    if _background is not None:
+        _background.drain()
+
+    lags.sort()
+    return {
+        "mode": mode,
+        "req/s": round(messages / elapsed),
+        "lag_p50_ms": round(statistics.median(lags), 3) if lags else 0.0,
+        "lag_p99_ms": round(lags[int(len(lags) * 0.99) - 1], 3) if lags else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--slow-sink-ms", type=float, default=0.05)
+    args = parser.parse_args()
+
+    results = [
+        asyncio.run(measure(mode, args.messages, args.concurrency, args.slow_sink_ms))
+        for mode in ("sync", "background", "sampled")
+    ]
+    logger.remove()
+    print(f"{'mode':<10}{'req/s':>10}{'lag p50 ms':>14}{'lag p99 ms':>14}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['req/s']:>10}{r['lag_p50_ms']:>14}{r['lag_p99_ms']:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# scripts/bench_migration_write_latency.py
+"""
+测量迁移执行期间 API 的写入延迟。
+
+先以固定速率向 POST /api/v1/heroes 写入一段时间作为基线，然后在持续写入的同时
+执行迁移命令 (默认 `alembic upgrade head`)，对比两个阶段的 p50/p99/max 延迟和错误数。
+迁移期间 p99 超过 --max-p99-ms 或出现写入失败时以非零状态码退出，可用于 CI 验收
+"在线迁移不阻塞写入"。
+
+用法 (服务需已启动，数据库先降级到迁移之前的版本):
+    alembic downgrade -1
+    python scripts/bench_migration_write_latency.py --url http://127.0.0.1:8000 --rate 50
+    python scripts/bench_migration_write_latency.py --command "alembic upgrade +1" --max-p99-ms 200
+"""
+import argparse
+import asyncio
+import shlex
+import sys
+import time
+import uuid
+
+import httpx
+
+
+def summarize(latencies_ms: list[float]) -> dict:
+    if not latencies_ms:
+        return {"n": 0, "p50": 0.0, "p99": 0.0, "max": 0.0}
+    values = sorted(latencies_ms)
+    return {
+        "n": len(values),
+        "p50": values[len(values) // 2],
+        "p99": values[min(len(values) - 1, int(len(values) * 0.99))],
+        "max": values[-1],
+    }
+
+
+class Writer:
+    """以固定速率持续创建英雄，按阶段记录延迟和错误。"""
+
+    def __init__(self, client: httpx.AsyncClient, rate: float):
+        self.client = client
+        self.interval = 1 / rate
+        self.phase = "baseline"
+        self.latencies: dict[str, list[float]] = {"baseline": [], "migration": []}
+        self.errors: dict[str, int] = {"baseline": 0, "migration": 0}
+        self._stop = asyncio.Event()
+        self._inflight: set[asyncio.Task] = set()
+
+    async def _write_one(self, phase: str) -> None:
+        alias = f"bench-{uuid.uuid4().hex[:12]}"
+        start = time.perf_counter()
+        try:
+            resp = await self.client.post("/api/v1/heroes", json={"name": "Bench Hero", "alias": alias})
+            ok = resp.status_code == 201
+        except httpx.HTTPError:
+            ok = False
+        self.latencies[phase].append((time.perf_counter() - start) * 1000)
+        if not ok:
+            self.errors[phase] += 1
+
+    async def run(self) -> None:
+        # 开环压测: 按固定间隔发请求，不等待上一个返回，这样锁等待会直接体现在延迟上
+        while not self._stop.is_set():
+            task = asyncio.create_task(self._write_one(self.phase))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+            await asyncio.sleep(self.interval)
+        await asyncio.gather(*self._inflight)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+async def main_async(args) -> int:
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        writer = Writer(client, args.rate)
+        runner = asyncio.create_task(writer.run())
+
+        await asyncio.sleep(args.baseline)
+        writer.phase = "migration"
+        print(f"running: {args.command}")
+        started = time.perf_counter()
+        proc = await asyncio.create_subprocess_exec(*shlex.split(args.command))
+        returncode = await proc.wait()
+        duration = time.perf_counter() - started
+        # 迁移结束后再多写一会儿，覆盖收尾阶段
+        await asyncio.sleep(args.tail)
+        writer.stop()
+        await runner
+
+    print(f"migration exited with {returncode} after {duration:.1f}s")
+    print(f"{'phase':<10}{'n':>8}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for phase in ("baseline", "migration"):
+        s = summarize(writer.latencies[phase])
+        print(f"{phase:<10}{s['n']:>8}{writer.errors[phase]:>8}{s['p50']:>10.1f}{s['p99']:>10.1f}{s['max']:>10.1f}")
+
+    during = summarize(writer.latencies["migration"])
+    if returncode != 0:
+        return returncode
+    if writer.errors["migration"] or during["p99"] > args.max_p99_ms:
+        print(f"FAIL: write p99 {during['p99']:.1f}ms (limit {args.max_p99_ms}ms), errors={writer.errors['migration']}")
+        return 1
+    print("PASS")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--command", default="alembic upgrade head")
+    parser.add_argument("--rate", type=float, default=50, help="每秒写入次数")
+    parser.add_argument("--baseline", type=float, default=10, help="基线阶段时长 (秒)")
+    parser.add_argument("--tail", type=float, default=2, help="迁移结束后继续写入的时长 (秒)")
+    parser.add_argument("--max-p99-ms", type=float, default=250)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
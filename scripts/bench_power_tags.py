@@ -0,0 +1,149 @@
+# scripts/bench_power_tags.py
+"""
+能力标签过滤的延迟基准测试 (需要 PostgreSQL，且已执行 powers_tags 迁移)。
+
+--seed N 先生成 N 个合成英雄 (alias 以 bench-tags- 开头)，能力从 --vocab 个标签中
+按偏斜分布抽取 1~4 个: 少数标签非常常见，大多数标签很少见，更接近真实数据。
+然后对每种查询形状，用与 API 完全相同的 SQL (HeroRepository.build_list_queries)
+分别重复执行 count 查询和第一页查询，统计 p50/p99，并与同一个词的 ILIKE 搜索对比。
+
+加 --explain 输出每种形状的执行计划首行，确认走的是 ix_heroes_powers_tags (Bitmap Index Scan)。
+只应在测试库上使用；--cleanup 删除生成的数据。
+
+用法:
+    python scripts/bench_power_tags.py --seed 2000000
+    python scripts/bench_power_tags.py --iterations 50 --explain
+    python scripts/bench_power_tags.py --cleanup
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import asyncpg
+
+from app.core.database import setup_database_connection, get_session_factory, close_database_connection
+from app.domains.heroes.heroes_repository import HeroRepository
+from app.schemas.heroes_filter import HeroFilter
+
+SEED_BATCH = 100_000
+
+
+def tag(i: int) -> str:
+    return f"power {i:03d}"
+
+
+def shapes(vocab: int) -> dict[str, HeroFilter]:
+    common, mid, rare = tag(0), tag(vocab // 10), tag(vocab - 1)
+    return {
+        "any common": HeroFilter(powers__contains_any=[common]),
+        "any rare": HeroFilter(powers__contains_any=[rare]),
+        "any rare+mid": HeroFilter(powers__contains_any=[rare, mid]),
+        "all common+mid": HeroFilter(powers__contains_all=[common, mid]),
+        "all rare+common": HeroFilter(powers__contains_all=[rare, common]),
+        # 对照组: 改造前只能用 ILIKE 模糊搜索
+        "ilike common": HeroFilter(search=common),
+        "ilike rare": HeroFilter(search=rare),
+    }
+
+
+def percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+async def seed(session, rows: int, vocab: int) -> None:
+    # random()^3 让编号小的标签远比编号大的常见；子查询引用了 g，每行单独求值
+    insert = text(
+        "INSERT INTO heroes (name, alias, powers) "
+        "SELECT 'Bench Hero ' || g, 'bench-tags-' || g, "
+        "(SELECT string_agg('power ' || lpad(floor(:vocab * power(random(), 3))::int::text, 3, '0'), ', ') "
+        " FROM generate_series(1, 1 + (g % 4))) "
+        "FROM generate_series(:lo, :hi) AS g ON CONFLICT DO NOTHING"
+    )
+    start = time.perf_counter()
+    for lo in range(1, rows + 1, SEED_BATCH):
+        hi = min(lo + SEED_BATCH - 1, rows)
+        await session.execute(insert, {"vocab": vocab, "lo": lo, "hi": hi})
+        await session.commit()
+        print(f"  seeded {hi}/{rows} ({time.perf_counter() - start:.0f}s)")
+    await session.execute(text("ANALYZE heroes"))
+    await session.commit()
+
+
+async def explain_first_line(session, query) -> str:
+    sql = str(query.compile(dialect=asyncpg.dialect(), compile_kwargs={"literal_binds": True}))
+    plan = (await session.execute(text(f"EXPLAIN {sql}"))).scalars().all()
+    # 找到第一个扫描 heroes 的节点
+    for line in plan:
+        if " on heroes" in line:
+            return line.strip().lstrip("-> ")
+    return plan[0]
+
+
+async def measure(session, query, iterations: int) -> list[float]:
+    latencies: list[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        (await session.execute(query)).all()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def main_async(args) -> None:
+    await setup_database_connection()
+    try:
+        async with get_session_factory()() as session:
+            if args.cleanup:
+                result = await session.execute(text("DELETE FROM heroes WHERE alias LIKE 'bench-tags-%'"))
+                await session.commit()
+                print(f"deleted {result.rowcount} heroes")
+                return
+            if args.seed:
+                print(f"seeding {args.seed} heroes ...")
+                await seed(session, args.seed, args.vocab)
+            total = await session.scalar(text("SELECT count(*) FROM heroes"))
+            print(f"heroes: {total}\n")
+
+            print(f"{'shape':<18}{'matches':>10}{'count p50':>11}{'count p99':>11}{'page p50':>10}{'page p99':>10}  (ms)")
+            plans: dict[str, str] = {}
+            for name, hero_filter in shapes(args.vocab).items():
+                count_query, page_query = HeroRepository.build_list_queries(hero_filter, limit=args.limit)
+                matches = await session.scalar(count_query)
+                await measure(session, page_query, 2)  # 预热缓存
+                count_ms = await measure(session, count_query, args.iterations)
+                page_ms = await measure(session, page_query, args.iterations)
+                print(
+                    f"{name:<18}{matches:>10}{percentile(count_ms, 0.5):>11.2f}{percentile(count_ms, 0.99):>11.2f}"
+                    f"{percentile(page_ms, 0.5):>10.2f}{percentile(page_ms, 0.99):>10.2f}"
+                )
+                if args.explain:
+                    plans[name] = await explain_first_line(session, count_query)
+            await session.rollback()
+    finally:
+        await close_database_connection()
+
+    if plans:
+        print("\ncount query scan node:")
+        for name, line in plans.items():
+            print(f"  {name:<18}{line}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="先生成这么多合成英雄")
+    parser.add_argument("--vocab", type=int, default=200, help="标签词表大小")
+    parser.add_argument("--iterations", type=int, default=20, help="每种查询重复次数")
+    parser.add_argument("--limit", type=int, default=10, help="分页查询的每页数量")
+    parser.add_argument("--explain", action="store_true", help="输出每种形状的扫描节点")
+    parser.add_argument("--cleanup", action="store_true", help="删除 --seed 生成的数据")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
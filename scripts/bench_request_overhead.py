@@ -0,0 +1,109 @@
+# scripts/bench_request_overhead.py
+"""
+测量每个请求的纯 Python 开销 (不含数据库)。
+
+以内存存储后端 (DEMO_REPOSITORY_BACKEND=memory) 在进程内启动完整的应用，
+通过 ASGI 直接调用 (不经过网络和 uvicorn)，逐个路由统计每请求的 p50/p99/平均耗时。
+这样测到的就是中间件、依赖注入、HeroFilter、服务层、Pydantic 校验和 JSON 序列化的开销。
+
+加 --profile 时用 cProfile 采集并输出累计耗时最高的函数，也可以用 --profile-out
+保存 .pstats 文件后用 snakeviz 等工具查看。
+
+用法:
+    python scripts/bench_request_overhead.py --heroes 10000 --requests 2000
+    python scripts/bench_request_overhead.py --route list --profile
+"""
+import argparse
+import asyncio
+import cProfile
+import os
+import pstats
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+# 必须在导入 app 之前设置: 存储后端在导入路由时确定
+os.environ["DEMO_REPOSITORY_BACKEND"] = "memory"
+
+ROUTES = {
+    "get": ("GET", "/api/v1/heroes/{id}", None),
+    "list": ("GET", "/api/v1/heroes", {"page": 3}),
+    "list_sorted": ("GET", "/api/v1/heroes", {"order_by": "-powers,alias", "page": 3}),
+    "list_search": ("GET", "/api/v1/heroes", {"search": "man", "page": 2}),
+    "list_tags": ("GET", "/api/v1/heroes", {"powers__contains_any": "ka,zor", "page": 2}),
+    "story": ("GET", "/api/v1/heroes/{id}/story", None),
+    "suggest": ("GET", "/api/v1/heroes/suggest", {"prefix": "ka"}),
+    "tags": ("GET", "/api/v1/heroes/tags", None),
+}
+
+
+def percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+async def bench_route(client, name: str, requests: int, heroes: int) -> list[float]:
+    method, path, params = ROUTES[name]
+    latencies: list[float] = []
+    for i in range(requests):
+        url = path.format(id=i % heroes + 1)
+        start = time.perf_counter()
+        resp = await client.request(method, url, params=params)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        if resp.status_code != 200:
+            raise RuntimeError(f"{name}: {resp.status_code} {resp.text}")
+    return latencies
+
+
+async def main_async(args) -> None:
+    os.environ["DEMO_REPOSITORY_SEED_HEROES"] = str(args.heroes)
+    import httpx
+    from app.main import app
+
+    routes = [args.route] if args.route else list(ROUTES)
+    async with app.router.lifespan_context(app):
+        # 等待自动补全索引在后台构建完成
+        await asyncio.sleep(0.5)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in routes:
+                await bench_route(client, name, min(200, args.requests), args.heroes)  # 预热
+
+            profiler = cProfile.Profile() if args.profile or args.profile_out else None
+            print(f"{'route':<14}{'n':>7}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}")
+            for name in routes:
+                if profiler:
+                    profiler.enable()
+                latencies = await bench_route(client, name, args.requests, args.heroes)
+                if profiler:
+                    profiler.disable()
+                print(
+                    f"{name:<14}{len(latencies):>7}{sum(latencies) / len(latencies):>10.1f}"
+                    f"{percentile(latencies, 0.5):>10.1f}{percentile(latencies, 0.99):>10.1f}"
+                )
+
+    if profiler:
+        if args.profile_out:
+            profiler.dump_stats(args.profile_out)
+            print(f"\nwrote {args.profile_out}")
+        if args.profile:
+            print()
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(args.top)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--heroes", type=int, default=10000, help="内存存储中的合成英雄数量")
+    parser.add_argument("--requests", type=int, default=2000, help="每个路由的请求次数")
+    parser.add_argument("--route", choices=sorted(ROUTES), help="只测一个路由")
+    parser.add_argument("--profile", action="store_true", help="用 cProfile 采集并打印热点函数")
+    parser.add_argument("--profile-out", metavar="FILE", help="保存 cProfile 结果 (.pstats)")
+    parser.add_argument("--top", type=int, default=30, help="--profile 打印的函数数量")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
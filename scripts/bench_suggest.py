@@ -0,0 +1,120 @@
+# scripts/bench_suggest.py
+"""
+自动补全 (GET /api/v1/heroes/suggest) 延迟基准测试。
+
+模拟多个用户在搜索框中逐字输入 (每个按键触发一次查询)，统计 p50/p99 延迟。
+
+两种模式:
+  - 默认: 进程内直接测 HeroSuggestIndex.suggest，衡量索引本身的开销
+  - --url: 以打字速度 (--keys-per-sec) 并发请求正在运行的服务，衡量端到端延迟
+
+用法:
+    python scripts/bench_suggest.py --heroes 200000
+    python scripts/bench_suggest.py --url http://127.0.0.1:8000 --users 200 --keys-per-sec 8
+"""
+import argparse
+import asyncio
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.domains.heroes.heroes_suggest import HeroSuggestIndex
+
+
+def random_word(rng: random.Random) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10)))
+
+
+def keystrokes(rng: random.Random, words: list[str]) -> list[str]:
+    """一个用户输入一个词产生的所有前缀。"""
+    word = rng.choice(words)
+    return [word[: i + 1] for i in range(len(word))]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def report(title: str, latencies_ms: list[float]) -> None:
+    print(
+        f"{title}: n={len(latencies_ms)} "
+        f"p50={percentile(latencies_ms, 0.50):.4f}ms "
+        f"p99={percentile(latencies_ms, 0.99):.4f}ms "
+        f"max={max(latencies_ms):.4f}ms"
+    )
+
+
+def bench_in_process(args) -> None:
+    rng = random.Random(42)
+    words = [random_word(rng) for _ in range(args.heroes)]
+    rows = [(i, f"{w.title()} {random_word(rng).title()}", w) for i, w in enumerate(words)]
+
+    index = HeroSuggestIndex()
+    start = time.perf_counter()
+    index.load(rows)
+    print(f"loaded {args.heroes} heroes in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    latencies: list[float] = []
+    for _ in range(args.users):
+        for prefix in keystrokes(rng, words):
+            t = time.perf_counter()
+            index.suggest(prefix, args.limit)
+            latencies.append((time.perf_counter() - t) * 1000)
+    report("in-process suggest", latencies)
+
+    # 同时测一下写路径的增量维护开销
+    latencies = []
+    for i in range(1000):
+        t = time.perf_counter()
+        index.upsert(args.heroes + i, "New Hero", random_word(rng))
+        latencies.append((time.perf_counter() - t) * 1000)
+    report("in-process upsert ", latencies)
+
+
+async def bench_http(args) -> None:
+    import httpx
+
+    rng = random.Random(42)
+    words = [random_word(rng) for _ in range(1000)]
+    latencies: list[float] = []
+    sources: dict[str, int] = {}
+    interval = 1 / args.keys_per_sec
+
+    async def user(client: httpx.AsyncClient) -> None:
+        for prefix in keystrokes(rng, words):
+            t = time.perf_counter()
+            resp = await client.get("/api/v1/heroes/suggest", params={"prefix": prefix, "limit": args.limit})
+            latencies.append((time.perf_counter() - t) * 1000)
+            source = resp.json().get("source", str(resp.status_code)) if resp.status_code == 200 else str(resp.status_code)
+            sources[source] = sources.get(source, 0) + 1
+            await asyncio.sleep(interval)
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=10) as client:
+        await asyncio.gather(*(user(client) for _ in range(args.users)))
+    report(f"http suggest ({args.users} users @ {args.keys_per_sec} keys/s)", latencies)
+    print(f"sources: {sources}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--heroes", type=int, default=100000, help="进程内模式的英雄数量")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--url", help="正在运行的服务地址，如 http://127.0.0.1:8000")
+    parser.add_argument("--keys-per-sec", type=float, default=8.0)
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(bench_http(args))
+    else:
+        bench_in_process(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+# scripts/index_advisor.py
+"""
+索引顾问: 用 EXPLAIN 扫描 HeroFilter 支持的过滤/排序/分页深度组合。
+
+对每个组合构建与 API 完全相同的 count 查询和分页查询
+(HeroRepository.build_list_queries)，执行 EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)，
+并标记:
+  - heroes 表上的顺序扫描 (Seq Scan)
+  - 排序节点 (Sort)，以及溢出到磁盘的排序 (external merge / Disk)
+  - 可以消除排序的复合索引 (ORDER BY 列 + 固定的 name, id 兜底排序)
+  - 模糊搜索 (ILIKE '%x%') 需要的 pg_trgm GIN 索引
+
+可以生成一个使用 op.create_index_concurrently 的 Alembic 迁移，
+也可以在 CI 中作为门禁: 与基线相比，原本不需要排序的组合退化为排序时返回非零状态码。
+
+用法:
+    python scripts/index_advisor.py --seed 1000000          # 先造数据 (只应在测试库上执行)
+    python scripts/index_advisor.py                          # 输出报告
+    python scripts/index_advisor.py --write-migration        # 生成推荐索引的迁移
+    python scripts/index_advisor.py --write-baseline scripts/index_advisor_baseline.json
+    python scripts/index_advisor.py --check scripts/index_advisor_baseline.json
+    python scripts/index_advisor.py --fail-on-sort           # 任何不带搜索的组合出现排序即失败
+"""
+import argparse
+import asyncio
+import json
+import sys
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import asyncpg
+
+from app.core.database import setup_database_connection, get_session_factory, close_database_connection
+from app.domains.heroes.heroes_repository import HeroRepository
+from app.schemas.heroes_filter import HeroFilter
+
+# --- 1. 支持的组合 ---
+ORDER_FIELDS = ["name", "alias", "powers", "id"]
+SEARCHES = [None, "man"]
+# (页码, 每页数量): 第一页、较深的页、最大页大小的深页
+PAGE_DEPTHS = [(1, 10), (100, 10), (50, 100)]
+
+
+def supported_orderings() -> list[list[str]]:
+    orderings: list[list[str]] = [[]]
+    for f in ORDER_FIELDS:
+        orderings.append([f])
+        orderings.append([f"-{f}"])
+    # 常见的双字段排序
+    orderings.append(["-name", "alias"])
+    orderings.append(["alias", "-id"])
+    return orderings
+
+
+@dataclass
+class Combination:
+    search: str | None
+    order_by: list[str]
+    page: int
+    limit: int
+
+    @property
+    def key(self) -> str:
+        return f"search={self.search or '-'} order_by={','.join(self.order_by) or '-'} page={self.page} limit={self.limit}"
+
+    def effective_order(self) -> list[tuple[str, str]]:
+        """HeroFilter.sort 实际生成的 ORDER BY: 请求的字段 + name 兜底 + id 兜底。"""
+        cols = [(v.lstrip("+-"), "DESC" if v.startswith("-") else "ASC") for v in self.order_by]
+        if not any(c == "name" for c, _ in cols):
+            cols.append(("name", "ASC"))
+        cols.append(("id", "ASC"))
+        # 去掉重复的列 (保留第一次出现)
+        seen: set[str] = set()
+        return [(c, d) for c, d in cols if not (c in seen or seen.add(c))]
+
+
+@dataclass
+class Finding:
+    combination: Combination
+    seq_scan: bool = False
+    sort: bool = False
+    sort_spilled: bool = False
+    page_ms: float = 0.0
+    count_ms: float = 0.0
+    notes: list[str] = field(default_factory=list)
+
+
+def all_combinations() -> list[Combination]:
+    return [
+        Combination(search, order_by, page, limit)
+        for search in SEARCHES
+        for order_by in supported_orderings()
+        for page, limit in PAGE_DEPTHS
+    ]
+
+
+# --- 2. EXPLAIN 与计划分析 ---
+def compile_sql(query) -> str:
+    # 用 asyncpg 方言编译: 它不会把 LIKE 中的 % 转义成 %%
+    return str(query.compile(dialect=asyncpg.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def walk(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+
+async def explain(session, query) -> dict:
+    # exec_driver_sql: 已内联参数的 SQL 不再经过 text() 的 :name 绑定参数解析
+    conn = await session.connection()
+    result = await conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {compile_sql(query)}")
+    plan = result.scalar()
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]
+
+
+def analyze_plan(finding: Finding, plan: dict) -> None:
+    for node in walk(plan["Plan"]):
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") == "heroes":
+            finding.seq_scan = True
+        if node["Node Type"] in ("Sort", "Incremental Sort"):
+            finding.sort = True
+            if node.get("Sort Space Type") == "Disk" or "external" in node.get("Sort Method", ""):
+                finding.sort_spilled = True
+
+
+async def run_combination(session, combo: Combination) -> Finding:
+    # order_by=[] 会被 fastapi-filter 的校验器转成 None 而校验失败，不排序时不传
+    hero_filter = HeroFilter(search=combo.search, **({"order_by": combo.order_by} if combo.order_by else {}))
+    count_query, page_query = HeroRepository.build_list_queries(
+        hero_filter, limit=combo.limit, offset=(combo.page - 1) * combo.limit
+    )
+    finding = Finding(combo)
+    page_plan = await explain(session, page_query)
+    count_plan = await explain(session, count_query)
+    analyze_plan(finding, page_plan)
+    # count 查询只关心是否顺序扫描 (count 本身不排序)
+    for node in walk(count_plan["Plan"]):
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") == "heroes" and combo.search is None:
+            finding.notes.append("count(*) uses a seq scan (expected without a filter)")
+    finding.page_ms = page_plan["Execution Time"]
+    finding.count_ms = count_plan["Execution Time"]
+    return finding
+
+
+# --- 3. 索引推荐 ---
+def index_for_order(order: list[tuple[str, str]]) -> tuple[str, list[str]]:
+    name = "ix_heroes_" + "_".join(f"{c}{'_desc' if d == 'DESC' else ''}" for c, d in order)
+    cols = [f"{c} DESC" if d == "DESC" else c for c, d in order]
+    return name, cols
+
+
+async def existing_indexes(session) -> list[str]:
+    result = await session.execute(text("SELECT indexdef FROM pg_indexes WHERE tablename = 'heroes'"))
+    return [row[0] for row in result]
+
+
+def already_indexed(cols: list[str], indexdefs: list[str]) -> bool:
+    wanted = ", ".join(cols).lower()
+    return any(f"({wanted})" in d.lower() for d in indexdefs)
+
+
+def recommend(findings: list[Finding], indexdefs: list[str]) -> dict[str, dict]:
+    recommendations: dict[str, dict] = {}
+    for f in findings:
+        if f.combination.search is None and f.sort:
+            name, cols = index_for_order(f.combination.effective_order())
+            if not already_indexed(cols, indexdefs):
+                recommendations.setdefault(name, {"columns": cols, "using": "btree", "combinations": []})
+                recommendations[name]["combinations"].append(f.combination.key)
+        if f.combination.search is not None and f.seq_scan:
+            for col in ("name", "alias", "powers"):
+                name = f"ix_heroes_{col}_trgm"
+                cols = [f"{col} gin_trgm_ops"]
+                if not any(name in d for d in indexdefs):
+                    recommendations.setdefault(name, {"columns": cols, "using": "gin", "combinations": []})
+                    recommendations[name]["combinations"].append(f.combination.key)
+    return recommendations
+
+
+def write_migration(recommendations: dict[str, dict]) -> Path:
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    script_dir = ScriptDirectory.from_config(Config(str(project_root / "alembic.ini")))
+    head = script_dir.get_current_head()
+    revision = uuid.uuid4().hex[:12]
+    needs_trgm = any(r["using"] == "gin" for r in recommendations.values())
+
+    upgrade = []
+    if needs_trgm:
+        upgrade.append('    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")')
+    downgrade = []
+    for name, rec in recommendations.items():
+        cols = ", ".join(f"sa.text({c!r})" for c in rec["columns"])
+        using = ", postgresql_using='gin'" if rec["using"] == "gin" else ""
+        upgrade.append(f"    op.create_index_concurrently({name!r}, 'heroes', [{cols}]{using})")
+        downgrade.append(f"    op.drop_index_concurrently({name!r}, 'heroes')")
+
+    path = project_root / "alembic" / "versions" / f"{revision}_add_index_advisor_recommendations.py"
+    path.write_text(
+        f'''"""Add indexes recommended by scripts/index_advisor.py
+
+Revision ID: {revision}
+Revises: {head}
+Create Date: {datetime.now()}
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = {revision!r}
+down_revision: Union[str, Sequence[str], None] = {head!r}
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+{chr(10).join(upgrade) or "    pass"}
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+{chr(10).join(reversed(downgrade)) or "    pass"}
+''',
+        encoding="utf-8",
+    )
+    return path
+
+
+# --- 4. 入口 ---
+async def seed(session, rows: int) -> None:
+    print(f"seeding {rows} heroes ...")
+    await session.execute(
+        text(
+            "INSERT INTO heroes (name, alias, powers) "
+            "SELECT 'Hero ' || substr(md5(g::text), 1, 8), 'alias-' || g || '-' || substr(md5(random()::text), 1, 6), "
+            "'power ' || (g % 100) || ' ' || substr(md5((g * 7)::text), 1, 10) "
+            "FROM generate_series(1, :rows) AS g ON CONFLICT DO NOTHING"
+        ),
+        {"rows": rows},
+    )
+    await session.commit()
+    await session.execute(text("ANALYZE heroes"))
+
+
+def print_report(findings: list[Finding]) -> None:
+    print(f"{'combination':<70}{'seq':>5}{'sort':>6}{'spill':>7}{'page ms':>10}{'count ms':>10}")
+    for f in findings:
+        print(
+            f"{f.combination.key:<70}{'Y' if f.seq_scan else '':>5}{'Y' if f.sort else '':>6}"
+            f"{'Y' if f.sort_spilled else '':>7}{f.page_ms:>10.2f}{f.count_ms:>10.2f}"
+        )
+
+
+async def main_async(args) -> int:
+    await setup_database_connection()
+    try:
+        async with get_session_factory()() as session:
+            if args.seed:
+                await seed(session, args.seed)
+            findings = [await run_combination(session, c) for c in all_combinations()]
+            indexdefs = await existing_indexes(session)
+    finally:
+        await close_database_connection()
+
+    print_report(findings)
+    recommendations = recommend(findings, indexdefs)
+    print("\nrecommended indexes:")
+    for name, rec in recommendations.items():
+        print(f"  {name} USING {rec['using']} ({', '.join(rec['columns'])}) -- {len(rec['combinations'])} combinations")
+    if not recommendations:
+        print("  (none)")
+
+    if args.write_migration and recommendations:
+        print(f"\nwrote {write_migration(recommendations)}")
+
+    current = {f.combination.key: {"sort": f.sort, "seq_scan": f.seq_scan} for f in findings}
+    if args.write_baseline:
+        Path(args.write_baseline).write_text(json.dumps(current, indent=2, sort_keys=True), encoding="utf-8")
+        print(f"\nwrote baseline {args.write_baseline}")
+
+    failures: list[str] = []
+    if args.check:
+        baseline = json.loads(Path(args.check).read_text(encoding="utf-8"))
+        for key, before in baseline.items():
+            now = current.get(key)
+            if now and not before["sort"] and now["sort"]:
+                failures.append(f"regressed to sort: {key}")
+    if args.fail_on_sort:
+        failures += [f"sort: {f.combination.key}" for f in findings if f.sort and f.combination.search is None]
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="先插入 N 条合成数据 (只应在测试库上使用)")
+    parser.add_argument("--write-migration", action="store_true", help="为推荐的索引生成 Alembic 迁移")
+    parser.add_argument("--write-baseline", metavar="FILE", help="把当前每个组合是否排序写入基线文件")
+    parser.add_argument("--check", metavar="FILE", help="与基线比较，出现新的排序时失败")
+    parser.add_argument("--fail-on-sort", action="store_true", help="任何不带搜索的组合出现排序即失败")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
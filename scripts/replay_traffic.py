@@ -0,0 +1,289 @@
+# scripts/replay_traffic.py
+"""
+回放录制的线上流量 (DEMO_CAPTURE_ENABLED=True 时生成的 JSONL，见 app/core/traffic_capture.py)。
+
+两种节奏:
+  - 默认按录制时的请求间隔回放，--speed 2 表示两倍速。这是开环 (open-loop) 压测:
+    请求按时间表发出，不等待前一个请求完成，服务变慢时不会自动降低压力，
+    和线上一样；实际发出时间比计划晚的部分记为 send lag。
+  - --max-throughput 时用 --concurrency 个并发连接尽快发送 (闭环)，测最大吞吐。
+
+统计每个路由 (路由模板) 以及英雄列表接口每种 HeroFilter 形状的延迟分布。
+形状由用到的过滤字段、排序字段和翻页深度组成，不含具体取值，例如
+`search+powers__contains_any order=-powers,alias page=2-10`，
+同一形状通常对应同一个执行计划。同时给出录制时的原始耗时便于对比。
+
+默认只回放 GET 请求；--include-writes 会把录制到的写请求也发出去，只应对测试库使用。
+脱敏后的字段 (如登录密码) 回放时必然失败；状态码与录制时不同的请求计入 changed 列。
+录制时带了 Authorization 的请求用 --token 提供的令牌回放。
+
+--in-process 时不需要启动服务: 以内存存储后端在进程内启动应用，通过 ASGI 直接调用。
+
+用法:
+    python scripts/replay_traffic.py requests.jsonl --url http://127.0.0.1:8000
+    python scripts/replay_traffic.py requests-*.jsonl --speed 5
+    python scripts/replay_traffic.py requests.jsonl --max-throughput --concurrency 64 --limit 20000
+    python scripts/replay_traffic.py requests.jsonl --in-process --heroes 10000 --max-throughput
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+READ_METHODS = {"GET", "HEAD"}
+LIST_ROUTE = "/api/v1/heroes"
+
+
+def load_records(paths: list[str], include_writes: bool, limit: int) -> list[dict]:
+    records: list[dict] = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if include_writes or record["method"] in READ_METHODS:
+                    records.append(record)
+    # 多个 worker 的录制文件合并后按到达时间排序
+    records.sort(key=lambda r: r["ts"])
+    return records[:limit] if limit else records
+
+
+def route_key(record: dict) -> str:
+    return f"{record['method']} {record.get('route') or record['path']}"
+
+
+def _page_bucket(page: str | None) -> str:
+    try:
+        page_no = int(page) if page else 1
+    except ValueError:
+        return "page=?"
+    if page_no <= 1:
+        return "page=1"
+    return "page=2-10" if page_no <= 10 else "page>10"
+
+
+def filter_shape(record: dict) -> str | None:
+    """英雄列表请求的 HeroFilter 形状；其他请求返回 None。"""
+    from app.schemas.heroes_filter import HeroFilter
+
+    if record["method"] != "GET" or (record.get("route") or record["path"]) != LIST_ROUTE:
+        return None
+    filter_fields = set(HeroFilter.model_fields) - {"order_by"}
+    used: set[str] = set()
+    order: list[str] = []
+    page = None
+    for key, value in record["query"]:
+        if key in filter_fields and value:
+            used.add(key)
+        elif key == "order_by" and value:
+            order.extend(f.strip() for f in value.split(",") if f.strip())
+        elif key == "page":
+            page = value
+    parts = ["+".join(sorted(used)) or "no filter"]
+    if order:
+        parts.append(f"order={','.join(order)}")
+    parts.append(_page_bucket(page))
+    return " ".join(parts)
+
+
+def build_request(record: dict, token: str | None) -> dict:
+    request = {"method": record["method"], "url": record["path"], "params": record["query"]}
+    headers = {}
+    if record.get("authenticated") and token:
+        headers["Authorization"] = f"Bearer {token}"
+    if record.get("body_format") == "json":
+        request["json"] = record["body"]
+    elif record.get("body_format") == "form":
+        request["data"] = dict(record["body"])
+    elif record.get("content_type"):
+        headers["Content-Type"] = record["content_type"]
+    request["headers"] = headers
+    return request
+
+
+def percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+class Results:
+    def __init__(self):
+        # 键为 ("route" | "shape", 名称)
+        self.latencies: dict[tuple[str, str], list[float]] = defaultdict(list)
+        self.original: dict[tuple[str, str], list[float]] = defaultdict(list)
+        self.errors: dict[tuple[str, str], int] = defaultdict(int)
+        self.status_changed: dict[tuple[str, str], int] = defaultdict(int)
+        self.send_lag: list[float] = []
+
+    def add(self, keys: list[tuple[str, str]], record: dict, status: int | None, latency_ms: float) -> None:
+        for key in keys:
+            self.latencies[key].append(latency_ms)
+            self.original[key].append(record["duration_ms"])
+            if status is None or status >= 500:
+                self.errors[key] += 1
+            if status != record["status"]:
+                self.status_changed[key] += 1
+
+
+async def send(client, record: dict, token: str | None, results: Results) -> None:
+    keys = [("route", route_key(record))]
+    shape = filter_shape(record)
+    if shape:
+        keys.append(("shape", shape))
+    start = time.perf_counter()
+    try:
+        resp = await client.request(**build_request(record, token))
+        status = resp.status_code
+    except Exception:
+        status = None
+    results.add(keys, record, status, (time.perf_counter() - start) * 1000)
+
+
+async def replay_timed(client, records: list[dict], args, results: Results) -> None:
+    """按录制时的间隔 (除以 --speed) 发出请求，不等待响应。"""
+    in_flight = asyncio.Semaphore(args.max_in_flight)
+    tasks: set[asyncio.Task] = set()
+
+    async def fire(record: dict) -> None:
+        try:
+            await send(client, record, args.token, results)
+        finally:
+            in_flight.release()
+
+    t0 = records[0]["ts"]
+    start = time.perf_counter()
+    for record in records:
+        due = start + (record["ts"] - t0) / args.speed
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await in_flight.acquire()
+        results.send_lag.append(max(time.perf_counter() - due, 0) * 1000)
+        task = asyncio.create_task(fire(record))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+
+
+async def replay_max(client, records: list[dict], args, results: Results) -> None:
+    """--concurrency 个并发连接依次取下一条记录，尽快发送。"""
+    pending = iter(records)
+
+    async def worker() -> None:
+        for record in pending:
+            await send(client, record, args.token, results)
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+
+def print_table(title: str, group: str, results: Results) -> None:
+    keys = sorted((k for k in results.latencies if k[0] == group), key=lambda k: -len(results.latencies[k]))
+    if not keys:
+        return
+    width = max([len(title), *(len(name) for _, name in keys)]) + 2
+    print(f"\n{title:<{width}}{'n':>7}{'5xx':>6}{'changed':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}"
+          f"{'orig p50':>10}{'orig p99':>10}  (ms)")
+    for key in keys:
+        values, original = results.latencies[key], results.original[key]
+        print(
+            f"{key[1]:<{width}}{len(values):>7}{results.errors[key]:>6}{results.status_changed[key]:>8}"
+            f"{percentile(values, 0.5):>9.2f}{percentile(values, 0.9):>9.2f}{percentile(values, 0.99):>9.2f}"
+            f"{max(values):>9.2f}{percentile(original, 0.5):>10.2f}{percentile(original, 0.99):>10.2f}"
+        )
+
+
+def report(results: Results, total: int, elapsed: float, args) -> None:
+    mode = f"max throughput, concurrency {args.concurrency}" if args.max_throughput else f"{args.speed:g}x speed"
+    print(f"replayed {total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s, {mode})")
+    if results.send_lag:
+        print(f"send lag: p50 {percentile(results.send_lag, 0.5):.2f}ms  "
+              f"p99 {percentile(results.send_lag, 0.99):.2f}ms  max {max(results.send_lag):.2f}ms")
+    print_table("route", "route", results)
+    print_table(f"HeroFilter shape ({LIST_ROUTE})", "shape", results)
+
+    if args.json_out:
+        summary: dict[str, dict] = {"route": {}, "shape": {}}
+        for key, values in results.latencies.items():
+            group, name = key
+            summary[group][name] = {
+                "n": len(values),
+                "errors": results.errors[key],
+                "status_changed": results.status_changed[key],
+                "p50_ms": percentile(values, 0.5),
+                "p90_ms": percentile(values, 0.9),
+                "p99_ms": percentile(values, 0.99),
+                "max_ms": max(values),
+                "original_p50_ms": percentile(results.original[key], 0.5),
+                "original_p99_ms": percentile(results.original[key], 0.99),
+            }
+        Path(args.json_out).write_text(json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\nwrote {args.json_out}")
+
+
+async def main_async(args) -> None:
+    records = load_records(args.files, args.include_writes, args.limit)
+    if not records:
+        print("no requests to replay", file=sys.stderr)
+        sys.exit(1)
+
+    import httpx
+
+    results = Results()
+    replay = replay_max if args.max_throughput else replay_timed
+    limits = httpx.Limits(max_connections=args.concurrency if args.max_throughput else args.max_in_flight)
+
+    if args.in_process:
+        # 必须在导入 app 之前设置: 存储后端在导入路由时确定
+        os.environ["DEMO_REPOSITORY_BACKEND"] = "memory"
+        os.environ["DEMO_REPOSITORY_SEED_HEROES"] = str(args.heroes)
+        os.environ["DEMO_CAPTURE_ENABLED"] = "False"
+        from app.main import app
+
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://replay", limits=limits) as client:
+                start = time.perf_counter()
+                await replay(client, records, args, results)
+                elapsed = time.perf_counter() - start
+    else:
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+            start = time.perf_counter()
+            await replay(client, records, args, results)
+            elapsed = time.perf_counter() - start
+
+    report(results, len(records), elapsed, args)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="录制文件 (JSONL)，多个文件按时间合并")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="服务地址")
+    parser.add_argument("--in-process", action="store_true", help="以内存存储后端在进程内启动应用并回放")
+    parser.add_argument("--heroes", type=int, default=10000, help="--in-process 时内存存储中的合成英雄数量")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放速度倍数 (按录制间隔回放时)")
+    parser.add_argument("--max-throughput", action="store_true", help="忽略录制间隔，尽快发送")
+    parser.add_argument("--concurrency", type=int, default=32, help="--max-throughput 时的并发连接数")
+    parser.add_argument("--max-in-flight", type=int, default=1000,
+                        help="按间隔回放时同时未完成请求的上限，达到上限时发送会推迟 (计入 send lag)")
+    parser.add_argument("--limit", type=int, default=0, help="只回放前 N 条")
+    parser.add_argument("--include-writes", action="store_true", help="同时回放写请求 (只对测试库使用)")
+    parser.add_argument("--token", help="回放带 Authorization 的请求时使用的访问令牌")
+    parser.add_argument("--timeout", type=float, default=30, help="单个请求的超时 (秒)")
+    parser.add_argument("--json-out", metavar="FILE", help="把统计结果另存为 JSON")
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
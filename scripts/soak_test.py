@@ -0,0 +1,330 @@
+# scripts/soak_test.py
+"""
+长时间浸泡 (soak) 测试: 在混合负载下长时间运行应用，定期记录内存，内存持续增长时判定失败。
+
+负载按权重混合: 各种过滤/排序/翻页深度的列表查询、详情、story、自动补全、标签计数、
+404、创建-修改-删除 (--read-only 时不做)，以及少量 /test-exceptions/server-error
+(走 global_exception_handler 的异常和堆栈路径)。
+
+每隔 --interval 秒读取一次 GET /admin/memory (需要管理令牌)，把 RSS、GC 计数、
+各类型存活对象数、ORM Session / identity map 大小、loguru handler 数量
+连同已完成的请求数写入 --out (JSONL，每行一个采样点)，便于事后画图。
+
+判定: 预热 (--warmup) 结束时的 RSS 作为基线，最后几个采样点的 RSS 中位数减去基线
+超过 --max-growth-mb，或预热后 RSS 的线性增长斜率超过 --max-slope-mb-per-hour 时，
+退出码为 1。同时列出存活数量增长最多的对象类型。
+加 --tracemalloc 时在预热结束后开启 tracemalloc 并拍基线快照，
+结束时输出增长最多的分配位置 (tracemalloc 本身会让请求变慢、内存变大，判定阈值要相应放宽)。
+
+--spawn 时由脚本自己用 uvicorn 启动应用 (自动生成管理令牌)，结束后关闭；
+加 --memory-backend 可以不连数据库，只看应用层自身的内存行为。
+
+用法:
+    python scripts/soak_test.py --spawn --memory-backend --duration 4h --concurrency 32
+    python scripts/soak_test.py --url http://127.0.0.1:8000 --admin-token xxx --duration 2h --tracemalloc
+    python scripts/soak_test.py --spawn --memory-backend --duration 5m --interval 10 --max-growth-mb 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+
+LIST_SHAPES = [
+    {},
+    {"order_by": "-powers,alias"},
+    {"search": "man"},
+    {"powers__contains_any": "flight,strength"},
+    {"powers__contains_all": "flight,strength", "order_by": "name"},
+]
+# (操作名, 权重)
+MIX = [
+    ("list", 40),
+    ("get", 20),
+    ("story", 5),
+    ("suggest", 10),
+    ("tags", 3),
+    ("not_found", 5),
+    ("write", 10),
+    ("server_error", 1),
+]
+
+
+def parse_duration(value: str) -> float:
+    """'90', '90s', '30m', '4h' -> 秒。"""
+    units = {"s": 1, "m": 60, "h": 3600}
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+class Load:
+    def __init__(self, client: httpx.AsyncClient, heroes: int, read_only: bool):
+        self.client = client
+        self.heroes = heroes
+        self.ops = [(name, weight) for name, weight in MIX if not (read_only and name == "write")]
+        self.requests: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.rng = random.Random()
+
+    async def run(self, stop: asyncio.Event) -> None:
+        names = [name for name, _ in self.ops]
+        weights = [weight for _, weight in self.ops]
+        while not stop.is_set():
+            op = self.rng.choices(names, weights)[0]
+            try:
+                ok = await getattr(self, f"_{op}")()
+            except Exception:
+                # 超时、连接被重置等都算作错误，负载不能因此停下
+                ok = False
+            self.requests[op] += 1
+            if not ok:
+                self.errors[op] += 1
+
+    def _hero_id(self) -> int:
+        return self.rng.randint(1, self.heroes)
+
+    async def _list(self) -> bool:
+        params = {**self.rng.choice(LIST_SHAPES), "page": self.rng.choice([1, 1, 1, 2, 5, 50])}
+        return (await self.client.get("/api/v1/heroes", params=params)).status_code == 200
+
+    async def _get(self) -> bool:
+        return (await self.client.get(f"/api/v1/heroes/{self._hero_id()}")).status_code in (200, 404)
+
+    async def _story(self) -> bool:
+        return (await self.client.get(f"/api/v1/heroes/{self._hero_id()}/story")).status_code in (200, 404)
+
+    async def _suggest(self) -> bool:
+        prefix = "".join(self.rng.choices("abcdefghijklmnopqrstuvwxyz", k=self.rng.randint(1, 3)))
+        return (await self.client.get("/api/v1/heroes/suggest", params={"prefix": prefix})).status_code == 200
+
+    async def _tags(self) -> bool:
+        return (await self.client.get("/api/v1/heroes/tags")).status_code == 200
+
+    async def _not_found(self) -> bool:
+        return (await self.client.get(f"/api/v1/heroes/{10**9 + self._hero_id()}")).status_code == 404
+
+    async def _server_error(self) -> bool:
+        return (await self.client.get("/test-exceptions/server-error")).status_code == 500
+
+    async def _write(self) -> bool:
+        alias = f"soak-{secrets.token_hex(6)}"
+        resp = await self.client.post(
+            "/api/v1/heroes", json={"name": "Soak Hero", "alias": alias, "powers": "flight, soak"}
+        )
+        if resp.status_code != 201:
+            return False
+        hero_id = resp.json()["id"]
+        resp = await self.client.patch(f"/api/v1/heroes/{hero_id}", json={"name": "Soaked Hero"})
+        deleted = await self.client.delete(f"/api/v1/heroes/{hero_id}")
+        return resp.status_code == 200 and deleted.status_code == 204
+
+
+def slope_per_hour(points: list[tuple[float, float]]) -> float:
+    """最小二乘拟合的斜率 (每小时)。"""
+    if len(points) < 2:
+        return 0.0
+    xs, ys = zip(*points)
+    mean_x, mean_y = statistics.fmean(xs), statistics.fmean(ys)
+    denominator = sum((x - mean_x) ** 2 for x in xs)
+    if not denominator:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / denominator * 3600
+
+
+async def sample(admin: httpx.AsyncClient, started: float, load: Load) -> dict:
+    resp = await admin.get("/admin/memory", params={"top_types": 30})
+    resp.raise_for_status()
+    memory = resp.json()
+    return {
+        "elapsed": round(time.monotonic() - started, 1),
+        "rss_mb": memory["rss_bytes"] / 2**20 if memory["rss_bytes"] else None,
+        "requests": sum(load.requests.values()),
+        "errors": sum(load.errors.values()),
+        "gc_objects": memory["gc"]["tracked_objects"],
+        "gc_counts": memory["gc"]["counts"],
+        "gc_collections": [g["collections"] for g in memory["gc"]["generations"]],
+        "uncollectable": memory["gc"]["uncollectable"],
+        "tracked_types": memory["tracked_types"],
+        "top_types": memory["top_types"],
+        "orm": memory["orm"],
+        "loguru_handlers": memory["loguru_handlers"],
+    }
+
+
+def spawn_app(args, token: str) -> subprocess.Popen:
+    env = {**os.environ, "DEMO_ADMIN_TOKEN": token, "DEMO_LOG_LEVEL": os.environ.get("DEMO_LOG_LEVEL", "WARNING")}
+    if args.memory_backend:
+        env["DEMO_REPOSITORY_BACKEND"] = "memory"
+        env["DEMO_REPOSITORY_SEED_HEROES"] = str(args.heroes)
+    port = args.url.rsplit(":", 1)[-1].rstrip("/")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", port,
+         "--no-access-log"],
+        cwd=project_root,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float, process: Optional[subprocess.Popen]) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"app exited with code {process.returncode} during startup")
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"app not ready after {timeout}s")
+
+
+def print_sample(point: dict) -> None:
+    rss = f"{point['rss_mb']:.1f}MB" if point["rss_mb"] is not None else "n/a"
+    print(
+        f"[{point['elapsed']:>8.0f}s] rss={rss:<9} objects={point['gc_objects']:<8} "
+        f"requests={point['requests']:<8} errors={point['errors']:<5} "
+        f"sessions={point['orm']['sessions']} identity_map={point['orm']['identity_map_entries']} "
+        f"gc={point['gc_collections']}",
+        flush=True,
+    )
+
+
+def verdict(samples: list[dict], warmup: float, args) -> bool:
+    """输出结论，返回是否通过。"""
+    measured = [s for s in samples if s["elapsed"] >= warmup and s["rss_mb"] is not None]
+    if len(measured) < 2:
+        print("\nnot enough samples after warm-up to judge memory growth")
+        return True
+    baseline = measured[0]
+    final_rss = statistics.median(s["rss_mb"] for s in measured[-3:])
+    growth = final_rss - baseline["rss_mb"]
+    slope = slope_per_hour([(s["elapsed"], s["rss_mb"]) for s in measured])
+    last = measured[-1]
+
+    print(f"\nbaseline rss (after {warmup:.0f}s warm-up): {baseline['rss_mb']:.1f}MB")
+    print(f"final rss (median of last samples):     {final_rss:.1f}MB")
+    print(f"growth:                                 {growth:+.1f}MB (limit {args.max_growth_mb}MB)")
+    print(f"trend:                                  {slope:+.1f}MB/h"
+          + (f" (limit {args.max_slope_mb_per_hour}MB/h)" if args.max_slope_mb_per_hour is not None else ""))
+    print(f"live objects:                           {baseline['gc_objects']} -> {last['gc_objects']}")
+
+    deltas = Counter()
+    for group in ("tracked_types", "top_types"):
+        for name in baseline[group].keys() | last[group].keys():
+            deltas[name] = last[group].get(name, 0) - baseline[group].get(name, 0)
+    growing = [(name, delta) for name, delta in deltas.most_common(10) if delta > 0]
+    if growing:
+        print("object types that grew the most:")
+        for name, delta in growing:
+            print(f"  {name:<28}{delta:>+10}")
+
+    passed = growth <= args.max_growth_mb
+    if args.max_slope_mb_per_hour is not None and slope > args.max_slope_mb_per_hour:
+        passed = False
+    print("\nPASS" if passed else "\nFAIL: memory kept growing")
+    return passed
+
+
+async def main_async(args) -> int:
+    duration = parse_duration(args.duration)
+    warmup = parse_duration(args.warmup) if args.warmup else min(duration * 0.1, 600)
+    token = args.admin_token or os.environ.get("DEMO_ADMIN_TOKEN") or ""
+    process: Optional[subprocess.Popen] = None
+    if args.spawn:
+        token = token or secrets.token_hex(16)
+        process = spawn_app(args, token)
+    if not token:
+        print("an admin token is needed for /admin/memory (--admin-token or DEMO_ADMIN_TOKEN)", file=sys.stderr)
+        return 2
+
+    out = Path(args.out or f"soak-{time.strftime('%Y%m%d-%H%M%S')}.jsonl")
+    limits = httpx.Limits(max_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client, \
+                httpx.AsyncClient(base_url=args.url, headers={"X-Admin-Token": token}, timeout=120) as admin:
+            await wait_ready(client, 60 if process else 5, process)
+            load = Load(client, args.heroes, args.read_only)
+            stop = asyncio.Event()
+            workers = [asyncio.create_task(load.run(stop)) for _ in range(args.concurrency)]
+            started = time.monotonic()
+            samples: list[dict] = []
+            base_snapshot: Optional[str] = None
+            print(f"soaking {args.url} for {duration:.0f}s (warm-up {warmup:.0f}s), "
+                  f"concurrency {args.concurrency}, samples -> {out}")
+            try:
+                with out.open("w", encoding="utf-8") as f:
+                    while True:
+                        elapsed = time.monotonic() - started
+                        if args.tracemalloc and base_snapshot is None and elapsed >= warmup:
+                            (await admin.post("/admin/memory/tracemalloc/start")).raise_for_status()
+                            snapshot = await admin.post("/admin/memory/snapshots", params={"limit": 1})
+                            snapshot.raise_for_status()
+                            base_snapshot = snapshot.json()["id"]
+                        point = await sample(admin, started, load)
+                        samples.append(point)
+                        f.write(json.dumps(point) + "\n")
+                        f.flush()
+                        print_sample(point)
+                        if elapsed >= duration:
+                            break
+                        await asyncio.sleep(min(args.interval, max(duration - elapsed, 0.1)))
+            finally:
+                stop.set()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+            print(f"\nrequests by operation: {dict(load.requests)}")
+            print(f"unexpected responses:  {dict(load.errors)}")
+            if base_snapshot is not None:
+                resp = await admin.get(f"/admin/memory/snapshots/{base_snapshot}/diff", params={"limit": 15})
+                resp.raise_for_status()
+                print(f"\ntracemalloc growth since warm-up ({resp.json()['total_diff_bytes'] / 2**20:+.1f}MB):")
+                for stat in resp.json()["top"]:
+                    print(f"  {stat['size_diff_bytes'] / 1024:>+10.1f}KB {stat['count_diff']:>+8}  {stat['site']}")
+                await admin.post("/admin/memory/tracemalloc/stop")
+            return 0 if verdict(samples, warmup, args) else 1
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="服务地址 (--spawn 时使用其中的端口)")
+    parser.add_argument("--spawn", action="store_true", help="由脚本启动并关闭应用")
+    parser.add_argument("--memory-backend", action="store_true", help="--spawn 时使用内存存储后端")
+    parser.add_argument("--admin-token", help="管理令牌 (默认读取 DEMO_ADMIN_TOKEN，--spawn 时自动生成)")
+    parser.add_argument("--duration", default="1h", help="测试时长，如 600、30m、4h")
+    parser.add_argument("--warmup", help="预热时长，之后的 RSS 作为基线 (默认测试时长的 10%%，最多 10m)")
+    parser.add_argument("--interval", type=float, default=30, help="内存采样间隔 (秒)")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发请求数")
+    parser.add_argument("--heroes", type=int, default=1000, help="随机请求的英雄 id 范围 1..N (内存后端的数据量)")
+    parser.add_argument("--read-only", action="store_true", help="不做创建/修改/删除")
+    parser.add_argument("--max-growth-mb", type=float, default=50, help="预热后允许的 RSS 增长 (MB)")
+    parser.add_argument("--max-slope-mb-per-hour", type=float, help="允许的 RSS 增长趋势 (MB/小时)")
+    parser.add_argument("--tracemalloc", action="store_true", help="预热后开启 tracemalloc，结束时输出增长最多的分配位置")
+    parser.add_argument("--out", metavar="FILE", help="采样点输出文件 (默认 soak-<时间>.jsonl)")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# tests/test_heroes_sharded_ordering.py
+"""
+分片列表的合并顺序: 各分片按 COLLATE "C" 排序，合并键按码点比较，两者一致时
+逐页翻完应得到与单库相同的顺序，不跳行、不重复。
+
+运行: python -m unittest discover tests
+"""
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+from app.core.exceptions import BadRequestException
+from app.domains.heroes.heroes_ordering import order_spec, sort_key
+from app.domains.heroes.heroes_repository import HeroRepository
+from app.domains.heroes.heroes_sharded_repository import SHARD_SORT_COLLATION, ShardedHeroRepository
+from app.models.heroes import Hero
+from app.schemas.heroes_filter import HeroFilter
+
+SHARDS = 3
+# 只在大小写或标点上不同的名字: en_US 等 collation 会把它们排在一起，码点顺序则不同
+NAMES = ["alpha", "Alpha", "ALPHA", "a-lpha", "a_lpha", "a.lpha", "beta", "Beta", "b-eta", "_beta", "Zeta", "zeta"]
+
+
+def _heroes() -> list[Hero]:
+    return [
+        Hero(id=i, name=name, alias=f"{name}#{i}", powers=None if i % 4 == 0 else f"p{i % 3}")
+        for i, name in enumerate(NAMES * 2, start=1)
+    ]
+
+
+class _FakeShard:
+    """模拟一个分片执行带 COLLATE "C" 的列表查询: 按码点排序后取前 limit 行。"""
+
+    def __init__(self, heroes: list[Hero]):
+        self.heroes = heroes
+
+    async def get_all(self, *, hero_filter: HeroFilter, limit: int, offset: int) -> tuple[int, list[Hero]]:
+        rows = sorted(self.heroes, key=lambda h: sort_key(h, order_spec(hero_filter)))
+        return len(rows), rows[offset : offset + limit]
+
+
+def _sql(query) -> str:
+    return str(query.compile(dialect=postgresql.dialect()))
+
+
+class ShardedListOrderingTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.heroes = _heroes()
+        with patch(
+            "app.domains.heroes.heroes_sharded_repository.get_shard_session_factories", return_value=[None] * SHARDS
+        ), patch(
+            "app.domains.heroes.heroes_sharded_repository.get_shard_read_session_factories",
+            return_value=[None] * SHARDS,
+        ):
+            self.repository = ShardedHeroRepository()
+
+    async def _fake_scatter(self, call):
+        """把 get_all 的 lambda 交给每个假分片执行，返回各分片的结果。"""
+        return [
+            await call(_FakeShard([h for h in self.heroes if h.id % SHARDS == shard_no]))
+            for shard_no in range(SHARDS)
+        ]
+
+    async def _walk(self, hero_filter: HeroFilter, limit: int) -> list[int]:
+        ids = []
+        offset = 0
+        with patch.object(self.repository, "_scatter", self._fake_scatter):
+            while True:
+                total, page = await self.repository.get_all(hero_filter=hero_filter, limit=limit, offset=offset)
+                if not page:
+                    break
+                ids.extend(h.id for h in page)
+                offset += limit
+        self.assertEqual(total, len(self.heroes))
+        return ids
+
+    async def test_pages_match_single_database_order(self):
+        for order_by in ([], ["-name"], ["alias"], ["-powers", "alias"]):
+            hero_filter = HeroFilter(**({"order_by": order_by} if order_by else {}))
+            expected = [h.id for h in sorted(self.heroes, key=lambda h: sort_key(h, order_spec(hero_filter)))]
+            for limit in (1, 5, 7):
+                with self.subTest(order_by=order_by, limit=limit):
+                    self.assertEqual(await self._walk(hero_filter, limit), expected)
+
+    def test_shard_queries_sort_strings_with_c_collation(self):
+        hero_filter = HeroFilter(order_by=["-powers", "alias"])
+        _, page = HeroRepository.build_list_queries(hero_filter, collation=SHARD_SORT_COLLATION)
+        order_by = _sql(page).split("ORDER BY", 1)[1]
+        self.assertIn('heroes.powers COLLATE "C" DESC', order_by)
+        self.assertIn('heroes.alias COLLATE "C" ASC', order_by)
+        self.assertIn('heroes.name COLLATE "C" ASC', order_by)
+        self.assertNotIn('heroes.id COLLATE', order_by)
+
+    def test_single_database_queries_keep_default_collation(self):
+        _, page = HeroRepository.build_list_queries(HeroFilter(order_by=["alias"]))
+        self.assertNotIn("COLLATE", _sql(page))
+
+    async def test_deep_offset_is_rejected(self):
+        with self.assertRaises(BadRequestException):
+            await self.repository.get_all(
+                hero_filter=HeroFilter(), limit=10, offset=settings.REPOSITORY.SHARDED_MAX_OFFSET + 1
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()